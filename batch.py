@@ -0,0 +1,113 @@
+import os
+import signal
+import time
+import warnings
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Callable, List
+
+"""複数ファイルの並列一括処理モジュール"""
+
+@dataclass
+class FileStatus:
+    """1ファイル分の処理結果（成否と所要時間）を保持するクラス"""
+    file_path: str
+    is_ok: bool
+    elapsed: float
+    error: str | None = None
+
+
+def _run_main(a_file: str, **main_kwargs) -> None:
+    """ワーカープロセス内でメイン処理を実行する（main.pyは遅延インポート）"""
+    from main import main
+    main(a_file, **main_kwargs)
+
+
+def warm_up_worker(plots: bool = True) -> None:
+    """
+    常駐ワーカープロセスの初期化: 計算・レポート（・グラフ）に必要なモジュールを先に読み込み、
+    最初の処理でも読み込み時間がかからないようにする
+    """
+    warnings.simplefilter('ignore')
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    import main, read_excel, calculate, result, report_writer  # noqa: F401
+    if plots:
+        import plotter  # noqa: F401
+        from matplotlib.figure import Figure  # noqa: F401
+        from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: F401
+
+
+def stop_on_sigterm() -> None:
+    """SIGTERM（サービスとしての停止要求）を Ctrl+C と同じく KeyboardInterrupt として扱う"""
+    def interrupt(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, interrupt)
+
+
+def process_one_file(a_file: str, func: Callable[..., None] = _run_main, **main_kwargs) -> FileStatus:
+    """
+    1ファイルを処理し、例外をFileStatusに閉じ込めて返す。
+    1つのファイルの失敗で一括処理全体が止まらないようにする。
+    """
+    start = time.perf_counter()
+    try:
+        func(a_file, **main_kwargs)
+    except Exception as e:
+        elapsed = time.perf_counter() - start
+        detail = "".join(traceback.format_exception_only(type(e), e)).strip()
+        return FileStatus(file_path=a_file, is_ok=False, elapsed=elapsed, error=detail)
+    return FileStatus(file_path=a_file, is_ok=True, elapsed=time.perf_counter() - start)
+
+
+def resolve_workers(max_workers: int | None, n_files: int) -> int:
+    """ワーカー数を決定する（未指定または0以下ならCPUコア数）"""
+    if max_workers is None or max_workers <= 0:
+        max_workers = os.cpu_count() or 1
+    return max(1, min(max_workers, n_files))
+
+
+def run_batch(file_list: List[str], max_workers: int | None = None, **main_kwargs) -> List[FileStatus]:
+    """
+    ファイルリストをプロセスプールで並列処理し、入力順のFileStatusリストを返す。
+    ワーカー数が1の場合はプロセスを起動せずに逐次処理する。
+    """
+    if not file_list:
+        return []
+    n_workers = resolve_workers(max_workers, len(file_list))
+    job = partial(process_one_file, **main_kwargs)
+
+    if n_workers == 1:
+        return [job(a_file) for a_file in file_list]
+
+    statuses: dict[str, FileStatus] = {}
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = {executor.submit(job, a_file): a_file for a_file in file_list}
+        for future in as_completed(futures):
+            a_file = futures[future]
+            try:
+                statuses[a_file] = future.result()
+            except Exception as e:
+                # ワーカープロセス自体が異常終了した場合など
+                statuses[a_file] = FileStatus(file_path=a_file, is_ok=False, elapsed=0.0, error=repr(e))
+    return [statuses[a_file] for a_file in file_list]
+
+
+def print_summary(statuses: List[FileStatus], total_elapsed: float | None = None) -> None:
+    """ファイルごとの処理結果と所要時間の一覧を表示する"""
+    if not statuses:
+        return
+    print("\n===== 処理結果一覧 =====")
+    for status in statuses:
+        mark = "OK  " if status.is_ok else "NG  "
+        print(f"{mark}{status.elapsed:8.2f} s  {Path(status.file_path).name}")
+        if status.error:
+            print(f"        エラー: {status.error}")
+    n_ok = sum(status.is_ok for status in statuses)
+    n_ng = len(statuses) - n_ok
+    line = f"成功: {n_ok} 件 / 失敗: {n_ng} 件"
+    if total_elapsed is not None:
+        line += f" / 合計時間: {total_elapsed:.2f} s"
+    print(line)
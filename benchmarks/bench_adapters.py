@@ -0,0 +1,75 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calculate import main_calculation_flow  # noqa: E402
+from input_adapters import load_dataset  # noqa: E402
+from result import metrics_table  # noqa: E402
+from synthetic import make_profile  # noqa: E402
+
+"""Excel以外の入力（.npy のメモリマップ・CSV）から百万点規模のプロファイルを計算する時間とピークメモリのベンチマーク"""
+
+
+def write_dataset(folder: str, fmt: str, n_situations: int, n_points: int) -> str:
+    """合成プロファイルを状況ごとの座標ファイルに書き、それを参照する設定ファイル（JSON）のパスを返す"""
+    rng = np.random.default_rng(0)
+    situations = []
+    for i in range(n_situations):
+        profile = make_profile(n_points, radius=40.0 + 0.001 * i, ovality=0.005 * i,
+                               noise=0.0005, sliding=0.002 * i, rng=rng)
+        name = f"situation{i}.{fmt}"
+        if fmt == "npy":
+            np.save(os.path.join(folder, name), profile)
+        else:
+            np.savetxt(os.path.join(folder, name), profile, delimiter=",", fmt="%.17g",
+                       header="cap_y,cap_x,rod_y,rod_x", comments="")
+        situations.append({"situation": "基準" if i == 0 else f"条件{i}", "file": name,
+                           "is_standard": i == 0, "fft": i % 2 == 0})
+    settings = {"threshold_dia": 0.24, "threshold_rad": 0.24, "threshold_lsm": 0.24, "is_auto": "自動"}
+    path = os.path.join(folder, f"dataset_{fmt}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"settings": settings, "situations": situations}, f, ensure_ascii=False)
+    return path
+
+
+def run(path: str) -> tuple:
+    """(読み込み[s], 計算[s], ピークメモリ[MiB]) を返す"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    props, all_data = load_dataset(path)
+    loaded = time.perf_counter()
+    metrics_table(main_calculation_flow(path, props, all_data))
+    finished = time.perf_counter()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return loaded - start, finished - loaded, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--situations", type=int, default=4)
+    parser.add_argument("--points", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--formats", nargs="+", choices=["npy", "csv"], default=["npy", "csv"])
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    print(f"{'形式':>4} {'点数':>9} {'入力[MiB]':>9} {'読込[s]':>8} {'計算[s]':>8} {'ピーク[MiB]':>11}")
+    for n_points in args.points:
+        raw = args.situations * n_points * 4 * 8 / 2**20
+        for fmt in args.formats:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = write_dataset(tmp, fmt, args.situations, n_points)
+                t_load, t_calc, peak = run(path)
+            print(f"{fmt:>4} {n_points:>9} {raw:>9.1f} {t_load:>8.2f} {t_calc:>8.2f} {peak:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from read_excel import InputData, InputProperty  # noqa: E402
+from calculate import main_calculation_flow, multi_reference_flow  # noqa: E402
+from result import comparison_table, metrics_table  # noqa: E402
+from synthetic import make_profile, LINE_COLORS  # noqa: E402
+
+"""
+複数基準の比較（multi_reference_flow で1回にまとめて計算）と、
+基準ごとに main_calculation_flow をくり返す方法の計算時間の比較ベンチマーク（評価値の表を作るまで）
+"""
+
+
+def make_inputs(n_situations: int, n_points: int, n_references: int):
+    rng = np.random.default_rng(0)
+    all_data = []
+    for i in range(n_situations):
+        profile = make_profile(n_points, radius=40.0 + 0.001 * i, ovality=0.005 * i,
+                               noise=0.0005, sliding=0.002 * i, rng=rng)
+        all_data.append(InputData.from_array(f"条件{i}", profile, fft_on_or_off=i % 2 == 0,
+                                             is_standard=i < n_references,
+                                             line_color=LINE_COLORS[i % len(LINE_COLORS)]))
+    props = InputProperty.from_dict({"threshold_dia": 0.24, "threshold_rad": 0.24, "threshold_lsm": 0.24,
+                                     "is_auto": "自動"})
+    return props, all_data
+
+
+def per_reference(props, all_data) -> list:
+    """基準の列を1つずつ「基準とする」にして計算し直す（素朴な方法）"""
+    references = [i for i, data in enumerate(all_data) if data.is_standard]
+    tables = []
+    for ref in references:
+        for i, data in enumerate(all_data):
+            data.is_standard = i == ref
+        tables.append(metrics_table(main_calculation_flow("", props, all_data)))
+    for i, data in enumerate(all_data):
+        data.is_standard = i in references
+    return tables
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--situations", type=int, default=16)
+    parser.add_argument("--references", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--points", type=int, default=10_000, help="cap側・rod側それぞれの点数")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    print(f"{'基準数':>6} {'状況数':>6} {'点数':>8} {'くり返し[ms]':>12} {'一括[ms]':>9} {'速度比':>7}")
+    for n_references in args.references:
+        props, all_data = make_inputs(args.situations, args.points, n_references)
+        t_loop = _best_of(lambda: per_reference(props, all_data), args.repeat)
+        t_multi = _best_of(lambda: comparison_table(multi_reference_flow("", props, all_data)), args.repeat)
+        print(f"{n_references:>6} {args.situations:>6} {args.points:>8} {t_loop * 1e3:>12.1f} "
+              f"{t_multi * 1e3:>9.1f} {t_loop / t_multi:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from read_excel import InputData, InputProperty  # noqa: E402
+from calculate import main_calculation_flow  # noqa: E402
+from plotter import Plotter, render_graph  # noqa: E402
+from synthetic import make_profile, LINE_COLORS  # noqa: E402
+
+"""グラフの間引き（min/max）あり・なしの描画時間と画像サイズの比較ベンチマーク"""
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def make_results(n_situations: int, n_points: int):
+    """Excelを経由せずに合成プロファイルから計算結果を作る（大きな点数ではブックを作れないため）"""
+    import numpy as np
+    rng = np.random.default_rng(0)
+    all_data = []
+    for i in range(n_situations):
+        profile = make_profile(n_points, radius=40.0 + 0.001 * i, ovality=0.005 * i,
+                               noise=0.0005, sliding=0.002 * i, rng=rng)
+        all_data.append(InputData.from_array("基準" if i == 0 else f"条件{i}", profile, fft_on_or_off=i % 2 == 0,
+                                             is_standard=i == 0, line_color=LINE_COLORS[i % len(LINE_COLORS)]))
+    props = InputProperty.from_dict({"threshold_dia": 0.24, "threshold_rad": 0.24, "threshold_lsm": 0.24,
+                                     "is_auto": "手動", "max_val": 30, "min_val": -20, "interval": 10})
+    return props, main_calculation_flow("bench", props, all_data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--situations", type=int, default=4)
+    parser.add_argument("--points", type=int, nargs="+", default=[3600, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    print(f"{'点数':>9} {'間引き':>6} {'準備[s]':>8} {'描画[s]':>8} {'描画点数':>9} {'画像[KiB]':>9}")
+    for n_points in args.points:
+        props, results = make_results(args.situations, n_points)
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, max_points in (("なし", 0), ("自動", None)):
+                plotter = Plotter(results, props, os.path.join(tmp, f"結果_{label}.xlsx"), max_points=max_points)
+                t_build = _best_of(plotter.build_jobs, args.repeat)
+                jobs = plotter.build_jobs()
+                t_render = _best_of(lambda: [render_graph(job) for job in jobs], args.repeat)
+                n_drawn = sum(len(y_data) for job in jobs for _, y_data, _, _ in job.series)
+                size = sum(os.path.getsize(job.graph_filename) for job in jobs) / 1024
+                print(f"{n_points:>9} {label:>6} {t_build:>8.3f} {t_render:>8.2f} {n_drawn:>9} {size:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
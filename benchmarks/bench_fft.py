@@ -0,0 +1,59 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calculate import smooth_fft_batch  # noqa: E402
+
+"""FFT平滑化（旧: 1信号ずつの複素FFT / 新: 一括の実数FFT）の比較ベンチマーク"""
+
+
+def legacy_activate_fft(amount_of_change, threshold) -> list:
+    """旧実装: 1信号ずつ fft/ifft を行いリストで返す"""
+    original_len = len(amount_of_change)
+    signal = np.array(amount_of_change)
+    padded_signal = np.concatenate([signal, signal[::-1]])
+    fft_result = np.fft.fft(padded_signal)
+    power = np.abs(fft_result) / len(padded_signal)
+    filtered_fft = fft_result * (power >= threshold)
+    return np.fft.ifft(filtered_fft).real[:original_len].tolist()
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--columns", type=int, nargs="+", default=[5, 50, 200], help="FFT対象の状況数")
+    parser.add_argument("--points", type=int, nargs="+", default=[180, 3600, 36000], help="プロファイルの点数")
+    parser.add_argument("--threshold", type=float, default=0.24)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'状況数':>6} {'点数':>7} {'旧実装[ms]':>11} {'一括[ms]':>10} {'倍率':>6} {'最大相対差':>10}")
+    for n_columns in args.columns:
+        for n_points in args.points:
+            # 1状況あたり cap・rod・補正cap・補正rod・内径 の5信号
+            signals = np.cumsum(rng.normal(size=(5 * n_columns, n_points)), axis=1) * 0.1
+            legacy = np.array([legacy_activate_fft(row.tolist(), args.threshold) for row in signals])
+            batch = smooth_fft_batch(signals, args.threshold)
+            scale = max(1.0, float(np.abs(legacy).max()))
+            t_legacy = _best_of(lambda: [legacy_activate_fft(row.tolist(), args.threshold) for row in signals],
+                                args.repeat)
+            t_batch = _best_of(lambda: smooth_fft_batch(signals, args.threshold), args.repeat)
+            print(f"{n_columns:>6} {n_points:>7} {t_legacy * 1e3:>11.2f} {t_batch * 1e3:>10.2f} "
+                  f"{t_legacy / t_batch:>6.1f} {np.abs(legacy - batch).max() / scale:>10.1e}")
+
+
+if __name__ == "__main__":
+    main()
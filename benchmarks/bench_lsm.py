@@ -0,0 +1,72 @@
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from least_squares import calc_corrected_roundness, calc_corrected_roundness_batch  # noqa: E402
+from synthetic import make_profile  # noqa: E402
+
+"""最小二乗円あてはめ（calc_corrected_roundness）のマイクロベンチマーク"""
+
+
+def legacy_fit(coord: pd.DataFrame) -> tuple:
+    """旧実装（べき乗項14列のDataFrame + np.linalg.inv）による (cx, cy, r)"""
+    pre_y = coord["cap_y"].tolist() + list(reversed(coord["rod_y"].tolist()))
+    pre_x = coord["cap_x"].tolist() + list(reversed(coord["rod_x"].tolist()))
+    df1 = pd.DataFrame({"preY": pre_y, "preX": pre_x})
+    for i, j in [(0, 1), (0, 2), (0, 3), (1, 0), (1, 1), (1, 2), (1, 3),
+                 (2, 0), (2, 1), (2, 2), (2, 3), (3, 0)]:
+        df1[f"x{i}y{j}"] = (df1["preX"] ** i) * (df1["preY"] ** j)
+    lhs = np.array([[df1["x2y0"].sum(), df1["x1y1"].sum(), df1["x1y0"].sum()],
+                    [df1["x1y1"].sum(), df1["x0y2"].sum(), df1["x0y1"].sum()],
+                    [df1["x1y0"].sum(), df1["x0y1"].sum(), len(df1)]])
+    rhs = np.array([[-(df1["x3y0"].sum() + df1["x1y2"].sum())],
+                    [-(df1["x2y1"].sum() + df1["x0y3"].sum())],
+                    [-(df1["x2y0"].sum() + df1["x0y2"].sum())]])
+    a, b, c = np.dot(np.linalg.inv(lhs), rhs)[:, 0]
+    cx, cy = -a / 2, -b / 2
+    return cx, cy, math.sqrt(cx**2 + cy**2 - c)
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, nargs="+", default=[1_000, 100_000, 1_000_000],
+                        help="1プロファイルあたりの総点数（cap + rod）")
+    parser.add_argument("--profiles", type=int, default=50, help="一括あてはめのプロファイル数")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'点数':>9} {'旧実装[ms]':>11} {'新実装[ms]':>11} {'倍率':>6} {'一括/本[ms]':>12} {'|Δr|':>9}")
+    for n_points in args.points:
+        profile = make_profile(n_points // 2, ovality=0.01, noise=0.001, rng=rng)
+        coord = pd.DataFrame(profile, columns=["cap_y", "cap_x", "rod_y", "rod_x"])
+        legacy = legacy_fit(coord)
+        new = calc_corrected_roundness(coord, std_radius=40.0)
+        t_legacy = _best_of(lambda: legacy_fit(coord), args.repeat)
+        t_new = _best_of(lambda: calc_corrected_roundness(coord, std_radius=40.0), args.repeat)
+
+        n_profiles = max(1, min(args.profiles, 5_000_000 // n_points))
+        stacked = np.stack([make_profile(n_points // 2, ovality=0.01, noise=0.001, rng=rng)
+                            for _ in range(n_profiles)])
+        t_batch = _best_of(lambda: calc_corrected_roundness_batch(stacked, std_radius=40.0), args.repeat)
+        print(f"{n_points:>9} {t_legacy * 1e3:>11.2f} {t_new * 1e3:>11.2f} {t_legacy / t_new:>6.1f} "
+              f"{t_batch / n_profiles * 1e3:>12.3f} {abs(legacy[2] - new.r):>9.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from batch import run_batch  # noqa: E402
+from pipeline import FilePipeline  # noqa: E402
+from synthetic import write_workbook  # noqa: E402
+
+"""複数ファイルの逐次処理とパイプライン（読み込み・計算・書き出しの重ね合わせ）の比較ベンチマーク"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--situations", type=int, default=6)
+    parser.add_argument("--points", type=int, default=3600)
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--no-plots", dest="plots", action="store_false")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = [write_workbook(os.path.join(tmp, f"bench_{i}.xlsx"), n_situations=args.situations,
+                                n_points=args.points, seed=i) for i in range(args.files)]
+        print(f"ファイル数={args.files}  状況数={args.situations}  点数={args.points}  グラフ={args.plots}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            run_batch(files, max_workers=1, plots=args.plots)
+            sequential = time.perf_counter() - start
+        print(f"逐次処理                 {sequential:7.2f} s")
+        for writers in args.writers:
+            pipeline = FilePipeline(files, writers=writers, plots=args.plots)
+            with contextlib.redirect_stdout(io.StringIO()):
+                statuses = pipeline.run()
+            assert all(status.is_ok for status in statuses), [s.error for s in statuses if not s.is_ok]
+            usage = "  ".join(f"{stage.name} {stage.utilization(pipeline.wall):4.0%}"
+                              for stage in pipeline.stages.values())
+            print(f"パイプライン（書き出し{writers}） {pipeline.wall:7.2f} s  "
+                  f"x{sequential / pipeline.wall:4.2f}  稼働率: {usage}")
+
+
+if __name__ == "__main__":
+    main()
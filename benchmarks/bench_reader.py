@@ -0,0 +1,49 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from read_excel import InputData  # noqa: E402
+from synthetic import write_workbook  # noqa: E402
+
+"""座標入力シート読み込みエンジン（fast / pandas）の比較ベンチマーク"""
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--situations", type=int, nargs="+", default=[10, 100, 300])
+    parser.add_argument("--points", type=int, default=360)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    print(f"{'状況数':>6} {'点数':>6} {'pandas[s]':>10} {'fast[s]':>10} {'倍率':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_situations in args.situations:
+            path = write_workbook(os.path.join(tmp, f"bench_{n_situations}.xlsx"),
+                                  n_situations=n_situations, n_points=args.points)
+            fast = InputData.from_excel(path, engine="fast")
+            slow = InputData.from_excel(path, engine="pandas")
+            assert all(np.array_equal(a.coord.values, b.coord.values, equal_nan=True)
+                       for a, b in zip(fast, slow))
+            t_pandas = _best_of(lambda: InputData.from_excel(path, engine="pandas"), args.repeat)
+            t_fast = _best_of(lambda: InputData.from_excel(path, engine="fast"), args.repeat)
+            print(f"{n_situations:>6} {args.points:>6} {t_pandas:>10.3f} {t_fast:>10.3f} {t_pandas / t_fast:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
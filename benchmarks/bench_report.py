@@ -0,0 +1,99 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from constants import COORD_COLUMNS  # noqa: E402
+from read_excel import InputData, InputProperty  # noqa: E402
+from calculate import main_calculation_flow  # noqa: E402
+from report_writer import ReportWriter  # noqa: E402
+from synthetic import write_workbook  # noqa: E402
+
+"""計算結果レポートの書き出し（旧: pandas.to_excel + openpyxl / 新: ReportWriter）の比較ベンチマーク"""
+
+
+def legacy_write_report(results, file_name):
+    """旧実装: ブロックごとに DataFrame.to_excel で書き、見出しをセル単位で装飾する"""
+    import pandas as pd
+    from openpyxl.styles import Alignment, Font, Border, Side
+
+    def merge_header(worksheet, text, start_col, end_col):
+        side = Side(style='thin', color='000000')
+        for col in range(start_col, end_col + 1):
+            worksheet.cell(row=1, column=col).border = Border(top=side, left=side, right=side, bottom=side)
+        header_cell = worksheet.cell(row=1, column=start_col)
+        header_cell.value = text
+        header_cell.alignment = Alignment(horizontal='center', vertical='center')
+        header_cell.font = Font(bold=True)
+        worksheet.merge_cells(start_row=1, start_column=start_col, end_row=1, end_column=end_col)
+
+    with pd.ExcelWriter(file_name, engine="openpyxl") as writer:
+        for res in results:
+            sheet_name = res.situation[:30]
+            worksheet = writer.book.create_sheet(title=sheet_name)
+            writer.sheets[sheet_name] = worksheet
+            blocks = [(res.std_situation, pd.DataFrame(res.std_coord, columns=COORD_COLUMNS), 0),
+                      (res.situation, pd.DataFrame(res.sorted_coord, columns=COORD_COLUMNS), 0),
+                      ("内径変化量", pd.DataFrame(res._create_dia_columns()), 1),
+                      ("半径変化量", pd.DataFrame(res._create_rad_columns()), 1)]
+            col = 1
+            for title, frame, gap in blocks:
+                col += gap
+                frame.to_excel(writer, sheet_name=sheet_name, index=False, startrow=1, startcol=col - 1)
+                merge_header(worksheet, title, col, col + frame.shape[1] - 1)
+                col += frame.shape[1]
+
+
+def write_report(results, file_name):
+    with ReportWriter(file_name) as writer:
+        for res in results:
+            res.write_to_output_excel_sheet(writer)
+
+
+def _measure(func, *args) -> tuple:
+    """(経過時間[s], ピークメモリ[MiB]) を返す（メモリは別の実行で計測する）"""
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--situations", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--points", type=int, default=3600)
+    parser.add_argument("--legacy-max", type=int, default=10,
+                        help="旧実装を計測する最大の状況数（大きいと数分かかる）")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    print(f"{'状況数':>6} {'点数':>6} {'旧[s]':>8} {'旧[MiB]':>8} {'新[s]':>8} {'新[MiB]':>8} {'ファイル[MiB]':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_situations in args.situations:
+            path = write_workbook(os.path.join(tmp, f"bench_{n_situations}.xlsx"),
+                                  n_situations=n_situations, n_points=args.points)
+            props = InputProperty.from_excel(path)
+            results = [res for res in main_calculation_flow(path, props, InputData.from_excel(path))
+                       if not res.is_standard]
+
+            new_file = os.path.join(tmp, f"new_{n_situations}.xlsx")
+            t_new, mem_new = _measure(write_report, results, new_file)
+            size = os.path.getsize(new_file) / 2**20
+            if n_situations <= args.legacy_max:
+                t_old, mem_old = _measure(legacy_write_report, results, os.path.join(tmp, f"old_{n_situations}.xlsx"))
+                old = f"{t_old:>8.2f} {mem_old:>8.1f}"
+            else:
+                old = f"{'-':>8} {'-':>8}"
+            print(f"{n_situations:>6} {args.points:>6} {old} {t_new:>8.2f} {mem_new:>8.1f} {size:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from least_squares import calc_corrected_roundness_batch  # noqa: E402
+from result import lsm_angles  # noqa: E402
+from roundness import zone_roundness  # noqa: E402
+from synthetic import make_profile  # noqa: E402
+
+"""MZC・MCC・MIC の真円度（交換法）の計算時間と、中心の格子探索（素朴な方法）との比較ベンチマーク"""
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def make_polar(n_profiles: int, n_points: int, rng: np.random.Generator) -> tuple:
+    """合成プロファイルの最小二乗円の中心から見た (角度, 補正半径変化量[μm])（(プロファイル数, 2*点数)）"""
+    coords = np.stack([make_profile(n_points, ovality=0.002 * (i + 1), noise=0.0005, rng=rng)
+                       for i in range(n_profiles)])
+    # 行をシャッフルしたままでも角度と偏差の対応は保たれる
+    lsm = calc_corrected_roundness_batch(coords, std_radius=40.0)
+    return lsm_angles(coords, lsm.cx, lsm.cy), np.concatenate([lsm.cap, lsm.rod], axis=-1)
+
+
+def grid_mzc(theta: np.ndarray, rho: np.ndarray, half_width: float, n_grid: int) -> float:
+    """最小二乗円の中心の周りの格子点すべてで偏差の最大値 - 最小値を求め、その最小値を返す（O(格子点数 × 点数)）"""
+    offsets = np.linspace(-half_width, half_width, n_grid)
+    cos, sin = np.cos(theta), np.sin(theta)
+    best = np.inf
+    for a in offsets:
+        deviation = rho[None, :] - a * cos[None, :] - offsets[:, None] * sin[None, :]
+        best = min(best, float((deviation.max(axis=1) - deviation.min(axis=1)).min()))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="1プロファイルあたりの総点数（cap + rod）")
+    parser.add_argument("--profiles", type=int, default=16, help="一括で計算するプロファイル（状況）数")
+    parser.add_argument("--grid", type=int, default=101, help="格子探索の1辺の格子点数")
+    parser.add_argument("--grid-max", type=int, default=10_000, help="格子探索を行う最大の点数")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'点数':>9} {'一括[ms]':>9} {'1本[ms]':>9} {'MZC[μm]':>9} {'MCC[μm]':>9} {'MIC[μm]':>9} "
+          f"{'LSM[μm]':>9} {'格子[ms]':>10} {'格子MZC':>9}")
+    for n_points in args.points:
+        theta, rho = make_polar(args.profiles, n_points // 2, rng)
+        result = zone_roundness(theta, rho)
+        t_batch = _best_of(lambda: zone_roundness(theta, rho), args.repeat)
+        t_single = _best_of(lambda: zone_roundness(theta[0], rho[0]), args.repeat)
+        lsm = rho[0].max() - rho[0].min()
+        grid = f"{'-':>10} {'-':>9}"
+        if n_points <= args.grid_max:
+            # 格子の範囲は MZC の中心を含むように取る（格子探索の結果は格子の細かさの分だけ大きくなる）
+            half_width = 1.5 * float(np.abs(result.mzc_center[0]).max()) + 0.1
+            start = time.perf_counter()
+            grid_value = grid_mzc(theta[0], rho[0], half_width, args.grid)
+            grid = f"{(time.perf_counter() - start) * 1e3:>10.1f} {grid_value:>9.4f}"
+        print(f"{n_points:>9} {t_batch * 1e3:>9.1f} {t_single * 1e3:>9.2f} {result.mzc[0]:>9.4f} "
+              f"{result.mcc[0]:>9.4f} {result.mic[0]:>9.4f} {lsm:>9.4f} {grid}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from synthetic import LINE_COLORS, make_profile, write_workbook  # noqa: E402
+
+"""計算サービス（service.py）の負荷試験: 一定の同時接続数でリクエストを送り、スループットと遅延を測る"""
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(url: str, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=1.0):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f"サービスが起動しませんでした: {url}")
+
+
+def _json_payload(n_situations: int, n_points: int) -> bytes:
+    """/calculate に送る合成データ（1番目の状況が基準）"""
+    rng = np.random.default_rng(0)
+    situations = []
+    for i in range(n_situations):
+        profile = make_profile(n_points, radius=40.0 + 0.001 * i, ovality=0.005 * i,
+                               noise=0.0005, sliding=0.002 * i, rng=rng)
+        situations.append({"situation": "基準" if i == 0 else f"条件{i}", "is_standard": i == 0,
+                           "fft": i % 2 == 0, "line_color": LINE_COLORS[i % len(LINE_COLORS)],
+                           "coord": profile.tolist()})
+    settings = {"threshold_dia": 0.24, "threshold_rad": 0.24, "threshold_lsm": 0.24,
+                "is_auto": "手動", "max_val": 30, "min_val": -20, "interval": 10, "rotation": 0}
+    return json.dumps({"settings": settings, "situations": situations}).encode("utf-8")
+
+
+def _request(url: str, body: bytes, content_type: str) -> tuple:
+    """(成否, 遅延[s], HTTPステータス) を返す"""
+    request = urllib.request.Request(url, data=body, method="POST", headers={"Content-Type": content_type})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, ConnectionError):
+        status = 0
+    return status == 200, time.perf_counter() - start, status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="試験するサービスのURL（省略時は service.py を起動して試験する）")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="起動するサービスのワーカー数")
+    parser.add_argument("--endpoint", choices=["workbook", "calculate"], default="calculate")
+    parser.add_argument("--requests", type=int, default=200, help="送るリクエストの数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4], help="同時接続数")
+    parser.add_argument("--situations", type=int, default=4)
+    parser.add_argument("--points", type=int, default=360)
+    parser.add_argument("--options", default="", help="クエリ文字列（例: profiles=1&graphs=1）")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    server = None
+    url = args.url
+    if url is None:
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, "service.py"), "--port", str(port),
+                                   "-j", str(args.workers), "--max-queue", str(max(args.concurrency) * 2)],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_until_ready(url)
+        with tempfile.TemporaryDirectory() as tmp:
+            if args.endpoint == "workbook":
+                path = write_workbook(os.path.join(tmp, "bench.xlsx"), n_situations=args.situations,
+                                      n_points=args.points)
+                with open(path, "rb") as f:
+                    body = f.read()
+                content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            else:
+                body = _json_payload(args.situations, args.points)
+                content_type = "application/json"
+        target = f"{url}/{args.endpoint}" + (f"?{args.options}" if args.options else "")
+
+        _request(target, body, content_type)     # 1回目（ワーカーの初回実行分）は集計しない
+        print(f"{args.endpoint}  状況数={args.situations}  点数={args.points}  本文={len(body) / 1024:.0f} KiB")
+        print(f"{'同時接続':>8} {'件数':>6} {'失敗':>6} {'RPS':>8} {'平均[ms]':>9} {'p50[ms]':>9} {'p99[ms]':>9}")
+        for concurrency in args.concurrency:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                outcomes = list(pool.map(lambda _: _request(target, body, content_type), range(args.requests)))
+            elapsed = time.perf_counter() - start
+            latencies = np.array([latency for ok, latency, _ in outcomes if ok]) * 1e3
+            n_failed = sum(1 for ok, _, _ in outcomes if not ok)
+            if len(latencies) == 0:
+                print(f"{concurrency:>8} {args.requests:>6} {n_failed:>6}  全て失敗しました")
+                continue
+            print(f"{concurrency:>8} {args.requests:>6} {n_failed:>6} {len(latencies) / elapsed:>8.1f} "
+                  f"{latencies.mean():>9.1f} {np.percentile(latencies, 50):>9.1f} {np.percentile(latencies, 99):>9.1f}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+"""
+起動時間（python -X importtime）のベンチマーク
+
+段階ごとに import するモジュールを別プロセスで読み込み、合計の読み込み時間と
+読み込んではいけない重いライブラリが読み込まれていないかを確認する。
+予算超過や禁止ライブラリの読み込みがあれば終了コード1を返す（回帰の検出用）。
+"""
+
+
+class Scenario(NamedTuple):
+    name: str
+    statement: str
+    forbidden: Tuple[str, ...]
+    budget_ms: float
+
+
+SCENARIOS = [
+    # 対話入力（response）やCLIの引数解析までに必要な読み込み
+    Scenario("cli", "import main", ("pandas", "openpyxl", "matplotlib"), 300.0),
+    # グラフなし（--no-plots）の計算経路
+    Scenario("compute", "import main, read_excel, calculate", ("matplotlib", "openpyxl"), 1500.0),
+    # グラフ描画まで含む経路（参考値）
+    Scenario("plot", "import main, calculate, plotter, matplotlib.figure", (), 3000.0),
+]
+
+
+def import_times(statement: str) -> Dict[str, Tuple[int, int]]:
+    """
+    python -X importtime の出力を解析し、モジュール名 -> (自身[us], 累計[us]) を返す
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                          cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def top_level_total(times: Dict[str, Tuple[int, int]]) -> float:
+    """全モジュールの自身の時間の合計 [ms]（= 読み込み時間の合計）"""
+    return sum(self_us for self_us, _ in times.values()) / 1e3
+
+
+def heaviest(times: Dict[str, Tuple[int, int]], n: int) -> List[Tuple[str, float]]:
+    """累計時間の大きい最上位パッケージ n 件 [ms]"""
+    roots = {name: cumulative for name, (_, cumulative) in times.items() if "." not in name}
+    return [(name, us / 1e3) for name, us in sorted(roots.items(), key=lambda kv: -kv[1])[:n]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenarios", nargs="+", choices=[s.name for s in SCENARIOS],
+                        default=[s.name for s in SCENARIOS])
+    parser.add_argument("--repeat", type=int, default=3, help="繰り返し回数（最小値を採用）")
+    parser.add_argument("--top", type=int, default=5, help="表示する重いパッケージの件数")
+    args = parser.parse_args()
+
+    failed = False
+    for scenario in SCENARIOS:
+        if scenario.name not in args.scenarios:
+            continue
+        runs = [import_times(scenario.statement) for _ in range(args.repeat)]
+        totals = [top_level_total(times) for times in runs]
+        best = runs[totals.index(min(totals))]
+        loaded = [name for name in scenario.forbidden if name in best]
+        over_budget = min(totals) > scenario.budget_ms
+        status = "NG" if loaded or over_budget else "OK"
+        failed |= status == "NG"
+
+        print(f"[{status}] {scenario.name:<8} {min(totals):8.1f} ms (予算 {scenario.budget_ms:.0f} ms)  {scenario.statement}")
+        for name, ms in heaviest(best, args.top):
+            print(f"         {name:<24} {ms:8.1f} ms")
+        if loaded:
+            print(f"         読み込んではいけないモジュール: {', '.join(loaded)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
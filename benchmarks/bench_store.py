@@ -0,0 +1,44 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from read_excel import InputData, InputProperty  # noqa: E402
+from calculate import main_calculation_flow  # noqa: E402
+from result import metrics_table  # noqa: E402
+from results_store import ResultsStore  # noqa: E402
+from synthetic import write_workbook  # noqa: E402
+
+"""計算結果データベースへの登録時間のベンチマーク（1ブック=1トランザクション）"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=500, help="登録する実行（ブック）の数")
+    parser.add_argument("--situations", type=int, default=10)
+    parser.add_argument("--points", type=int, default=3600)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_workbook(os.path.join(tmp, "bench.xlsx"), n_situations=args.situations, n_points=args.points)
+        props = InputProperty.from_excel(path)
+        results = main_calculation_flow(path, props, InputData.from_excel(path))
+        metrics_table(results)
+
+        print(f"{'プロファイル':>8} {'件数':>6} {'合計[s]':>8} {'1件[ms]':>8} {'DB[MiB]':>8}")
+        for profiles in (False, True):
+            store = ResultsStore(os.path.join(tmp, f"store_{int(profiles)}.db"))
+            start = time.perf_counter()
+            for _ in range(args.files):
+                store.add_run(path, results, props=props, profiles=profiles)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(store.db_path) / 2**20
+            print(f"{str(profiles):>8} {args.files:>6} {elapsed:>8.2f} {elapsed / args.files * 1e3:>8.2f} {size:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
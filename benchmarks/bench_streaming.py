@@ -0,0 +1,73 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from read_excel import InputData, InputProperty  # noqa: E402
+from calculate import main_calculation_flow, iter_calculation_flow  # noqa: E402
+from result import METRIC_COLUMNS  # noqa: E402
+from synthetic import make_profile, LINE_COLORS  # noqa: E402
+
+"""
+main_calculation_flow（全結果を一括で作る）と iter_calculation_flow（状況ごとに返す）の
+評価値の書き出しにかかる時間とピークメモリの比較ベンチマーク（入力の座標はどちらも保持したまま計測する）
+"""
+
+
+def make_inputs(n_situations: int, n_points: int):
+    rng = np.random.default_rng(0)
+    all_data = []
+    for i in range(n_situations):
+        profile = make_profile(n_points, radius=40.0 + 0.001 * i, ovality=0.005 * i,
+                               noise=0.0005, sliding=0.002 * i, rng=rng)
+        all_data.append(InputData.from_array("基準" if i == 0 else f"条件{i}", profile, fft_on_or_off=i % 2 == 0,
+                                             is_standard=i == 0, line_color=LINE_COLORS[i % len(LINE_COLORS)]))
+    props = InputProperty.from_dict({"threshold_dia": 0.24, "threshold_rad": 0.24, "threshold_lsm": 0.24,
+                                     "is_auto": "自動"})
+    return props, all_data
+
+
+def export_metrics(results) -> list:
+    """評価値だけを行にして返す（データベース・CSVへの書き出しに相当）"""
+    return [(res.situation, *(float(getattr(res, attr)) for _, attr in METRIC_COLUMNS)) for res in results]
+
+
+def _measure(func) -> tuple:
+    """(経過時間[s], ピークメモリ[MiB]) を返す（メモリは別の実行で計測する）"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--situations", type=int, default=16)
+    parser.add_argument("--points", type=int, nargs="+", default=[10_000, 100_000, 500_000],
+                        help="cap側・rod側それぞれの点数")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    print(f"{'状況数':>6} {'点数':>8} {'一括[s]':>8} {'一括[MiB]':>10} {'逐次[s]':>8} {'逐次[MiB]':>10}")
+    for n_points in args.points:
+        props, all_data = make_inputs(args.situations, n_points)
+        eager = lambda: export_metrics(main_calculation_flow("bench", props, all_data))
+        lazy = lambda: export_metrics(iter_calculation_flow("bench", props, all_data))
+        assert eager() == lazy()
+        t_eager, mem_eager = _measure(eager)
+        t_lazy, mem_lazy = _measure(lazy)
+        print(f"{args.situations:>6} {n_points:>8} {t_eager:>8.2f} {mem_eager:>10.1f} "
+              f"{t_lazy:>8.2f} {mem_lazy:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
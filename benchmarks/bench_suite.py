@@ -0,0 +1,177 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import instrument  # noqa: E402
+from read_excel import InputData, InputProperty  # noqa: E402
+from calculate import main_calculation_flow  # noqa: E402
+from result import metrics_table  # noqa: E402
+from report_writer import ReportWriter  # noqa: E402
+from synthetic import write_workbook  # noqa: E402
+
+"""
+処理段ごとのベンチマークスイート
+
+合成入力ブックを規模（状況数 × 点数）ごとに作成し、読み込みからレポート作成までの各段の時間を計測して
+JSONに保存する。--compare で以前の結果（別のコミットで保存したJSON）と比べられる。
+ネットワーク接続は不要（入力はすべてその場で生成する）。
+
+    python benchmarks/bench_suite.py --tiers small medium -o before.json
+    python benchmarks/bench_suite.py --tiers small medium -o after.json --compare before.json
+
+main_calculation_flow の内訳（sort・change・calc_corrected_roundness・activate_fft）は、
+instrument の計測区間から取り出す（本番と同じ一括計算の経路を計測する）。
+速度比は 比較前の最良時間 / 今回の最良時間（1より大きければ速くなった）。
+"""
+
+TIERS = {
+    "small": (4, 360),
+    "medium": (8, 3600),
+    "large": (16, 20000),
+}
+FLOW_SPANS = ("sort", "change", "calc_corrected_roundness", "activate_fft")
+SETTINGS = dict(ovality=0.005, noise=0.0005, sliding=0.002, fft_every=2, seed=0)
+
+
+def _git_commit() -> dict:
+    """計測したコミット（git が使えない場合は空）"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip() != ""
+    except (OSError, subprocess.CalledProcessError):
+        return {}
+    return {"commit": commit, "dirty": dirty}
+
+
+def _environment() -> dict:
+    import matplotlib
+    import numpy
+    import openpyxl
+    import pandas
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        **_git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "openpyxl": openpyxl.__version__,
+        "matplotlib": matplotlib.__version__,
+    }
+
+
+def _timed(timings: dict, name: str, func):
+    """func を実行して経過時間を timings[name] に追加し、戻り値を返す"""
+    start = time.perf_counter()
+    value = func()
+    timings.setdefault(name, []).append(time.perf_counter() - start)
+    return value
+
+
+def run_once(path: str, out_dir: str, timings: dict, plots: bool) -> None:
+    """1つのブックを全段通して処理し、段ごとの時間を timings に追加する"""
+    props = _timed(timings, "InputProperty.from_excel", lambda: InputProperty.from_excel(path))
+    all_data = _timed(timings, "InputData.from_excel", lambda: InputData.from_excel(path))
+
+    recorder = instrument.enable()
+    try:
+        results = _timed(timings, "main_calculation_flow",
+                         lambda: main_calculation_flow(file_path=path, props=props, all_data=all_data))
+    finally:
+        instrument.disable()
+    summary = recorder.summary()
+    for name in FLOW_SPANS:
+        if name in summary:
+            timings.setdefault(name, []).append(summary[name]["wall"])
+
+    _timed(timings, "metrics_table", lambda: metrics_table(results))
+    w_file_name = os.path.join(out_dir, "結果_bench.xlsx")
+    if plots:
+        from plotter import Plotter
+        plotter = Plotter(results=results, props=props, write_filename=w_file_name)
+        with contextlib.redirect_stdout(io.StringIO()):     # 保存したファイル名の表示を抑える
+            _timed(timings, "Plotter.plot_all_graphs", plotter.plot_all_graphs)
+
+    def write_report():
+        with ReportWriter(w_file_name) as writer:
+            for a_result in results:
+                if not a_result.is_standard:
+                    a_result.write_to_output_excel_sheet(writer)
+    _timed(timings, "write_report", write_report)
+
+
+def run_tier(name: str, n_situations: int, n_points: int, repeat: int, plots: bool) -> dict:
+    """1つの規模について各段を repeat 回計測し、段ごとの最良・平均時間を返す"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"bench_{name}.xlsx")
+        start = time.perf_counter()
+        write_workbook(path, n_situations=n_situations, n_points=n_points, **SETTINGS)
+        generate = time.perf_counter() - start
+        timings: dict = {}
+        for _ in range(repeat):
+            run_once(path, tmp, timings, plots)
+        size = os.path.getsize(path)
+    stages = {stage: {"best": min(values), "mean": sum(values) / len(values), "runs": len(values)}
+              for stage, values in timings.items()}
+    return {"situations": n_situations, "points": n_points, "workbook_bytes": size,
+            "generate": generate, "stages": stages}
+
+
+def print_tier(name: str, tier: dict, baseline: dict | None) -> None:
+    print(f"\n[{name}] {tier['situations']}状況 × {tier['points']}点"
+          f"（ブック {tier['workbook_bytes'] / 2**20:.1f} MiB、作成 {tier['generate']:.2f} s）")
+    base_stages = (baseline or {}).get("stages", {})
+    header = f"{'段':<28} {'最良[ms]':>10} {'平均[ms]':>10}"
+    print(header + (f" {'比較前[ms]':>11} {'速度比':>7}" if baseline else ""))
+    for stage, values in tier["stages"].items():
+        line = f"{stage:<28} {values['best'] * 1e3:>10.2f} {values['mean'] * 1e3:>10.2f}"
+        if stage in base_stages:
+            before = base_stages[stage]["best"]
+            line += f" {before * 1e3:>11.2f} {before / values['best'] if values['best'] > 0 else 0:>6.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="処理段ごとのベンチマークスイート")
+    parser.add_argument("--tiers", nargs="+", choices=TIERS, default=["small", "medium"],
+                        help="計測する規模（" + "、".join(f"{k}: {s}状況×{p}点" for k, (s, p) in TIERS.items()) + "）")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-plots", dest="plots", action="store_false", help="グラフ描画を計測しない")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="結果を保存するJSON")
+    parser.add_argument("--compare", help="比較する以前の結果（JSON）")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f).get("tiers", {})
+
+    report = {"environment": _environment(), "settings": {**SETTINGS, "repeat": args.repeat}, "tiers": {}}
+    for name in args.tiers:
+        n_situations, n_points = TIERS[name]
+        tier = run_tier(name, n_situations, n_points, args.repeat, args.plots)
+        report["tiers"][name] = tier
+        print_tier(name, tier, baseline.get(name))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n結果を保存しました: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+
+import numpy as np
+from openpyxl import Workbook
+
+"""
+ベンチマーク用の合成入力ブック（座標入力・設定シート）を作成するモジュール
+
+コマンドラインから実行すると、指定した条件の入力ブックを1つ書き出す。
+
+    python benchmarks/synthetic.py 合成.xlsx --situations 8 --points 3600 --ovality 0.01 --noise 0.001
+"""
+
+LINE_COLORS = ["青（点線）", "赤", "緑", "黒", "赤（点線）", "青", "緑（点線）", "黒（点線）"]
+
+
+def make_profile(n_points: int, radius: float = 40.0, ovality: float = 0.0,
+                 noise: float = 0.0, sliding: float = 0.0,
+                 rng: np.random.Generator | None = None) -> np.ndarray:
+    """
+    cap側（上半分）とrod側（下半分）の円弧座標を (n_points, 4) = [cap_y, cap_x, rod_y, rod_x] で返す。
+    ovality は2次の楕円成分 [mm]、noise は半径方向の正規ノイズの標準偏差 [mm]、
+    sliding は rod側のx方向のずれ [mm]。行の並びはシャッフルする。
+    """
+    rng = rng if rng is not None else np.random.default_rng(0)
+    theta = np.linspace(0.0, np.pi, n_points + 2)[1:-1]
+    cap_r = radius + ovality * np.cos(2 * theta) + rng.normal(0.0, noise, n_points)
+    rod_r = radius + ovality * np.cos(2 * theta) + rng.normal(0.0, noise, n_points)
+    profile = np.column_stack([
+        cap_r * np.sin(theta),
+        -cap_r * np.cos(theta),
+        -rod_r * np.sin(theta),
+        rod_r * np.cos(theta) + sliding,
+    ])
+    return profile[rng.permutation(n_points)]
+
+
+def write_workbook(path: str, n_situations: int = 4, n_points: int = 360, seed: int = 0,
+                   radius: float = 40.0, ovality: float = 0.005, noise: float = 0.0005,
+                   sliding: float = 0.002, fft_every: int = 2) -> str:
+    """
+    合成ブックを書き出す。1列目の状況が基準、以降の状況ほど楕円成分・ずれが大きくなる。
+    fft_every 個おきにFFTをonにする（0なら全てoff）。
+    """
+    rng = np.random.default_rng(seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("座標入力")
+
+    profiles = []
+    row1, row2, row3, row4 = [], [], [], []
+    for i in range(n_situations):
+        profiles.append(make_profile(n_points, radius=radius + 0.001 * i, ovality=ovality * i,
+                                     noise=noise, sliding=sliding * i, rng=rng))
+        is_fft = fft_every > 0 and i % fft_every == 0
+        row1 += ["基準" if i == 0 else f"条件{i}", None, None, None]
+        row2 += ["FFT \nOn or Off↓", "基準マーカー↓", "グラフ線の色↓", "エラーチェック↓"]
+        row3 += ["on" if is_fft else "off", "基準とする" if i == 0 else "変化量を求める",
+                 LINE_COLORS[i % len(LINE_COLORS)], "行数OK"]
+        row4 += ["cap_y", "cap_x", "rod_y", "rod_x"]
+    for row in (row1, row2, row3, row4):
+        ws.append(row)
+    data = np.hstack(profiles)
+    for row in data.tolist():
+        ws.append(row)
+
+    setting = wb.create_sheet("設定")
+    cells = {(4, 3): 0.24, (4, 4): 0.24, (4, 5): 0.24, (5, 3): "手動",
+             (6, 3): 30, (7, 3): -20, (8, 3): 10, (3, 7): 0}
+    for r in range(1, 9):
+        setting.append([cells.get((r, c)) for c in range(1, 8)])
+    wb.save(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ベンチマーク用の合成入力ブックを作成する")
+    parser.add_argument("path", help="書き出すブック（.xlsx）")
+    parser.add_argument("--situations", type=int, default=4, help="状況の数（1列目が基準、既定: 4）")
+    parser.add_argument("--points", type=int, default=360, help="cap側・rod側それぞれの点数（既定: 360）")
+    parser.add_argument("--radius", type=float, default=40.0, help="半径 [mm]（既定: 40）")
+    parser.add_argument("--ovality", type=float, default=0.005,
+                        help="状況1つごとに増える楕円成分 [mm]（既定: 0.005）")
+    parser.add_argument("--noise", type=float, default=0.0005, help="半径方向のノイズの標準偏差 [mm]（既定: 0.0005）")
+    parser.add_argument("--sliding", type=float, default=0.002,
+                        help="状況1つごとに増える rod側のずれ [mm]（既定: 0.002）")
+    parser.add_argument("--fft-every", type=int, default=2, help="何個おきにFFTをonにするか（0で全てoff、既定: 2）")
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード（既定: 0）")
+    args = parser.parse_args()
+    write_workbook(args.path, n_situations=args.situations, n_points=args.points, seed=args.seed,
+                   radius=args.radius, ovality=args.ovality, noise=args.noise, sliding=args.sliding,
+                   fft_every=args.fft_every)
+    print(f"作成しました: {args.path}（{args.situations}状況 × {args.points}点）")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,170 +1,481 @@
-import os
-import re
-import sys
-import csv
 import pandas as pd
 import numpy  as np
-import matplotlib.pyplot as plt
-import math
-import openpyxl
-from openpyxl.styles import Alignment, Font
 from dataclasses import dataclass
-from typing import List
+from typing import Iterator, List, NamedTuple
 from abc import ABC, abstractmethod
 from read_excel import *
 from file_utils import *
 from least_squares import *
 from result import *
+from instrument import span
 
-def activate_fft(amount_of_change, threshold) -> List[float]:   
-  """FFT -> フィルター -> 逆FFT を行い、平滑化されたデータを返すメソッド"""
-  original_len = len(amount_of_change)
-  signal = np.array(amount_of_change)
-  
+FFT_CHUNK_SAMPLES = 1 << 21    # smooth_fft_batch で1度に変換する信号の合計点数の目安
+
+def smooth_fft_batch(signals, thresholds) -> np.ndarray:
+  """
+  複数の信号 (信号数, 点数) をまとめて FFT -> フィルター -> 逆FFT し、平滑化された配列を返すメソッド
+  thresholds はスカラーまたは信号ごとのしきい値 (信号数,)。
+  反転連結した信号は実数なので実数FFT（rfft/irfft）で半分のスペクトルだけを扱う。
+  """
+  signals = np.asarray(signals, dtype=float)
+  if signals.shape[-1] == 0:
+    return signals.copy()
+  thresholds = np.broadcast_to(np.asarray(thresholds, dtype=float), signals.shape[:-1])
+  # 長い信号では複素スペクトルなどの作業配列が大きくなるため、一定の点数ごとに分けて処理する
+  rows_per_chunk = max(1, FFT_CHUNK_SAMPLES // signals.shape[-1])
+  if signals.shape[0] <= rows_per_chunk:
+    return _smooth_fft_chunk(signals, thresholds)
+  smoothed = np.empty_like(signals)
+  for start in range(0, signals.shape[0], rows_per_chunk):
+    rows = slice(start, start + rows_per_chunk)
+    smoothed[rows] = _smooth_fft_chunk(signals[rows], thresholds[rows])
+  return smoothed
+
+def _smooth_fft_chunk(signals: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+  fft_result, power = mirrored_spectrum(signals)
+  filter_mask = power >= thresholds[..., None]
+  fft_result *= filter_mask
+  return inverse_mirrored_spectrum(fft_result, signals.shape[-1])
+
+def mirrored_spectrum(signals: np.ndarray) -> tuple:
+  """
+  反転連結した信号の実数FFTスペクトルとパワー（振幅/長さ）を返すメソッド
+  """
   # 信号を反転させて連結し、周期的な境界の不連続性をなくす
   # 例: [1, 2, 3] -> [1, 2, 3, 3, 2, 1]
-  padded_signal = np.concatenate([signal, signal[::-1]])
-
-  # FFT、フィルタリング、逆FFT
-  fft_result = np.fft.fft(padded_signal)
-  power = np.abs(fft_result) / len(padded_signal) 
-  filter_mask = power >= threshold
-  filtered_fft = fft_result * filter_mask
-  
-  inverse_fft_result = np.fft.ifft(filtered_fft)
-  
-  # パディング部分を捨てて元の長さに戻す
-  smoothed_signal = inverse_fft_result.real[:original_len]
-  
-  return smoothed_signal.tolist()
-  
-  # fft = np.fft.fft(amount_of_change)
-  # power = np.abs(fft/len(amount_of_change))
-  # filter = list(
-  # map(float, power >= threshold)
-  # )
-  # filtered = fft * filter
-  # inv_fft = np.fft.ifft(filtered)
-  # inv_fft_real = inv_fft.real.tolist()
-  # return inv_fft_real
-
-def cap_rod_concat(cap: list, rod:list) -> List[float]:
-  """capとrodを連結して一続きにするメソッド"""
-  change_radius = cap + rod
-  change_radius.append(change_radius[0])
-  return change_radius
-
-def main_calculation_flow(file_path:str, props: InputProperty) -> List[BaseResult]:
-  # それぞれのクラスをインスタンス化
-  all_data = InputData.from_excel(file_path)
-  
-  #エラーのないものをフィルタリング
-  valid_data = [data for data in all_data if not data.is_error]
+  padded_signal = np.concatenate([signals, signals[..., ::-1]], axis=-1)
+  fft_result = np.fft.rfft(padded_signal, axis=-1)
+  power = np.abs(fft_result) / padded_signal.shape[-1]
+  return fft_result, power
 
-  #基準マーカをチェック
-  std_data_list : List[InputData] = []
-  non_std_data_list : List[InputData] = []
-  for data in valid_data:
-    if data.is_standard:
-      std_data_list.append(data)
-    else:
-      non_std_data_list.append(data)
+def inverse_mirrored_spectrum(fft_result: np.ndarray, original_len: int) -> np.ndarray:
+  """
+  フィルター後のスペクトルを逆FFTし、パディング部分を捨てて元の長さに戻すメソッド
+  """
+  inverse_fft_result = np.fft.irfft(fft_result, n=2*original_len, axis=-1)
+  return inverse_fft_result[..., :original_len]
 
-  if len(std_data_list) != 1:
-    raise ValueError("基準となるデータは１つだけ設定してください．")
-  std_data = std_data_list[0]
+def activate_fft(amount_of_change, threshold) -> np.ndarray:
+  """FFT -> フィルター -> 逆FFT を行い、平滑化されたデータを返すメソッド（1信号分）"""
+  return smooth_fft_batch(np.asarray(amount_of_change, dtype=float)[None], threshold)[0]
 
-  # valid_data内のcoordinateをソートして，sorted_coordinateに再登録
-  for data in valid_data:
-    sorted_cap = data.coord[["cap_y", "cap_x"]].sort_values(by="cap_x").reset_index(drop=True)
-    sorted_rod = data.coord[["rod_y", "rod_x"]].sort_values(by="rod_x", ascending=False).reset_index(drop=True)
-    sorted_coord = pd.concat([sorted_cap, sorted_rod], axis=1)
-    data.sorted_coord = sorted_coord
+class FFTBatch(NamedTuple):
+  """FFTがONの状況の平滑化結果をまとめて保持するNamedTuple（先頭の軸はFFT対象の状況）"""
+  change_radius : np.ndarray
+  lsm_change_radius : np.ndarray
+  change_diameter : np.ndarray
+
+def calc_fft_batch(change_cap: np.ndarray, change_rod: np.ndarray, lsm_cap: np.ndarray,
+                   lsm_rod: np.ndarray, change_diameter: np.ndarray, props: InputProperty) -> FFTBatch:
+  """
+  FFT対象の状況の cap・rod・補正cap・補正rod・内径 の5種類の信号 (状況数, 点数) を
+  1つの配列に積み上げ、信号ごとのしきい値で1回の実数FFTにまとめて平滑化する
+  """
+  n = change_cap.shape[0]
+  signals = np.concatenate([change_cap, change_rod, lsm_cap, lsm_rod, change_diameter])
+  thresholds = np.repeat([props.threshold_rad, props.threshold_rad, props.threshold_lsm,
+                          props.threshold_lsm, props.threshold_dia], n)
+  smoothed = smooth_fft_batch(signals, thresholds)
+  fft_cap, fft_rod, fft_lsm_cap, fft_lsm_rod, fft_diameter = np.split(smoothed, 5)
+  return FFTBatch(
+    change_radius=cap_rod_concat(fft_cap, fft_rod),
+    lsm_change_radius=cap_rod_concat(fft_lsm_cap, fft_lsm_rod),
+    # 逆FFTの出力（パディング分を含む）全体を保持し続けないよう、内径だけ詰めてコピーする
+    change_diameter=np.ascontiguousarray(fft_diameter),
+  )
+
+def cap_rod_concat(cap, rod) -> np.ndarray:
+  """capとrodを連結して一続きにするメソッド（最後の軸で連結し、始点を末尾に追加する）"""
+  cap = np.asarray(cap)
+  rod = np.asarray(rod)
+  return np.concatenate([cap, rod, cap[..., :1]], axis=-1)
+
+class ChangeBatch(NamedTuple):
+  """全状況の半径・内径変化量をまとめて保持するNamedTuple（先頭の軸が状況）"""
+  change_cap : np.ndarray        # (状況数, 点数)
+  change_rod : np.ndarray        # (状況数, 点数)
+  change_radius : np.ndarray     # (状況数, 2*点数+1)  cap → rod → 始点
+  change_diameter : np.ndarray   # (状況数, 点数)
+  rod_dist : np.ndarray          # (状況数,)  rod側の両端間距離
+  sliding_distance : np.ndarray  # (状況数,)
+  std_radius : float
+  std_rod_dist : float
+  rad_degrees : np.ndarray       # (2*点数+1,)
+  dia_degrees : np.ndarray       # (点数,)
+
+def _nargsort_rows(values: np.ndarray, ascending: bool) -> np.ndarray:
+  """
+  各行の並べ替えインデックスを返す（pandasのsort_valuesと同じ順序、NaNは末尾）
+  """
+  n_cols = values.shape[1]
+  if not np.isnan(values).any():
+    if ascending:
+      return values.argsort(axis=1, kind="quicksort")
+    return (n_cols - 1 - values[:, ::-1].argsort(axis=1, kind="quicksort"))[:, ::-1]
+
+  indexers = np.empty(values.shape, dtype=np.intp)
+  for row, items in enumerate(values):
+    mask = np.isnan(items)
+    non_nans = items[~mask]
+    non_nan_idx = np.arange(n_cols)[~mask]
+    if not ascending:
+      non_nans = non_nans[::-1]
+      non_nan_idx = non_nan_idx[::-1]
+    indexer = non_nan_idx[non_nans.argsort(kind="quicksort")]
+    if not ascending:
+      indexer = indexer[::-1]
+    indexers[row] = np.concatenate([indexer, np.nonzero(mask)[0]])
+  return indexers
+
+def sort_coords(coords: np.ndarray) -> np.ndarray:
+  """
+  (状況数, 点数, 4) の座標配列を、capはcap_xの昇順、rodはrod_xの降順に並べ替える
+  """
+  cap_order = _nargsort_rows(coords[:, :, 1], ascending=True)
+  rod_order = _nargsort_rows(coords[:, :, 3], ascending=False)
+  sorted_coords = np.empty_like(coords)
+  sorted_coords[:, :, 0:2] = np.take_along_axis(coords[:, :, 0:2], cap_order[:, :, None], axis=1)
+  sorted_coords[:, :, 2:4] = np.take_along_axis(coords[:, :, 2:4], rod_order[:, :, None], axis=1)
+  return sorted_coords
+
+class ProfileGeometry(NamedTuple):
+  """ソート済み座標から求める半径・内径（先頭の軸が状況）"""
+  rad_cap : np.ndarray           # (状況数, 点数)
+  rad_rod : np.ndarray           # (状況数, 点数)
+  diameter : np.ndarray          # (状況数, 点数)
+  rod_dist : np.ndarray          # (状況数,)  rod側の両端間距離
+
+def profile_geometry(sorted_coords: np.ndarray) -> ProfileGeometry:
+  """ソート済み座標 (状況数, 点数, 4) から各点の半径・内径とrod側の両端間距離を求める"""
+  cap_y = sorted_coords[:, :, 0]
+  cap_x = sorted_coords[:, :, 1]
+  rod_y = sorted_coords[:, :, 2]
+  rod_x = sorted_coords[:, :, 3]
+  return ProfileGeometry(
+    rad_cap=np.sqrt(cap_y**2 + cap_x**2),
+    rad_rod=np.sqrt(rod_y**2 + rod_x**2),
+    diameter=np.sqrt((cap_y - rod_y)**2 + (cap_x - rod_x)**2),
+    rod_dist=np.sqrt((rod_x[:, 0] - rod_x[:, -1])**2 + (rod_y[:, 0] - rod_y[:, -1])**2),
+  )
+
+def reference_degrees(std_sorted_coord: np.ndarray) -> tuple:
+  """基準のソート済み座標 (点数, 4) から (半径変化量の角度, 内径変化量の角度) を求める"""
+  std_cap_y, std_cap_x = std_sorted_coord[:, 0], std_sorted_coord[:, 1]
+  std_rod_y, std_rod_x = std_sorted_coord[:, 2], std_sorted_coord[:, 3]
+  r_degree = 180 + abs(np.degrees(np.arctan2(std_rod_y, -std_rod_x)))
+  c_degree = abs(np.degrees(np.arctan2(std_cap_y, -std_cap_x)))
+  return np.concatenate([c_degree, r_degree[::-1], c_degree[:1]]), c_degree
+
+def calc_change_batch(sorted_coords: np.ndarray, std_index: int) -> ChangeBatch:
+  """
+  ソート済み座標 (状況数, 点数, 4) から、基準データに対する全状況の変化量をまとめて計算する
+  """
+  rad_cap, rad_rod, diameter, rod_dist = profile_geometry(sorted_coords)
 
   # 基準データから必要なデータを計算
-  std_df = std_data.sorted_coord
-  std_rad_cap = np.sqrt(std_df["cap_y"]**2 + std_df["cap_x"]**2)
-  std_rad_rod = np.sqrt(std_df["rod_y"]**2 + std_df["rod_x"]**2)
+  std_radius = (rad_cap[std_index].mean() + rad_rod[std_index].mean()) / 2
+  std_rod_dist = rod_dist[std_index]
 
-  std_radius = (std_rad_cap.mean() + std_rad_rod.mean()) / 2
-  std_diameter = np.sqrt((std_df["cap_y"] - std_df["rod_y"])**2 + (std_df["cap_x"] - std_df["rod_x"])**2)
-  std_rod_dist = np.sqrt((std_df["rod_x"].iloc[0] - std_df["rod_x"].iloc[-1])**2
-                         + (std_df["rod_y"].iloc[0] - std_df["rod_y"].iloc[-1])**2)
+  change_cap = (rad_cap - rad_cap[std_index])*10**3
+  change_rod = (rad_rod - rad_rod[std_index])*10**3
+  change_radius = cap_rod_concat(change_cap, change_rod)
 
-  r_degree = 180 + abs(np.degrees(np.arctan2(std_df["rod_y"],-std_df["rod_x"])))
-  c_degree = abs(np.degrees(np.arctan2(std_df["cap_y"], -std_df["cap_x"])))
-  rad_degrees = pd.concat([c_degree, r_degree.iloc[::-1]])
-  rad_degrees = pd.concat([rad_degrees, pd.Series(rad_degrees.iloc[0])], ignore_index=True)
-  rad_degrees = rad_degrees.tolist()
-  
+  change_diameter = (diameter - diameter[std_index])*10**3
+  sliding_distance = (std_rod_dist - rod_dist) * 10**3
 
-  dia_degrees = abs(np.degrees(np.arctan2(std_df["cap_y"], -std_df["cap_x"])))
-  dia_degrees = dia_degrees.tolist()
+  rad_degrees, dia_degrees = reference_degrees(sorted_coords[std_index])
 
-  # 変化量を求める
-  calculated_results : List[BaseResult] = []
-  for data in valid_data:
-    coord_df = data.sorted_coord
-
-    rad_cap = np.sqrt(coord_df["cap_y"]**2 + coord_df["cap_x"]**2)
-    rad_rod = np.sqrt(coord_df["rod_y"]**2 + coord_df["rod_x"]**2)
-    change_cap = (rad_cap - std_rad_cap)*10**3
-    change_rod = (rad_rod - std_rad_rod)*10**3
-    change_cap = change_cap.tolist()
-    change_rod = change_rod.tolist()
-    change_radius = cap_rod_concat(change_cap, change_rod)
+  return ChangeBatch(
+    change_cap=change_cap,
+    change_rod=change_rod,
+    change_radius=change_radius,
+    change_diameter=change_diameter,
+    rod_dist=rod_dist,
+    sliding_distance=sliding_distance,
+    std_radius=std_radius,
+    std_rod_dist=std_rod_dist,
+    rad_degrees=rad_degrees,
+    dia_degrees=dia_degrees,
+  )
 
-    lsm_result = calc_corrected_roundness(coord=coord_df, std_radius=std_radius)
-    lsm_change_radius = cap_rod_concat(cap=lsm_result.cap, rod=lsm_result.rod)
+def _split_reference(all_data: List[InputData]) -> tuple:
+  """エラーのないデータと基準データ (有効なデータのリスト, 基準データ) を返す"""
+  #エラーのないものをフィルタリング
+  valid_data = [data for data in all_data if not data.is_error]
+
+  #基準マーカをチェック
+  std_data_list = [data for data in valid_data if data.is_standard]
+  if len(std_data_list) != 1:
+    raise ValueError("基準となるデータは１つだけ設定してください．（複数の基準で比較する場合は comparison.py を使用してください）")
+  return valid_data, std_data_list[0]
 
-    diameter = np.sqrt((coord_df["cap_y"] - coord_df["rod_y"])**2 + (coord_df["cap_x"] - coord_df["rod_x"])**2)
-    change_diameter = (diameter - std_diameter)*10**3
-    change_diameter = change_diameter.tolist()
+def _sorted_coord(data: InputData, n_points: int) -> np.ndarray:
+  """1状況分の座標をソートした (点数, 4) の配列を返す（点数が基準と揃っていなければエラー）"""
+  if len(data.coord) != n_points:
+    raise ValueError(f"状況ごとの点数が揃っていません。 situation: '{data.situation}', "
+                     f"点数: {len(data.coord)}（基準: {n_points}）")
+  return sort_coords(data.coord.to_numpy(dtype=float)[np.newaxis])[0]
 
-     # 共通の引数を辞書として準備
+def main_calculation_flow(file_path:str, props: InputProperty, all_data: List[InputData] | None = None) -> List[BaseResult]:
+  # それぞれのクラスをインスタンス化（読み込み済みのデータがあればそれを使う）
+  if all_data is None:
+    all_data = InputData.from_excel(file_path)
+  valid_data, std_data = _split_reference(all_data)
+
+  # 全状況のソート済み座標を (状況数, 点数, 4) の配列に並べ、変化量計算をまとめて行う
+  # 入力の座標（メモリマップの場合もある）は積み上げずに、状況ごとにソートして書き込む
+  std_index = next(i for i, data in enumerate(valid_data) if data is std_data)
+  n_points = len(std_data.coord)
+  sorted_coords = np.empty((len(valid_data), n_points, std_data.coord.shape[1]))
+  with span("sort", situations=len(valid_data), points=n_points):
+    for i, data in enumerate(valid_data):
+      sorted_coords[i] = _sorted_coord(data, n_points)
+  with span("change", situations=len(valid_data), points=n_points):
+    batch = calc_change_batch(sorted_coords, std_index)
+  reference = ReferenceBlock(
+    situation=std_data.situation,
+    sorted_coord=sorted_coords[std_index],
+    rod_dist=batch.std_rod_dist,
+    rad_degrees=batch.rad_degrees,
+    dia_degrees=batch.dia_degrees,
+  )
+  with span("calc_corrected_roundness", situations=len(valid_data), points=n_points):
+    lsm_batch = calc_corrected_roundness_batch(sorted_coords, batch.std_radius)
+    lsm_change_radius = cap_rod_concat(lsm_batch.cap, lsm_batch.rod)
+
+  # FFTがONの状況の5種類の信号をまとめて平滑化する
+  fft_indices = [i for i, data in enumerate(valid_data) if data.fft_on_or_off]
+  fft_position = {i: j for j, i in enumerate(fft_indices)}
+  if fft_indices:
+    with span("activate_fft", situations=len(fft_indices), points=n_points):
+      fft_batch = calc_fft_batch(batch.change_cap[fft_indices], batch.change_rod[fft_indices],
+                                 lsm_batch.cap[fft_indices], lsm_batch.rod[fft_indices],
+                                 batch.change_diameter[fft_indices], props)
+
+  # 変化量を求める
+  calculated_results : List[BaseResult] = []
+  for i, data in enumerate(valid_data):
+     # 共通の引数を辞書として準備（配列はまとめて計算した配列の行ビュー）
     base_args = {
         "situation": data.situation,
         "fft_on_or_off": data.fft_on_or_off,
         "is_standard": data.is_standard,
         "line_color": data.line_color,
-        "is_error": data.is_error,
-        "coord": data.coord,
-        "change_radius": change_radius,
-        "lsm_change_radius": lsm_change_radius,
-        "change_diameter": change_diameter,
-        "rad_degrees": rad_degrees,
-        "dia_degrees": dia_degrees,
-        "std_rod_dist": std_rod_dist,
-        "std_situation": std_data.situation,
-        "std_coord": std_data.sorted_coord,
-        "lsm_cx": lsm_result.cx,
-        "lsm_cy": lsm_result.cy,
-        "lsm_r": lsm_result.r,
+        "reference": reference,
+        "sorted_coord": sorted_coords[i],
+        "change_radius": batch.change_radius[i],
+        "change_diameter": batch.change_diameter[i],
+        "rod_dist": batch.rod_dist[i],
+    }
+    # 最小二乗円・FFTの配列も計算済みのものを渡す
+    profiles = {
+        "lsm_change_radius": lsm_change_radius[i],
+        "lsm_cx": lsm_batch.cx[i],
+        "lsm_cy": lsm_batch.cy[i],
+        "lsm_r": lsm_batch.r[i],
     }
         
     if data.fft_on_or_off:
-      fft_change_cap = activate_fft(change_cap, props.threshold_rad)
-      fft_change_rod = activate_fft(change_rod, props.threshold_rad)
-      fft_change_radius = cap_rod_concat(cap=fft_change_cap, rod=fft_change_rod)
-      
-      fft_lsm_cap = activate_fft(lsm_result.cap, props.threshold_lsm)
-      fft_lsm_rod = activate_fft(lsm_result.rod, props.threshold_lsm)
-      fft_lsm_change_radius = cap_rod_concat(cap=fft_lsm_cap, rod=fft_lsm_rod)
-
-      fft_change_diameter=activate_fft(change_diameter, props.threshold_dia)
-
-      # FFTResult固有の引数を追加
-      fft_args = {
-          "fft_change_radius": fft_change_radius,
-          "fft_lsm_change_radius": fft_lsm_change_radius,
-          "fft_change_diameter": fft_change_diameter
-      }
-      result = FFTResult(**base_args, **fft_args)
+      j = fft_position[i]
+      # FFTResult固有の配列を追加
+      profiles.update({
+          "fft_change_radius": fft_batch.change_radius[j],
+          "fft_lsm_change_radius": fft_batch.lsm_change_radius[j],
+          "fft_change_diameter": fft_batch.change_diameter[j]
+      })
+      result = FFTResult(**base_args, profiles=profiles)
     else:
-        result = NonFFTResult(**base_args)
-      
-        # sorted_coordは__init__から除外されているので、後から手動で設定する
-    result.sorted_coord = data.sorted_coord
+        result = NonFFTResult(**base_args, profiles=profiles)
     calculated_results.append(result)
     
-  return calculated_results
\ No newline at end of file
+  return calculated_results
+
+@dataclass(frozen=True)
+class LazyProfileLoader:
+  """
+  iter_calculation_flow の結果の最小二乗円・FFTの配列を、初回アクセス時に1状況分だけ計算するクラス。
+  main_calculation_flow と同じ一括計算の関数を1行の配列で呼ぶため、値は一括計算の場合と一致する。
+  """
+  std_radius : float
+  props : InputProperty
+
+  def __call__(self, result: BaseResult, name: str) -> dict:
+    if name in LSM_PROFILES:
+      with span("calc_corrected_roundness", situation=result.situation):
+        lsm = calc_corrected_roundness_batch(result.sorted_coord[np.newaxis], self.std_radius)
+      return {
+          "lsm_change_radius": cap_rod_concat(lsm.cap, lsm.rod)[0],
+          "lsm_cx": lsm.cx[0],
+          "lsm_cy": lsm.cy[0],
+          "lsm_r": lsm.r[0],
+      }
+    # FFTの5種類の信号は変化量・補正半径変化量の cap 部分と rod 部分から作る（補正半径変化量は先に計算される）
+    n_points = len(result.change_diameter)
+    change = result.change_radius[np.newaxis]
+    lsm_change = result.lsm_change_radius[np.newaxis]
+    with span("activate_fft", situation=result.situation):
+      fft = calc_fft_batch(change[:, :n_points], change[:, n_points:2*n_points],
+                           lsm_change[:, :n_points], lsm_change[:, n_points:2*n_points],
+                           result.change_diameter[np.newaxis], self.props)
+    return {
+        "fft_change_radius": fft.change_radius[0],
+        "fft_lsm_change_radius": fft.lsm_change_radius[0],
+        "fft_change_diameter": fft.change_diameter[0],
+    }
+
+def iter_calculation_flow(file_path:str, props: InputProperty, all_data: List[InputData] | None = None) -> Iterator[BaseResult]:
+  """
+  main_calculation_flow と同じ結果を、入力の状況の順に1つずつ返すジェネレーター。
+  基準データだけを先に計算し、状況ごとにソート・変化量の計算をして返す。
+  最小二乗円・FFT・評価値は、その属性に初めてアクセスしたときに計算する。
+  受け取った結果を保持しなければ、全状況の配列を同時にメモリに持たずにレポート・データベースへ書き出せる
+  （グラフは全状況を重ねて描くため、main_calculation_flow を使う）。
+  """
+  if all_data is None:
+    all_data = InputData.from_excel(file_path)
+  valid_data, std_data = _split_reference(all_data)
+
+  n_points = len(std_data.coord)
+  with span("sort", situation=std_data.situation, points=n_points):
+    std_sorted = _sorted_coord(std_data, n_points)
+  std_geometry = profile_geometry(std_sorted[np.newaxis])
+  std_radius = (std_geometry.rad_cap[0].mean() + std_geometry.rad_rod[0].mean()) / 2
+  rad_degrees, dia_degrees = reference_degrees(std_sorted)
+  reference = ReferenceBlock(
+    situation=std_data.situation,
+    sorted_coord=std_sorted,
+    rod_dist=std_geometry.rod_dist[0],
+    rad_degrees=rad_degrees,
+    dia_degrees=dia_degrees,
+  )
+  loader = LazyProfileLoader(std_radius=std_radius, props=props)
+
+  for data in valid_data:
+    if data is std_data:
+      sorted_coord, geometry = std_sorted, std_geometry
+    else:
+      with span("sort", situation=data.situation, points=n_points):
+        sorted_coord = _sorted_coord(data, n_points)
+      geometry = profile_geometry(sorted_coord[np.newaxis])
+    with span("change", situation=data.situation, points=n_points):
+      change_cap = (geometry.rad_cap - std_geometry.rad_cap)*10**3
+      change_rod = (geometry.rad_rod - std_geometry.rad_rod)*10**3
+      change_diameter = (geometry.diameter - std_geometry.diameter)*10**3
+    result_class = FFTResult if data.fft_on_or_off else NonFFTResult
+    yield result_class(
+      situation=data.situation,
+      fft_on_or_off=data.fft_on_or_off,
+      is_standard=data.is_standard,
+      line_color=data.line_color,
+      reference=reference,
+      sorted_coord=sorted_coord,
+      change_radius=cap_rod_concat(change_cap, change_rod)[0],
+      change_diameter=change_diameter[0],
+      rod_dist=geometry.rod_dist[0],
+      loader=loader,
+    )
+
+def multi_reference_flow(file_path:str, props: InputProperty, all_data: List[InputData] | None = None) -> List[BaseResult]:
+  """
+  基準とする列が複数ある場合の比較モード。全ての基準 × 全ての状況の変化量を1回の計算で求める。
+  座標のソートと最小二乗円のあてはめは状況ごとに1度だけ行い、基準の配列 (基準数, 1, 点数) と
+  全状況の配列 (1, 状況数, 点数) のブロードキャストで全ての組み合わせの変化量を求める。
+  戻り値は基準の順に、その基準に対する全状況の結果を並べたリスト
+  （各結果の std_situation が基準の状況名、基準自身の結果は is_standard=True）。
+  値は、その基準だけを「基準とする」にして main_calculation_flow で計算した結果と一致する
+  （FFTがOFFの状況の MZC・MCC・MIC だけは基準ごとに計算し直さないため、丸め誤差の範囲で異なる）。
+  """
+  if all_data is None:
+    all_data = InputData.from_excel(file_path)
+  valid_data = [data for data in all_data if not data.is_error]
+  ref_indices = [i for i, data in enumerate(valid_data) if data.is_standard]
+  if not ref_indices:
+    raise ValueError("基準となるデータを１つ以上設定してください．")
+
+  n_refs = len(ref_indices)
+  n_points = len(valid_data[ref_indices[0]].coord)
+  sorted_coords = np.empty((len(valid_data), n_points, valid_data[ref_indices[0]].coord.shape[1]))
+  with span("sort", situations=len(valid_data), points=n_points):
+    for i, data in enumerate(valid_data):
+      sorted_coords[i] = _sorted_coord(data, n_points)
+
+  with span("change", references=n_refs, situations=len(valid_data), points=n_points):
+    geometry = profile_geometry(sorted_coords)
+    std_radius = (geometry.rad_cap[ref_indices].mean(axis=-1) + geometry.rad_rod[ref_indices].mean(axis=-1)) / 2
+    # (基準数, 状況数, 点数)
+    change_cap = (geometry.rad_cap[np.newaxis] - geometry.rad_cap[ref_indices][:, np.newaxis])*10**3
+    change_rod = (geometry.rad_rod[np.newaxis] - geometry.rad_rod[ref_indices][:, np.newaxis])*10**3
+    change_radius = cap_rod_concat(change_cap, change_rod)
+    change_diameter = (geometry.diameter[np.newaxis] - geometry.diameter[ref_indices][:, np.newaxis])*10**3
+
+  # 最小二乗円は基準によらないので1度だけあてはめ、基準の半径だけをブロードキャストで引く
+  with span("calc_corrected_roundness", situations=len(valid_data), points=n_points):
+    lsm_cx, lsm_cy, lsm_r = fit_lsm_circles(sorted_coords)
+    cap_dist, rod_dist = lsm_distances(sorted_coords, lsm_cx, lsm_cy)
+    lsm_cap = (cap_dist[np.newaxis] - std_radius[:, np.newaxis, np.newaxis]) * 10**3
+    lsm_rod = (rod_dist[np.newaxis] - std_radius[:, np.newaxis, np.newaxis]) * 10**3
+    lsm_change_radius = cap_rod_concat(lsm_cap, lsm_rod)
+
+  # FFTがONの状況は、全ての基準の分をまとめて1回で平滑化する
+  fft_indices = [i for i, data in enumerate(valid_data) if data.fft_on_or_off]
+  fft_position = {i: j for j, i in enumerate(fft_indices)}
+  if fft_indices:
+    def fft_rows(values: np.ndarray) -> np.ndarray:
+      return values[:, fft_indices].reshape(n_refs * len(fft_indices), -1)
+    with span("activate_fft", situations=n_refs * len(fft_indices), points=n_points):
+      fft_batch = calc_fft_batch(fft_rows(change_cap), fft_rows(change_rod), fft_rows(lsm_cap),
+                                 fft_rows(lsm_rod), fft_rows(change_diameter), props)
+    fft_batch = FFTBatch(*(values.reshape(n_refs, len(fft_indices), -1) for values in fft_batch))
+
+  # FFTがOFFの状況の補正半径変化量は基準によって一定値ずれるだけなので、
+  # MZC・MCC・MIC の真円度（ずれによらない）は状況ごとに1度だけ求めて全ての基準の結果に持たせる
+  non_fft_indices = [i for i, data in enumerate(valid_data) if not data.fft_on_or_off]
+  zone_by_situation = {}
+  if non_fft_indices:
+    with span("zone_roundness", situations=len(non_fft_indices), points=n_points):
+      theta = lsm_angles(sorted_coords[non_fft_indices], lsm_cx[non_fft_indices], lsm_cy[non_fft_indices])
+      zone = zone_roundness_metrics(theta, lsm_change_radius[0, non_fft_indices, :2*n_points])
+    zone_by_situation = {i: {attr: values[k] for attr, values in zone.items()}
+                         for k, i in enumerate(non_fft_indices)}
+
+  calculated_results : List[BaseResult] = []
+  for r, ref_index in enumerate(ref_indices):
+    rad_degrees, dia_degrees = reference_degrees(sorted_coords[ref_index])
+    reference = ReferenceBlock(
+      situation=valid_data[ref_index].situation,
+      sorted_coord=sorted_coords[ref_index],
+      rod_dist=geometry.rod_dist[ref_index],
+      rad_degrees=rad_degrees,
+      dia_degrees=dia_degrees,
+    )
+    for i, data in enumerate(valid_data):
+      base_args = {
+          "situation": data.situation,
+          "fft_on_or_off": data.fft_on_or_off,
+          "is_standard": i == ref_index,
+          "line_color": data.line_color,
+          "reference": reference,
+          "sorted_coord": sorted_coords[i],
+          "change_radius": change_radius[r, i],
+          "change_diameter": change_diameter[r, i],
+          "rod_dist": geometry.rod_dist[i],
+      }
+      profiles = {
+          "lsm_change_radius": lsm_change_radius[r, i],
+          "lsm_cx": lsm_cx[i],
+          "lsm_cy": lsm_cy[i],
+          "lsm_r": lsm_r[i],
+      }
+      if data.fft_on_or_off:
+        j = fft_position[i]
+        profiles.update({
+            "fft_change_radius": fft_batch.change_radius[r, j],
+            "fft_lsm_change_radius": fft_batch.lsm_change_radius[r, j],
+            "fft_change_diameter": fft_batch.change_diameter[r, j]
+        })
+        calculated_results.append(FFTResult(**base_args, profiles=profiles))
+      else:
+        result = NonFFTResult(**base_args, profiles=profiles)
+        result.set_metrics(zone_by_situation[i])
+        calculated_results.append(result)
+  return calculated_results
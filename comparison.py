@@ -0,0 +1,78 @@
+import argparse
+import time
+import warnings
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+
+from read_excel import InputData, InputProperty, WorkbookSession
+from file_utils import arg_to_xlsx, make_filename
+from calculate import multi_reference_flow
+from result import METRIC_COLUMNS, comparison_table
+from constants import READER_ENGINES
+from report_writer import ReportBlock, ReportWriter
+
+"""
+複数基準の比較モジュール
+
+座標入力シートで「基準とする」にした全ての列を基準として、基準 × 状況 の全ての組み合わせの
+変化量と評価値を求める。入力の読み込み・座標のソート・最小二乗円のあてはめは1度だけ行い、
+変化量は基準の配列と全状況の配列のブロードキャストでまとめて求める（calculate.multi_reference_flow）。
+結果は一覧（縦持ち）と、評価値ごとの 状況 × 基準 の行列を1つのブックに保存する。
+"""
+
+
+def comparison_matrices(table: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """一覧表から、評価値ごとに 行 = 状況・列 = 基準 の行列を作る（順序は入力シートの順）"""
+    situations = list(dict.fromkeys(table["状況"]))
+    references = list(dict.fromkeys(table["基準"]))
+    return {label: table.pivot(index="状況", columns="基準", values=label).reindex(index=situations, columns=references)
+            for label, _ in METRIC_COLUMNS}
+
+
+def write_comparison_report(table: pd.DataFrame, file_name: Path):
+    """一覧シートと評価値ごとの行列シートを1つのブックに書き出す"""
+    with ReportWriter(file_name) as writer:
+        writer.write_sheet("一覧", [ReportBlock("基準 × 状況", {name: table[name] for name in table.columns})])
+        for label, matrix in comparison_matrices(table).items():
+            columns = {"状況": list(matrix.index)}
+            columns.update({f"基準: {reference}": matrix[reference].to_numpy() for reference in matrix.columns})
+            writer.write_sheet(label, [ReportBlock(label, columns)])
+
+
+def run_comparison(a_file: str, reader_engine: str = "fast") -> pd.DataFrame:
+    """1ファイルを読み込んで全ての基準で比較し、結果のブックを保存して一覧表を返す"""
+    with WorkbookSession(a_file, engine=reader_engine) as book:
+        props = InputProperty.from_workbook(book)
+        all_data: List[InputData] = InputData.from_workbook(book)
+    results = multi_reference_flow(file_path=a_file, props=props, all_data=all_data)
+    table = comparison_table(results)
+
+    w_file_name = Path(make_filename(a_file))
+    base_name = w_file_name.stem.replace("結果_", "")
+    report_filename = w_file_name.parent / f"基準比較_{base_name}.xlsx"
+    write_comparison_report(table, report_filename)
+    print(f"比較結果を保存しました: {report_filename}")
+    return table
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="複数の基準による変化量・評価値の比較")
+    parser.add_argument("path", help="読み込むフォルダかファイル名")
+    parser.add_argument("--reader", choices=READER_ENGINES, default="fast")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    warnings.simplefilter('ignore')
+    args = parse_args()
+    for a_file in arg_to_xlsx(args.path):
+        start = time.perf_counter()
+        try:
+            table = run_comparison(a_file, reader_engine=args.reader)
+            n_references = table["基準"].nunique()
+            print(f"{Path(a_file).name}: {n_references} 件の基準 × {len(table) // max(n_references, 1)} 件の状況を "
+                  f"{time.perf_counter() - start:.2f} s で比較しました。")
+        except Exception as e:
+            print(f"エラーが発生しました: {a_file}, {e}")
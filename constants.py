@@ -0,0 +1,14 @@
+"""
+入力ブックのレイアウトとコマンドラインの選択肢の定義
+
+重いライブラリ（pandas・openpyxl・matplotlib）に依存しないモジュールから参照できるよう、
+定数だけをここにまとめる。
+"""
+
+COORD_SHEET = "座標入力"
+SETTING_SHEET = "設定"
+REQUIRED_SHEETS = (COORD_SHEET, SETTING_SHEET)
+COORD_COLUMNS = ["cap_y", "cap_x", "rod_y", "rod_x"]
+
+READER_ENGINES = ("fast", "pandas")
+IMAGE_FORMATS = ("png", "jpg", "svg", "pdf")
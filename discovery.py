@@ -0,0 +1,157 @@
+import fnmatch
+import html
+import json
+import os
+import re
+import tempfile
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence
+
+from constants import REQUIRED_SHEETS
+
+"""
+入力ブックの探索モジュール
+
+xl/workbook.xml だけを読んでシート名を判定し、ブック全体は読み込まない。
+フォルダは（必要なら再帰的に）走査し、出力フォルダは読み飛ばす。
+パスと更新時刻をキーにした走査インデックスにより、変更のないファイルは再判定しない。
+"""
+
+OUTPUT_FOLDER_PATTERNS = ("計算結果フォルダ", "*_グラフフォルダ")
+DEFAULT_INCLUDE = ("*.xlsx",)
+DEFAULT_EXCLUDE = ("~$*",)          # Excelが開いている間の一時ファイル
+_SHEET_TAG = re.compile(rb"<(?:[A-Za-z_][\w.-]*:)?sheet\b([^>]*)>")
+_NAME_ATTR = re.compile(rb'\bname="([^"]*)"')
+
+
+def probe_sheet_names(file_path: str) -> List[str]:
+    """zipコンテナから xl/workbook.xml だけを読み、シート名の一覧を返す"""
+    with zipfile.ZipFile(file_path) as archive:
+        workbook_xml = archive.read("xl/workbook.xml")
+    names = []
+    for match in _SHEET_TAG.finditer(workbook_xml):
+        name = _NAME_ATTR.search(match.group(1))
+        if name is not None:
+            names.append(html.unescape(name.group(1).decode("utf-8")))
+    return names
+
+
+def has_required_sheets(file_path: str) -> bool:
+    """「座標入力」と「設定」シートが両方含まれているかを返す"""
+    sheet_names = probe_sheet_names(file_path)
+    return all(name in sheet_names for name in REQUIRED_SHEETS)
+
+
+def _matches(name: str, patterns: Sequence[str]) -> bool:
+    return any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+
+@dataclass
+class ScanIndex:
+    """
+    パスごとに (更新時刻, サイズ, 判定結果) を保持する走査インデックス。
+    更新時刻とサイズが前回と同じファイルはブックを開かずに前回の判定結果を使う。
+    """
+    index_path: Path | None = None
+    entries: Dict[str, dict] = field(default_factory=dict)
+    is_dirty: bool = False
+
+    @classmethod
+    def load(cls, index_path: Path | None) -> 'ScanIndex':
+        index = cls(index_path=Path(index_path) if index_path else None)
+        if index.index_path is not None and index.index_path.is_file():
+            try:
+                index.entries = json.loads(index.index_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                index.entries = {}
+        return index
+
+    def lookup(self, path: str, stat: os.stat_result) -> bool | None:
+        entry = self.entries.get(path)
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return entry["is_target"]
+        return None
+
+    def update(self, path: str, stat: os.stat_result, is_target: bool):
+        self.entries[path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "is_target": is_target}
+        self.is_dirty = True
+
+    def prune(self, folder: str, seen: set, recursive: bool):
+        """走査したフォルダ配下で見つからなかった（削除された）ファイルのエントリを削除する"""
+        prefix = os.path.join(folder, "")
+        def in_scope(path: str) -> bool:
+            if not path.startswith(prefix):
+                return False
+            return recursive or os.sep not in path[len(prefix):]
+        for path in [p for p in self.entries if in_scope(p) and p not in seen]:
+            del self.entries[path]
+            self.is_dirty = True
+
+    def save(self):
+        """インデックスを保存する（一時ファイルに書いてから置き換える）"""
+        if self.index_path is None or not self.is_dirty:
+            return
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=".scan_", dir=self.index_path.parent)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_name, self.index_path)
+        self.is_dirty = False
+
+
+def iter_candidates(root: str, recursive: bool = False,
+                    include: Sequence[str] = DEFAULT_INCLUDE,
+                    exclude: Sequence[str] = DEFAULT_EXCLUDE) -> Iterator[os.DirEntry]:
+    """
+    フォルダ内の候補ファイルを返す。出力フォルダ（計算結果フォルダ・*_グラフフォルダ）と
+    exclude に一致するフォルダ・ファイルは読み飛ばす。
+    """
+    try:
+        entries = sorted(os.scandir(root), key=lambda entry: entry.name)
+    except OSError as e:
+        print(f"フォルダを読み込めません: {root}, {e}")
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if recursive and not _matches(entry.name, OUTPUT_FOLDER_PATTERNS) \
+                    and not _matches(entry.name, exclude):
+                yield from iter_candidates(entry.path, recursive, include, exclude)
+        elif _matches(entry.name, include) and not _matches(entry.name, exclude):
+            yield entry
+
+
+def discover_workbooks(file_or_folder_name: str, recursive: bool = False,
+                       include: Sequence[str] = DEFAULT_INCLUDE,
+                       exclude: Sequence[str] = DEFAULT_EXCLUDE,
+                       index_path: Path | None = None) -> List[str]:
+    """
+    指定されたパスから、「座標入力」と「設定」シートが両方含まれているExcelファイルのみをリストアップ。
+    index_path を指定すると走査インデックスを読み書きし、変更のないファイルの判定を省略する。
+    """
+    index = ScanIndex.load(index_path)
+    if os.path.isdir(file_or_folder_name):
+        candidates = [(entry.path, entry.stat()) for entry in
+                      iter_candidates(file_or_folder_name, recursive, include, exclude)]
+    elif file_or_folder_name.endswith(".xlsx") and os.path.isfile(file_or_folder_name):
+        candidates = [(file_or_folder_name, os.stat(file_or_folder_name))]
+    else:
+        candidates = []
+
+    xlsx_list = []
+    for file_path, stat in candidates:
+        is_target = index.lookup(file_path, stat)
+        if is_target is None:
+            try:
+                is_target = has_required_sheets(file_path)
+            except Exception as e:
+                print(f"ファイル処理中にエラー: {file_path}, {e}")
+                continue
+            index.update(file_path, stat, is_target)
+        if is_target:
+            xlsx_list.append(file_path)
+    if os.path.isdir(file_or_folder_name):
+        index.prune(file_or_folder_name, {file_path for file_path, _ in candidates}, recursive)
+    index.save()
+    return xlsx_list
@@ -0,0 +1,427 @@
+import html
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+"""
+xlsxファイルのシートXMLを直接ストリーム読み込みする高速リーダー
+
+pandas.read_excel を経由せず、座標入力シートの4列ブロックを
+状況（situation）ごとのfloat64配列へ直接書き込む。
+"""
+
+NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+TAG_ROW = NS_MAIN + "row"
+TAG_C = NS_MAIN + "c"
+TAG_V = NS_MAIN + "v"
+TAG_IS = NS_MAIN + "is"
+TAG_T = NS_MAIN + "t"
+TAG_R = NS_MAIN + "r"
+TAG_SI = NS_MAIN + "si"
+TAG_DIMENSION = NS_MAIN + "dimension"
+
+HEADER_ROWS = 4              # 1行目: 状況名, 3行目: FFT/基準/色/エラーチェック, 4行目: 列名
+BLOCK_WIDTH = 4              # cap_y, cap_x, rod_y, rod_x
+_CELL_REF = re.compile(r"([A-Z]+)(\d+)")
+_CELL_REF_BYTES = re.compile(rb"([A-Z]+)(\d+)")
+_CHUNK_SIZE = 1 << 20
+# 座標入力シートの高速走査用（名前空間接頭辞 "x:" などにも対応）
+_CELL_XML = re.compile(rb"<(?:[A-Za-z_][\w.-]*:)?c\b([^>]*?)(?:/>|>(.*?)</(?:[A-Za-z_][\w.-]*:)?c>)", re.S)
+_NUMERIC_CELL = re.compile(rb'<c r="([A-Z]+)(\d+)"(?: s="\d+")?(?: t="n")?(?: s="\d+")?><v>([^<]+)</v></c>')
+_EMPTY_CELL = re.compile(rb'<c r="[A-Z]+\d+"(?: s="\d+")?/>')
+_CELL_START = re.compile(rb"<(?:[A-Za-z_][\w.-]*:)?c[\s/>]")
+_ATTR_R = re.compile(rb'\br="([A-Z]+\d+)"')
+_ATTR_T = re.compile(rb'\bt="(\w+)"')
+_VALUE = re.compile(rb"<(?:[A-Za-z_][\w.-]*:)?v>([^<]*)</", re.S)
+_TEXT = re.compile(rb"<(?:[A-Za-z_][\w.-]*:)?t(?:\s[^>]*)?>([^<]*)</", re.S)
+_PHONETIC = re.compile(rb"<(?:[A-Za-z_][\w.-]*:)?rPh\b.*?</(?:[A-Za-z_][\w.-]*:)?rPh>", re.S)
+_COL_CACHE: Dict[str, int] = {}
+
+
+class UnsupportedWorkbookError(Exception):
+    """高速リーダーで扱えない形式のファイルであることを示す例外"""
+
+
+def column_index(letters: str) -> int:
+    """列記号（"A", "AB"など）を0始まりの列番号に変換する"""
+    index = _COL_CACHE.get(letters)
+    if index is None:
+        index = 0
+        for ch in letters:
+            index = index * 26 + (ord(ch) - 64)
+        index -= 1
+        _COL_CACHE[letters] = index
+    return index
+
+
+def split_cell_ref(ref: str) -> Tuple[int, int]:
+    """セル番地（"C6"など）を0始まりの（行, 列）に変換する"""
+    match = _CELL_REF.fullmatch(ref)
+    if match is None:
+        raise ValueError(f"不正なセル番地です: {ref}")
+    return int(match.group(2)) - 1, column_index(match.group(1))
+
+
+def _convert_number(text: str):
+    """数値セルの文字列を変換する（pandasと同様に整数値はintとして返す）"""
+    value = float(text)
+    if value.is_integer():
+        return int(value)
+    return value
+
+
+def _rich_text(elem: ET.Element) -> str:
+    """<si>や<is>要素から文字列を取り出す（ふりがな<rPh>は無視する）"""
+    t = elem.find(TAG_T)
+    if t is not None:
+        return t.text or ""
+    return "".join(run_t.text or "" for run_t in (r.find(TAG_T) for r in elem.iter(TAG_R)) if run_t is not None)
+
+
+class CoordBlockHeader(NamedTuple):
+    """座標入力シートの4列ブロックのヘッダー行の値（未加工）"""
+    situation: object
+    fft_on_or_off: object
+    is_standard: object
+    line_color: object
+    error_check: object
+
+
+@dataclass
+class CoordSheet:
+    """
+    座標入力シートの読み込み結果。
+    values は (状況数, 行数, 4) のfloat64配列で、values[i] が i番目の状況の座標ブロック。
+    """
+    headers: List[CoordBlockHeader]
+    values: np.ndarray
+    invalid_values: Dict[int, str] = field(default_factory=dict)
+
+
+class XlsxArchive:
+    """xlsxファイル（zipコンテナ）を開き、シートXMLを直接読み込むクラス"""
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        try:
+            self._zip = zipfile.ZipFile(file_path)
+        except (zipfile.BadZipFile, OSError) as e:
+            raise UnsupportedWorkbookError(f"xlsxとして開けません: {file_path}, {e}") from e
+        self._sheet_parts: Dict[str, str] | None = None
+        self._shared_strings: List[str] | None = None
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self) -> 'XlsxArchive':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def has_part(self, part: str) -> bool:
+        return part in self._zip.NameToInfo
+
+    def open_part(self, part: str):
+        """zip内のファイルを開く（存在しない場合はKeyError）"""
+        return self._zip.open(part)
+
+    def _read_xml(self, part: str) -> ET.Element:
+        try:
+            with self._zip.open(part) as src:
+                return ET.parse(src).getroot()
+        except KeyError as e:
+            raise UnsupportedWorkbookError(f"{part} が見つかりません: {self.file_path}") from e
+
+    @property
+    def sheet_parts(self) -> Dict[str, str]:
+        """シート名 → シートXMLのパス の辞書（ブック内の並び順）"""
+        if self._sheet_parts is None:
+            rels_root = self._read_xml("xl/_rels/workbook.xml.rels")
+            targets = {}
+            for rel in rels_root.iter(NS_PKG_REL + "Relationship"):
+                target = rel.get("Target", "")
+                if target.startswith("/"):
+                    target = target.lstrip("/")
+                else:
+                    target = posixpath.normpath(posixpath.join("xl", target))
+                targets[rel.get("Id")] = target
+            book_root = self._read_xml("xl/workbook.xml")
+            self._sheet_parts = {}
+            for sheet in book_root.iter(NS_MAIN + "sheet"):
+                rel_id = sheet.get(NS_REL + "id")
+                if rel_id in targets:
+                    self._sheet_parts[sheet.get("name")] = targets[rel_id]
+        return self._sheet_parts
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return list(self.sheet_parts)
+
+    @property
+    def shared_strings(self) -> List[str]:
+        """共有文字列テーブル（存在しない場合は空リスト）"""
+        if self._shared_strings is None:
+            strings = []
+            if self.has_part("xl/sharedStrings.xml"):
+                with self._zip.open("xl/sharedStrings.xml") as src:
+                    for _, elem in ET.iterparse(src):
+                        if elem.tag == TAG_SI:
+                            strings.append(_rich_text(elem))
+                            elem.clear()
+            self._shared_strings = strings
+        return self._shared_strings
+
+    def _open_sheet(self, sheet_name: str):
+        part = self.sheet_parts.get(sheet_name)
+        if part is None:
+            raise UnsupportedWorkbookError(f"シート '{sheet_name}' が見つかりません: {self.file_path}")
+        try:
+            return self._zip.open(part)
+        except KeyError as e:
+            raise UnsupportedWorkbookError(f"{part} が見つかりません: {self.file_path}") from e
+
+    def _cell_value(self, elem: ET.Element):
+        """<c>要素の値を返す（空セルはNone、エラー値はNaN）"""
+        cell_type = elem.get("t", "n")
+        if cell_type == "inlineStr":
+            is_elem = elem.find(TAG_IS)
+            return None if is_elem is None else _rich_text(is_elem)
+        v = elem.find(TAG_V)
+        if v is None or v.text is None:
+            return None
+        text = v.text
+        if cell_type == "n":
+            return _convert_number(text)
+        if cell_type == "s":
+            return self.shared_strings[int(text)]
+        if cell_type == "b":
+            return text == "1"
+        if cell_type == "e":
+            return float("nan")
+        return text
+
+    def iter_cells(self, sheet_name: str, max_row: int | None = None,
+                   max_col: int | None = None) -> Iterator[Tuple[int, int, object]]:
+        """
+        シートのセルを (行, 列, 値) として先頭から順にストリームで返す（0始まり、空セルは除く）。
+        max_row/max_col（0始まり、含む）を超えるセルは値を解釈せずに読み飛ばす。
+        """
+        with self._open_sheet(sheet_name) as src:
+            row_index = -1
+            col_index = -1
+            for event, elem in ET.iterparse(src, events=("start", "end")):
+                tag = elem.tag
+                if event == "start":
+                    if tag == TAG_ROW:
+                        r = elem.get("r")
+                        row_index = int(r) - 1 if r else row_index + 1
+                        col_index = -1
+                        if max_row is not None and row_index > max_row:
+                            return
+                    continue
+                if tag == TAG_C:
+                    ref = elem.get("r")
+                    if ref:
+                        col_index = column_index(_CELL_REF.fullmatch(ref).group(1))
+                    else:
+                        col_index += 1
+                    if max_col is None or col_index <= max_col:
+                        value = self._cell_value(elem)
+                        if value is not None and value != "":
+                            yield row_index, col_index, value
+                    elem.clear()
+                elif tag == TAG_ROW:
+                    elem.clear()
+
+    def read_cells(self, sheet_name: str, refs: Sequence[str]) -> Dict[str, object]:
+        """指定セルの値をまとめて返す（必要な行までしか読まない）"""
+        positions = {ref: split_cell_ref(ref) for ref in refs}
+        wanted = {pos: ref for ref, pos in positions.items()}
+        max_row = max(row for row, _ in positions.values())
+        max_col = max(col for _, col in positions.values())
+        values: Dict[str, object] = {ref: None for ref in refs}
+        for row, col, value in self.iter_cells(sheet_name, max_row=max_row, max_col=max_col):
+            ref = wanted.get((row, col))
+            if ref is not None:
+                values[ref] = value
+        return values
+
+    def _dimension_rows(self, sheet_name: str) -> int | None:
+        """<dimension ref="A1:AF261"/> から行数の見積もりを得る（無ければNone）"""
+        with self._open_sheet(sheet_name) as src:
+            for _, elem in ET.iterparse(src, events=("start",)):
+                if elem.tag == TAG_DIMENSION:
+                    last = elem.get("ref", "").split(":")[-1]
+                    match = _CELL_REF.fullmatch(last)
+                    return int(match.group(2)) if match else None
+                if elem.tag == TAG_ROW:
+                    return None
+        return None
+
+    def _iter_cell_chunks(self, sheet_name: str) -> Iterator[Tuple[list, list]]:
+        """
+        シートXMLを一定サイズずつ読み込み、行の区切りまでの範囲に含まれるセルを返す。
+        戻り値は (数値セル [(列記号, 行番号, 値)], その他のセル [(セル番地, 型, 値XML)]) のタプル。
+        大半を占める単純な数値セルは正規表現1回で切り出し、Pythonでの1セルずつの処理を避ける。
+        メモリ使用量はチャンクサイズで抑えられる。
+        """
+        with self._open_sheet(sheet_name) as src:
+            buffer = b""
+            while True:
+                chunk = src.read(_CHUNK_SIZE)
+                buffer += chunk
+                if chunk:
+                    cut = buffer.rfind(b"</row>")
+                    if cut < 0:
+                        continue
+                    cut += len(b"</row>")
+                    body, buffer = buffer[:cut], buffer[cut:]
+                else:
+                    body, buffer = buffer, b""
+                numeric_cells = _NUMERIC_CELL.findall(body)
+                rest = _EMPTY_CELL.sub(b"", _NUMERIC_CELL.sub(b"", body))
+                other_cells = []
+                for match in _CELL_XML.finditer(rest):
+                    attrs = match.group(1)
+                    ref = _ATTR_R.search(attrs)
+                    if ref is None:
+                        raise UnsupportedWorkbookError(f"セル番地のないセルがあります: {self.file_path}")
+                    cell_type = _ATTR_T.search(attrs)
+                    other_cells.append((ref.group(1), cell_type.group(1) if cell_type else b"n", match.group(2)))
+                if len(other_cells) != len(_CELL_START.findall(rest)):
+                    raise UnsupportedWorkbookError(f"解釈できないセル要素があります: {self.file_path}")
+                if numeric_cells or other_cells:
+                    yield numeric_cells, other_cells
+                if not chunk:
+                    return
+
+    def _decode_cell(self, cell_type: bytes, body: bytes | None):
+        """正規表現で切り出したセルの値XMLを値に変換する（空セルはNone）"""
+        if not body:
+            return None
+        if cell_type == b"inlineStr":
+            body = _PHONETIC.sub(b"", body)
+            return html.unescape(b"".join(_TEXT.findall(body)).decode("utf-8"))
+        v = _VALUE.search(body)
+        if v is None:
+            return None
+        text = v.group(1)
+        if cell_type == b"n":
+            return _convert_number(text) if text else None
+        if cell_type == b"s":
+            return self.shared_strings[int(text)]
+        if cell_type == b"b":
+            return text == b"1"
+        if cell_type == b"e":
+            return float("nan")
+        return html.unescape(text.decode("utf-8"))
+
+    def read_coord_sheet(self, sheet_name: str) -> CoordSheet:
+        """
+        座標入力シートを読み込み、ヘッダー行と状況ごとの座標配列を返す。
+        座標は (状況数, 行数, 4) のfloat64配列に直接書き込み、DataFrameを経由しない。
+        """
+        dim_rows = self._dimension_rows(sheet_name)
+        capacity = max((dim_rows or 0) - HEADER_ROWS, 16)
+        n_blocks = 0
+        values = np.full((0, capacity, BLOCK_WIDTH), np.nan)
+        header_cells: Dict[Tuple[int, int], object] = {}
+        invalid_values: Dict[int, str] = {}
+        last_row = -1
+        max_col = -1
+        decode = self._decode_cell
+
+        for numeric_cells, other_cells in self._iter_cell_chunks(sheet_name):
+            rows: List[int] = []
+            cols: List[int] = []
+            nums: List[float] = []
+            for ref, cell_type, body in other_cells:
+                match = _CELL_REF_BYTES.fullmatch(ref)
+                row = int(match.group(2)) - 1
+                col = column_index(match.group(1).decode("ascii"))
+                value = decode(cell_type, body)
+                if value is None or value == "":
+                    continue
+                last_row = max(last_row, row)
+                max_col = max(max_col, col)
+                if row < HEADER_ROWS:
+                    header_cells[(row, col)] = value
+                    continue
+                if isinstance(value, str):
+                    try:
+                        value = float(value)
+                    except ValueError:
+                        invalid_values.setdefault(col // BLOCK_WIDTH, value)
+                        continue
+                rows.append(row - HEADER_ROWS)
+                cols.append(col)
+                nums.append(float(value))
+
+            row_arr = np.asarray(rows, dtype=np.intp)
+            col_arr = np.asarray(cols, dtype=np.intp)
+            num_arr = np.asarray(nums, dtype=np.float64)
+            if numeric_cells:
+                # 数値セルは列記号・行番号・値をまとめてNumPyで変換する
+                letters, row_text, value_text = zip(*numeric_cells)
+                unique_letters, inverse = np.unique(np.array(letters), return_inverse=True)
+                letter_cols = np.array([column_index(x.decode("ascii")) for x in unique_letters], dtype=np.intp)
+                num_rows = np.array(row_text).astype(np.intp) - (1 + HEADER_ROWS)
+                num_cols = letter_cols[inverse.ravel()]
+                num_values = np.array(value_text).astype(np.float64)
+                header_mask = num_rows < 0
+                if header_mask.any():
+                    # ヘッダー行（状況名が数値の場合など）は個別に変換する
+                    for r, c, v in zip(num_rows[header_mask], num_cols[header_mask],
+                                       np.array(value_text)[header_mask]):
+                        header_cells[(int(r) + HEADER_ROWS, int(c))] = _convert_number(v)
+                        last_row = max(last_row, int(r) + HEADER_ROWS)
+                        max_col = max(max_col, int(c))
+                    keep = ~header_mask
+                    num_rows, num_cols, num_values = num_rows[keep], num_cols[keep], num_values[keep]
+                row_arr = np.concatenate([row_arr, num_rows])
+                col_arr = np.concatenate([col_arr, num_cols])
+                num_arr = np.concatenate([num_arr, num_values])
+            if num_arr.size == 0:
+                continue
+
+            last_row = max(last_row, int(row_arr.max()) + HEADER_ROWS)
+            max_col = max(max_col, int(col_arr.max()))
+            need_blocks = int(col_arr.max()) // BLOCK_WIDTH + 1
+            need_rows = int(row_arr.max()) + 1
+            if need_blocks > n_blocks or need_rows > capacity:
+                # 想定より大きいシートは配列を拡張する
+                new_blocks = max(n_blocks, need_blocks)
+                new_capacity = capacity if need_rows <= capacity else max(capacity * 2, need_rows)
+                grown = np.full((new_blocks, new_capacity, BLOCK_WIDTH), np.nan)
+                grown[:n_blocks, :capacity] = values
+                values, n_blocks, capacity = grown, new_blocks, new_capacity
+            values[col_arr // BLOCK_WIDTH, row_arr, col_arr % BLOCK_WIDTH] = num_arr
+
+        n_used_blocks = -(-(max_col + 1) // BLOCK_WIDTH)
+        n_rows = max(last_row + 1 - HEADER_ROWS, 0)
+        if n_used_blocks > n_blocks:
+            grown = np.full((n_used_blocks, capacity, BLOCK_WIDTH), np.nan)
+            grown[:n_blocks] = values
+            values = grown
+        values = values[:n_used_blocks, :n_rows]
+
+        nan = float("nan")
+        headers = []
+        for block in range(n_used_blocks):
+            col_start = block * BLOCK_WIDTH
+            headers.append(CoordBlockHeader(
+                situation=header_cells.get((0, col_start), nan),
+                fft_on_or_off=header_cells.get((2, col_start), nan),
+                is_standard=header_cells.get((2, col_start + 1), nan),
+                line_color=header_cells.get((2, col_start + 2), nan),
+                error_check=header_cells.get((2, col_start + 3), nan),
+            ))
+        return CoordSheet(headers=headers, values=values, invalid_values=invalid_values)
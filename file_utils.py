@@ -1,8 +1,8 @@
 import os
 import re
-from typing import List
+from typing import List, Sequence
 from pathlib import Path
-import openpyxl
+from discovery import discover_workbooks, DEFAULT_INCLUDE, DEFAULT_EXCLUDE
 
 
 def response() -> str: 
@@ -15,33 +15,15 @@ def response() -> str:
     file_or_folder_name = response_file
   return file_or_folder_name
 
-def arg_to_xlsx(file_or_folder_name: str) -> List[str]:
+def arg_to_xlsx(file_or_folder_name: str, recursive: bool = False,
+                include: Sequence[str] = DEFAULT_INCLUDE, exclude: Sequence[str] = DEFAULT_EXCLUDE,
+                index_path: Path | None = None) -> List[str]:
     """
     指定されたパスから、「座標入力」と「設定」シートが両方含まれているExcelファイルのみをリストアップ。
+    シート名は xl/workbook.xml だけを読んで判定する（discoveryモジュール）。
     """
-    xlsx_list = []   
-    potential_files = []
-
-    if os.path.isdir(file_or_folder_name):
-        files = os.listdir(file_or_folder_name)
-        for a_file in files:
-            if a_file.endswith(".xlsx"):
-              full_path = os.path.join(file_or_folder_name, a_file)
-              potential_files.append(full_path)
-              
-    elif file_or_folder_name.endswith(".xlsx"):
-        potential_files.append(file_or_folder_name)
-
-    for file_path in potential_files:
-      try:
-          workbook = openpyxl.load_workbook(file_path, read_only=True)
-          sheet_names = workbook.sheetnames          
-          if "座標入力" in sheet_names and "設定" in sheet_names:
-              xlsx_list.append(file_path) 
-      except Exception as e:
-          print(f"ファイル処理中にエラー: {file_path}, {e}")
-
-    return xlsx_list
+    return discover_workbooks(file_or_folder_name, recursive=recursive, include=include,
+                              exclude=exclude, index_path=index_path)
 
 def make_filename(r_file_name:str) -> str: 
   r_file_path = Path(r_file_name)
@@ -0,0 +1,160 @@
+import json
+import os
+from pathlib import Path
+from typing import List, Tuple
+
+from constants import COORD_COLUMNS
+
+"""
+Excel以外の入力の読み込みモジュール
+
+座標入力シート・設定シートの代わりに、設定ファイル（JSON・TOML）と
+状況ごとの座標ファイル（CSV・Parquet・.npy）から InputProperty と InputData を作る。
+CLIの起動を遅くしないよう、NumPy・pandas は読み込む段階で import する。
+
+設定ファイルの例（TOML）:
+
+    [settings]                  # 設定シートの値（InputProperty のフィールド名）
+    threshold_dia = 0.24
+    threshold_rad = 0.24
+    threshold_lsm = 0.24
+    is_auto = "自動"
+    rotation = 0
+
+    [[situations]]              # 座標入力シートの4列ブロックに相当
+    situation = "基準"
+    file = "reference.npy"      # 設定ファイルからの相対パス（coord で配列を直接書いてもよい）
+    is_standard = true
+    fft = false
+    line_color = "黒"
+
+座標は object 型の DataFrame を経由せずに float64 配列として読み込む。
+.npy は mmap_mode="r" で開くため、百万点規模のプロファイルでも読み込み時にメモリを確保しない。
+座標にNaNを含む（cap側とrod側の行数が揃っていない）状況は、Excelの「行数OK」でない場合と同じく計算対象から外す。
+結果ブックのシートに収まらない点数（半径変化量が Excel の行数の上限を超える）の状況は、
+座標・変化量の列を「結果_<名前>_<状況>.npz」に保存し、シートには結果ブロックだけを書く。
+"""
+
+DATASET_SUFFIXES = (".json", ".toml")
+COORD_SUFFIXES = (".csv", ".parquet", ".npy")
+
+
+def is_dataset_file(file_path: str) -> bool:
+    """設定ファイル（JSON・TOML）で指定された入力かどうかを返す"""
+    return Path(file_path).suffix.lower() in DATASET_SUFFIXES
+
+
+def _read_csv(file_path: Path) -> "np.ndarray":
+    """CSVを float64 の配列で読み込む（1行目が列名でなければ COORD_COLUMNS の順とみなす）"""
+    import numpy as np
+    import pandas as pd
+    with open(file_path, encoding="utf-8-sig") as f:
+        first_line = f.readline()
+    try:
+        [float(value) for value in first_line.split(",")]
+        has_header = False
+    except ValueError:
+        has_header = True
+    if has_header:
+        frame = pd.read_csv(file_path, usecols=COORD_COLUMNS, dtype=np.float64, encoding="utf-8-sig")
+    else:
+        frame = pd.read_csv(file_path, header=None, names=COORD_COLUMNS, usecols=range(len(COORD_COLUMNS)),
+                            dtype=np.float64)
+    return frame[COORD_COLUMNS].to_numpy(dtype=np.float64)
+
+
+def _read_parquet(file_path: Path) -> "np.ndarray":
+    """Parquetを float64 の配列で読み込む（pyarrow が必要）"""
+    import numpy as np
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquetファイルの読み込みには pyarrow が必要です（pip install pyarrow）") from None
+    table = pq.read_table(file_path, columns=COORD_COLUMNS)
+    return np.column_stack([table.column(name).to_numpy().astype(np.float64, copy=False)
+                            for name in COORD_COLUMNS])
+
+
+def _read_npy(file_path: Path) -> "np.ndarray":
+    """.npy をメモリマップで開く（float64 以外の場合のみ変換する）"""
+    import numpy as np
+    values = np.load(file_path, mmap_mode="r")
+    if values.dtype != np.float64:
+        values = values.astype(np.float64)
+    return values
+
+
+_COORD_READERS = {".csv": _read_csv, ".parquet": _read_parquet, ".npy": _read_npy}
+
+
+def read_coord_file(file_path: str) -> "np.ndarray":
+    """座標ファイルを (点数, 4) の float64 配列（列は COORD_COLUMNS の順）で返す"""
+    file_path = Path(file_path)
+    reader = _COORD_READERS.get(file_path.suffix.lower())
+    if reader is None:
+        raise ValueError(f"座標ファイルの形式に対応していません: {file_path}（{', '.join(COORD_SUFFIXES)}）")
+    values = reader(file_path)
+    if values.ndim != 2 or values.shape[1] != len(COORD_COLUMNS):
+        raise ValueError(f"座標ファイルは (点数, {len(COORD_COLUMNS)}) の配列にしてください: "
+                         f"{file_path}, 形状: {values.shape}")
+    return values
+
+
+def read_dataset_file(file_path: str) -> dict:
+    """設定ファイル（JSON・TOML）を辞書で読み込む"""
+    file_path = Path(file_path)
+    suffix = file_path.suffix.lower()
+    if suffix == ".json":
+        with open(file_path, encoding="utf-8-sig") as f:
+            return json.load(f)
+    if suffix == ".toml":
+        import tomllib
+        with open(file_path, "rb") as f:
+            return tomllib.load(f)
+    raise ValueError(f"設定ファイルの形式に対応していません: {file_path}（{', '.join(DATASET_SUFFIXES)}）")
+
+
+def inputs_from_mapping(dataset: dict, base_dir: str | None = None) -> Tuple['InputProperty', List['InputData']]:
+    """
+    設定ファイルと同じ構成の辞書から (InputProperty, InputData のリスト) を作る。
+    base_dir を指定しない場合は "file" による座標ファイルの参照を受け付けない（座標は "coord" で直接指定する）。
+    """
+    import numpy as np
+    from read_excel import InputData, InputProperty
+    if not isinstance(dataset.get("settings"), dict):
+        raise ValueError('"settings"（設定シートの値）を指定してください')
+    situations = dataset.get("situations")
+    if not isinstance(situations, list) or not situations:
+        raise ValueError('"situations"（状況ごとの座標）を1つ以上指定してください')
+    props = InputProperty.from_dict(dataset["settings"])
+
+    all_data = []
+    for i, item in enumerate(situations):
+        if not isinstance(item, dict):
+            raise ValueError(f"situations[{i}] は項目名 -> 値 の形式で指定してください")
+        situation = str(item.get("situation", f"状況{i + 1}"))
+        if "file" in item:
+            if base_dir is None:
+                raise ValueError(f'situations[{i}]: "file" は使えません。座標は "coord" で指定してください')
+            coord = read_coord_file(os.path.join(base_dir, item["file"]))
+        elif "coord" in item:
+            coord = item["coord"]
+        else:
+            raise ValueError(f'situations[{i}] に "file" または "coord" がありません')
+        data = InputData.from_array(
+            situation=situation,
+            coord=coord,
+            fft_on_or_off=item.get("fft", False),
+            is_standard=item.get("is_standard", False),
+            line_color=item.get("line_color", "黒"),
+        )
+        # 「行数OK」の判定に相当: NaNを含む（行数が揃っていない）座標は計算対象から外す
+        data.is_error = bool(np.isnan(data.coord.to_numpy()).any())
+        all_data.append(data)
+    return props, all_data
+
+
+def load_dataset(file_path: str) -> Tuple['InputProperty', List['InputData']]:
+    """設定ファイル（JSON・TOML）と、そこから参照される座標ファイルを読み込む"""
+    dataset = read_dataset_file(file_path)
+    return inputs_from_mapping(dataset, base_dir=os.path.dirname(os.path.abspath(file_path)))
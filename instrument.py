@@ -0,0 +1,203 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+
+"""
+処理段ごとの計測モジュール
+
+span("段の名前", file=..., situation=...) で囲んだ区間の経過時間・CPU時間・メモリを記録し、
+JSON Lines（1行1区間）または Chrome のトレース形式（chrome://tracing や Perfetto で表示できる）で書き出す。
+
+計測を有効にしていない場合、span() は何もしない共通のコンテキストを返すだけなので、
+処理時間への影響はほぼない。メモリの区間ごとのピークは tracemalloc を使うため、
+trace_memory=True のときだけ記録する（tracemalloc 自体が処理を遅くするため）。
+"""
+
+_NULL_SPAN = contextlib.nullcontext()
+_recorder: 'Recorder | None' = None
+
+
+def _max_rss_mib() -> float | None:
+    """プロセスの最大常駐メモリ [MiB]（取得できない環境ではNone）"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@dataclass
+class SpanRecord:
+    """計測した1区間"""
+    name: str
+    start: float                # 計測開始からの経過時間 [s]
+    wall: float                 # 経過時間 [s]
+    cpu: float                  # そのスレッドのCPU時間 [s]
+    thread: int
+    args: Dict[str, object] = field(default_factory=dict)
+    peak_mib: float | None = None       # 区間中の tracemalloc のピーク [MiB]（trace_memory=True の場合）
+    max_rss_mib: float | None = None    # 区間終了時点のプロセスの最大常駐メモリ [MiB]
+
+
+class _Span:
+    """記録中の1区間（Recorder.span が返すコンテキスト）"""
+    __slots__ = ("recorder", "name", "args", "start_wall", "start_cpu", "peak")
+
+    def __init__(self, recorder: 'Recorder', name: str, args: dict):
+        self.recorder = recorder
+        self.name = name
+        self.args = args
+        self.peak = 0
+
+    def __enter__(self):
+        self.recorder._push(self)
+        self.start_cpu = time.thread_time()
+        self.start_wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall = time.perf_counter() - self.start_wall
+        cpu = time.thread_time() - self.start_cpu
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.recorder._pop(self, wall, cpu)
+        return False
+
+
+class Recorder:
+    """区間の記録を集めて書き出すクラス（スレッドごとに入れ子の区間を管理する）"""
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.origin = time.perf_counter()
+        self.records: List[SpanRecord] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if trace_memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def span(self, name: str, **args) -> _Span:
+        return _Span(self, name, args)
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _fold_peak(self, stack: list) -> None:
+        """これまでのピークを開いている区間に反映してからピークをリセットする"""
+        import tracemalloc
+        _, peak = tracemalloc.get_traced_memory()
+        for open_span in stack:
+            open_span.peak = max(open_span.peak, peak)
+        tracemalloc.reset_peak()
+
+    def _push(self, span: _Span) -> None:
+        stack = self._stack()
+        if self.trace_memory:
+            self._fold_peak(stack)
+        stack.append(span)
+
+    def _pop(self, span: _Span, wall: float, cpu: float) -> None:
+        stack = self._stack()
+        if self.trace_memory:
+            self._fold_peak(stack)
+        stack.remove(span)
+        record = SpanRecord(
+            name=span.name,
+            start=span.start_wall - self.origin,
+            wall=wall,
+            cpu=cpu,
+            thread=threading.get_ident(),
+            args=span.args,
+            peak_mib=span.peak / 2**20 if self.trace_memory else None,
+            max_rss_mib=_max_rss_mib(),
+        )
+        with self._lock:
+            self.records.append(record)
+
+    def write_jsonl(self, path: Path) -> None:
+        """1行1区間のJSON Linesで書き出す"""
+        with open(path, "w", encoding="utf-8") as f:
+            for record in sorted(self.records, key=lambda r: r.start):
+                row = {"name": record.name, "start": round(record.start, 6), "wall": round(record.wall, 6),
+                       "cpu": round(record.cpu, 6), "thread": record.thread, **record.args}
+                if record.peak_mib is not None:
+                    row["peak_mib"] = round(record.peak_mib, 3)
+                if record.max_rss_mib is not None:
+                    row["max_rss_mib"] = round(record.max_rss_mib, 1)
+                f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+
+    def write_chrome_trace(self, path: Path) -> None:
+        """Chrome のトレース形式（"X" イベント、時間はマイクロ秒）で書き出す"""
+        pid = os.getpid()
+        events = []
+        for record in self.records:
+            args = {**record.args, "cpu_ms": round(record.cpu * 1e3, 3)}
+            if record.peak_mib is not None:
+                args["peak_mib"] = round(record.peak_mib, 3)
+            if record.max_rss_mib is not None:
+                args["max_rss_mib"] = round(record.max_rss_mib, 1)
+            events.append({"name": record.name, "ph": "X", "pid": pid, "tid": record.thread,
+                           "ts": round(record.start * 1e6, 1), "dur": round(record.wall * 1e6, 1),
+                           "args": args})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False, default=str)
+
+    def write(self, path: str | Path) -> None:
+        """拡張子が .json なら Chrome のトレース形式、それ以外は JSON Lines で書き出す"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix.lower() == ".json":
+            self.write_chrome_trace(path)
+        else:
+            self.write_jsonl(path)
+
+    def summary(self) -> Dict[str, dict]:
+        """区間名ごとの 回数・経過時間・CPU時間 の合計"""
+        totals: Dict[str, dict] = {}
+        for record in self.records:
+            total = totals.setdefault(record.name, {"count": 0, "wall": 0.0, "cpu": 0.0})
+            total["count"] += 1
+            total["wall"] += record.wall
+            total["cpu"] += record.cpu
+        return totals
+
+
+def span(name: str, **args):
+    """計測区間のコンテキスト（計測が無効なら何もしない）"""
+    if _recorder is None:
+        return _NULL_SPAN
+    return _recorder.span(name, **args)
+
+
+def enable(trace_memory: bool = False) -> Recorder:
+    """このプロセスでの計測を開始する"""
+    global _recorder
+    _recorder = Recorder(trace_memory=trace_memory)
+    return _recorder
+
+
+def disable() -> 'Recorder | None':
+    """計測を終了し、記録したRecorderを返す"""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is not None and recorder.trace_memory:
+        import tracemalloc
+        tracemalloc.stop()
+    return recorder
+
+
+def print_summary(recorder: Recorder) -> None:
+    """区間名ごとの合計時間を経過時間の長い順に表示する"""
+    print("\n===== 処理段ごとの計測結果 =====")
+    print(f"{'区間':<28} {'回数':>6} {'経過[s]':>9} {'CPU[s]':>9}")
+    for name, total in sorted(recorder.summary().items(), key=lambda item: -item[1]["wall"]):
+        print(f"{name:<28} {total['count']:>6} {total['wall']:>9.3f} {total['cpu']:>9.3f}")
@@ -1,72 +1,89 @@
 import pandas as pd
 import numpy  as np
-import math
-from collections import namedtuple
-from typing import List, NamedTuple
+from typing import NamedTuple
 
 class LsmChangeResult(NamedTuple):
-  """最小二乗による半径変化量を格納するNamedTuple"""
-  cap : List[float]
-  rod : List[float]
-  cx  : float
-  cy  : float
-  r   : float
+  """
+  最小二乗による半径変化量を格納するNamedTuple（構造体配列）
+  1プロファイルの場合 cap/rod は (点数,)、cx/cy/r はスカラー。
+  複数プロファイルをまとめて計算した場合は先頭の軸がプロファイル（状況）になる。
+  """
+  cap : np.ndarray
+  rod : np.ndarray
+  cx  : np.ndarray | float
+  cy  : np.ndarray | float
+  r   : np.ndarray | float
 
-def calc_corrected_roundness(coord: pd.DataFrame, std_radius: float) -> LsmChangeResult:
-  """最小二乗による半径変化量を計算する"""
-  cap_y = coord["cap_y"].tolist()
-  cap_x = coord["cap_x"].tolist()
-  rod_y = coord["rod_y"].tolist()
-  rod_x = coord["rod_x"].tolist()
-  
-  rad = std_radius
-  pre_y = cap_y + list(reversed(rod_y))
-  pre_x = cap_x + list(reversed(rod_x))
-  
-  df1 = pd.DataFrame()
-  df1["preY"] = pre_y
-  df1["preX"] = pre_x
-  df1['x0y1'] = (df1['preX'] ** 0) * (df1['preY'] ** 1)
-  df1['x0y2'] = (df1['preX'] ** 0) * (df1['preY'] ** 2)
-  df1['x0y3'] = (df1['preX'] ** 0) * (df1['preY'] ** 3)
-  df1['x1y0'] = (df1['preX'] ** 1) * (df1['preY'] ** 0)
-  df1['x1y1'] = (df1['preX'] ** 1) * (df1['preY'] ** 1)
-  df1['x1y2'] = (df1['preX'] ** 1) * (df1['preY'] ** 2)
-  df1['x1y3'] = (df1['preX'] ** 1) * (df1['preY'] ** 3)
-  df1['x2y0'] = (df1['preX'] ** 2) * (df1['preY'] ** 0)
-  df1['x2y1'] = (df1['preX'] ** 2) * (df1['preY'] ** 1)
-  df1['x2y2'] = (df1['preX'] ** 2) * (df1['preY'] ** 2)
-  df1['x2y3'] = (df1['preX'] ** 2) * (df1['preY'] ** 3)
-  df1['x3y0'] = (df1['preX'] ** 3) * (df1['preY'] ** 0)
+def fit_circles(x: np.ndarray, y: np.ndarray) -> tuple:
+  """
+  Kåsa法で円をあてはめ、(cx, cy, r) を返す。
+  x, y は (..., 点数) の配列で、先頭側の軸ごとに独立したあてはめをまとめて行う。
+  正規方程式の和をNumPyで直接求め、np.linalg.solveで解く。
+  """
+  x = np.asarray(x, dtype=float)
+  y = np.asarray(y, dtype=float)
+  xx = x * x
+  yy = y * y
+  sum_x = x.sum(axis=-1)
+  sum_y = y.sum(axis=-1)
+  sum_xx = xx.sum(axis=-1)
+  sum_yy = yy.sum(axis=-1)
+  sum_xy = (x * y).sum(axis=-1)
+  sum_xxx = (xx * x).sum(axis=-1)
+  sum_xyy = (x * yy).sum(axis=-1)
+  sum_xxy = (xx * y).sum(axis=-1)
+  sum_yyy = (yy * y).sum(axis=-1)
+  n = np.full(sum_x.shape, x.shape[-1], dtype=float)
 
-  df2 = pd.DataFrame()
-  df2['col1'] = [df1['x2y0'].sum(), df1['x1y1'].sum(), df1['x1y0'].sum()]
-  df2['col2'] = [df1['x1y1'].sum(), df1['x0y2'].sum(), df1['x0y1'].sum()]
-  df2['col3'] = [df1['x1y0'].sum(),  df1['x0y1'].sum(), len(df1)]
+  # x^2 + y^2 + a*x + b*y + c = 0 の係数 (a, b, c) の正規方程式
+  lhs = np.stack([
+    np.stack([sum_xx, sum_xy, sum_x], axis=-1),
+    np.stack([sum_xy, sum_yy, sum_y], axis=-1),
+    np.stack([sum_x,  sum_y,  n],     axis=-1),
+  ], axis=-2)
+  rhs = np.stack([-(sum_xxx + sum_xyy), -(sum_xxy + sum_yyy), -(sum_xx + sum_yy)], axis=-1)
+  a, b, c = np.moveaxis(np.linalg.solve(lhs, rhs[..., None])[..., 0], -1, 0)
 
-  df3 = pd.DataFrame()
-  df3['col1'] = [-(df1['x3y0'].sum() + df1['x1y2'].sum()), 
-                 -(df1['x2y1'].sum() + df1['x0y3'].sum()),
-                 -(df1['x2y0'].sum() + df1['x0y2'].sum()) ]
-  
-  invdf2 = np.linalg.inv(df2.values)
-  resultABC = np.dot(invdf2, df3.values)
-  a = resultABC[0][0]
-  b = resultABC[1][0]
-  c = resultABC[2][0]
   cx = -a/2
   cy = -b/2
-  r = math.sqrt(cx**2 + cy**2 - c)
+  r = np.sqrt(cx**2 + cy**2 - c)
+  return cx, cy, r
+
+def calc_corrected_roundness_batch(sorted_coords: np.ndarray, std_radius: float) -> LsmChangeResult:
+  """
+  (状況数, 点数, 4) = [cap_y, cap_x, rod_y, rod_x] の座標から、
+  全状況の最小二乗円と最小二乗による半径変化量をまとめて計算する
+  """
+  cx, cy, r = fit_lsm_circles(sorted_coords)
+  cap_dist, rod_dist = lsm_distances(sorted_coords, cx, cy)
+  lsm_change_cap = (cap_dist - std_radius) * 10**3
+  lsm_change_rod = (rod_dist - std_radius) * 10**3
+
+  return LsmChangeResult(cap=lsm_change_cap, rod=lsm_change_rod, cx=cx, cy=cy, r=r)
 
-  df4 = pd.DataFrame()
-  df4['lsmCapY'] = cap_y - cy
-  df4['lsmCapX'] = cap_x - cx
-  df4['lsmRodY'] = rod_y - cy
-  df4['lsmRodX'] = rod_x - cx
-  df4['lsmChangeCap'] = ((df4['lsmCapY']**2 + df4['lsmCapX']**2)**(1/2) - rad) * 10**3
-  df4['lsmChangeRod'] = ((df4['lsmRodY']**2 + df4['lsmRodX']**2)**(1/2) - rad) * 10**3 
-  
-  lsmChangeCap = df4['lsmChangeCap'].tolist()
-  lsmChangeRod = df4['lsmChangeRod'].tolist()
+def fit_lsm_circles(sorted_coords: np.ndarray) -> tuple:
+  """(状況数, 点数, 4) の座標の cap側・rod側の全点に円をあてはめ、(cx, cy, r) を返す"""
+  cap_y = sorted_coords[..., 0]
+  cap_x = sorted_coords[..., 1]
+  rod_y = sorted_coords[..., 2]
+  rod_x = sorted_coords[..., 3]
+  return fit_circles(np.concatenate([cap_x, rod_x], axis=-1),
+                     np.concatenate([cap_y, rod_y], axis=-1))
 
-  return LsmChangeResult(cap=lsmChangeCap, rod=lsmChangeRod, cx=cx, cy=cy, r=r)
\ No newline at end of file
+def lsm_distances(sorted_coords: np.ndarray, cx, cy) -> tuple:
+  """
+  (状況数, 点数, 4) の座標の各点の、最小二乗円の中心 (cx, cy) からの距離 (cap, rod) を返す
+  （基準の半径を引いて μm にしたものが最小二乗による半径変化量）
+  """
+  cx_col = np.asarray(cx)[..., None]
+  cy_col = np.asarray(cy)[..., None]
+  cap_dist = np.sqrt((sorted_coords[..., 0] - cy_col)**2 + (sorted_coords[..., 1] - cx_col)**2)
+  rod_dist = np.sqrt((sorted_coords[..., 2] - cy_col)**2 + (sorted_coords[..., 3] - cx_col)**2)
+  return cap_dist, rod_dist
+
+def calc_corrected_roundness(coord: pd.DataFrame, std_radius: float) -> LsmChangeResult:
+  """最小二乗による半径変化量を計算する（1プロファイル分）"""
+  coords = coord[["cap_y", "cap_x", "rod_y", "rod_x"]].to_numpy(dtype=float)
+  result = calc_corrected_roundness_batch(coords[None], std_radius)
+  return LsmChangeResult(cap=result.cap[0], rod=result.rod[0],
+                         cx=float(result.cx[0]), cy=float(result.cy[0]), r=float(result.r[0]))
@@ -1,50 +1,283 @@
-from read_excel import *
 from file_utils import *
-from least_squares import *
-from result import *
-from calculate import *
-from plotter import *
+from constants import READER_ENGINES, IMAGE_FORMATS
+from batch import run_batch, print_summary
+from result_cache import ResultCache, content_key, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from results_store import ResultsStore
+from input_adapters import is_dataset_file
+from instrument import span
+import instrument
+import argparse
+import time
 import warnings
 
-"""メイン制御モジュール"""
+"""
+メイン制御モジュール
 
-def main(a_file):
-    w_file_name = make_filename(a_file)
+起動を速くするため、pandas・matplotlib は使う段階（計算・グラフ描画）で読み込む。
+グラフを作らない場合（--no-plots）は matplotlib を読み込まない。
+"""
 
-    #プロパティ読み込みとメイン計算処理の実行
-    props = InputProperty.from_excel(a_file)
-    all_results = main_calculation_flow(file_path=a_file, props=props)
-    report_output_results = [a_result for a_result in all_results if not a_result.is_standard] 
+def output_filename(a_file) -> str:
+    """出力ブックのパス（設定ファイル（JSON・TOML）の入力は、同じフォルダに「結果_<名前>.xlsx」として出力する）"""
+    if is_dataset_file(a_file):
+        return make_filename(str(Path(a_file).with_suffix(".xlsx")))
+    return make_filename(a_file)
 
+
+def read_inputs(a_file, reader_engine: str = "fast") -> tuple:
+    """入力（ブックは1度だけ開く）から (InputProperty, InputData のリスト) を読み込む"""
+    with span("read", file=Path(a_file).name):
+        if is_dataset_file(a_file):
+            from input_adapters import load_dataset
+            return load_dataset(a_file)
+        from read_excel import WorkbookSession, InputData, InputProperty
+        with WorkbookSession(a_file, engine=reader_engine) as book:
+            with span("InputProperty.from_workbook"):
+                props = InputProperty.from_workbook(book)
+            with span("InputData.from_workbook"):
+                all_data = InputData.from_workbook(book)
+        return props, all_data
+
+
+def compute_results(a_file, props, all_data) -> tuple:
+    """メイン計算処理を実行し、(全結果, 評価値の表) を返す（結果がなければ評価値はNone）"""
+    from calculate import main_calculation_flow
+    from result import metrics_table
+    with span("main_calculation_flow", file=Path(a_file).name):
+        all_results = main_calculation_flow(file_path=a_file, props=props, all_data=all_data)
     if not all_results:
-        print("処理対象データがありません。処理を修了します。")
-    else:
-        #グラフ生成・保存
-        plotter = Plotter(results=all_results, props=props, write_filename=w_file_name)
-        plotter.plot_all_graphs()
-
-        #Excelレポートブック作成
-        with pd.ExcelWriter(w_file_name, engine="openpyxl") as writer:
-            for a_result in report_output_results:
+        return all_results, None
+    #評価値を一括で計算（各結果にも保持されるため、レポート作成時には再計算しない）
+    with span("metrics_table", file=Path(a_file).name):
+        return all_results, metrics_table(all_results)
+
+
+def write_outputs(a_file, w_file_name, all_results, props, plot_workers: int = 1, image_format: str = "png",
+                  dpi: float | None = None, plots: bool = True, store: ResultsStore | None = None,
+                  store_profiles: bool = False, plot_points: int | None = None) -> list:
+    """グラフ・レポートブックの書き出しとデータベースへの登録を行い、出力したファイルのリストを返す"""
+    #グラフ生成・保存
+    name = Path(a_file).name
+    graph_files = []
+    if plots:
+        from plotter import Plotter
+        with span("plot_all_graphs", file=name):
+            plotter = Plotter(results=all_results, props=props, write_filename=w_file_name,
+                              image_format=image_format, dpi=dpi, max_points=plot_points)
+            graph_files = plotter.plot_all_graphs(max_workers=plot_workers)
+
+    #Excelレポートブック作成
+    from report_writer import ReportWriter
+    with span("write_report", file=name), ReportWriter(w_file_name) as writer:
+        for a_result in all_results:
+            if not a_result.is_standard:
+                a_result.write_to_output_excel_sheet(writer)
+
+    #計算結果データベースへの登録（1ブック分を1トランザクションで書き込む）
+    if store is not None:
+        with span("store", file=name):
+            store.add_run(a_file, all_results, props=props, profiles=store_profiles)
+    return [w_file_name, *writer.array_files, *graph_files]
+
+
+def stream_outputs(a_file, w_file_name, props, all_data, store: ResultsStore | None = None,
+                   store_profiles: bool = False) -> list:
+    """
+    グラフを作らない場合の出力。iter_calculation_flow の結果を状況ごとにレポートブックへ書き出しながら
+    データベースにも登録し、全状況の配列を同時に保持しない。出力したファイルのリストを返す。
+    """
+    from calculate import iter_calculation_flow
+    from report_writer import ReportWriter
+
+    def written(results, writer):
+        for a_result in results:
+            if not a_result.is_standard:
                 a_result.write_to_output_excel_sheet(writer)
+            yield a_result
+
+    with span("stream_outputs", file=Path(a_file).name), ReportWriter(w_file_name) as writer:
+        results = written(iter_calculation_flow(file_path=a_file, props=props, all_data=all_data), writer)
+        if store is not None:
+            store.add_run(a_file, results, props=props, profiles=store_profiles)
+        else:
+            for _ in results:
+                pass
+    return [w_file_name, *writer.array_files]
+
+
+def store_results(a_file, props, all_data, store: ResultsStore, store_profiles: bool = False) -> None:
+    """
+    出力を書き出さずにデータベースへの登録だけを行う（キャッシュから出力を復元した場合）。
+    iter_calculation_flow で状況ごとに計算しながら登録する。
+    """
+    from calculate import iter_calculation_flow
+    with span("store", file=Path(a_file).name):
+        store.add_run(a_file, iter_calculation_flow(file_path=a_file, props=props, all_data=all_data),
+                      props=props, profiles=store_profiles)
+
+
+def cache_key_for(a_file, cache: ResultCache | None, image_format: str = "png", dpi: float | None = None,
+                  plots: bool = True, plot_points: int | None = None) -> str | None:
+    """キャッシュのキー（キャッシュを使わない場合・設定ファイルの入力はNone）"""
+    if cache is None or is_dataset_file(a_file):
+        return None
+    return content_key(a_file, {"image_format": image_format, "dpi": dpi, "plots": plots,
+                                "plot_points": plot_points})
+
+
+def main(a_file, reader_engine: str = "fast", cache: ResultCache | None = None,
+         plot_workers: int = 1, image_format: str = "png", dpi: float | None = None,
+         plots: bool = True, store: ResultsStore | None = None, store_profiles: bool = False,
+         plot_points: int | None = None):
+    with span("file", file=Path(a_file).name):
+        w_file_name = output_filename(a_file)
+
+        #入力内容が前回と同じならキャッシュから出力を復元して終了（キャッシュはExcelの入力のみ）
+        #データベースを指定した場合は、出力の書き出しだけを省略して登録は行う
+        cache_key = cache_key_for(a_file, cache, image_format=image_format, dpi=dpi, plots=plots,
+                                  plot_points=plot_points)
+        if cache_key is not None and cache.restore(cache_key, w_file_name):
+            print(f"変更がないため計算を省略しました: {a_file}")
+            if store is not None:
+                props, all_data = read_inputs(a_file, reader_engine)
+                store_results(a_file, props, all_data, store, store_profiles=store_profiles)
+            return
+
+        #入力を読み込み、メイン計算処理を実行
+        props, all_data = read_inputs(a_file, reader_engine)
+        if not plots:
+            #グラフを作らない場合は、状況ごとに計算しながら書き出す（評価値の表は作らない）
+            metrics = None
+            output_files = stream_outputs(a_file, w_file_name, props, all_data, store=store,
+                                          store_profiles=store_profiles)
+        else:
+            all_results, metrics = compute_results(a_file, props, all_data)
+            if not all_results:
+                print("処理対象データがありません。処理を修了します。")
+                return
+
+            output_files = write_outputs(a_file, w_file_name, all_results, props, plot_workers=plot_workers,
+                                         image_format=image_format, dpi=dpi, plots=plots, store=store,
+                                         store_profiles=store_profiles, plot_points=plot_points)
+        if cache_key is not None:
+            cache.store(cache_key, a_file, w_file_name, output_files)
+        return metrics
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """コマンドライン引数を解析する"""
+    parser = argparse.ArgumentParser(description="内径変化量・半径変化量の計算")
+    parser.add_argument("path", nargs="?",
+                        help="読み込むフォルダかファイル名（.xlsx または設定ファイル .json/.toml、省略時は入力を求める）")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="並列処理のワーカー数（0でCPUコア数、既定: 1）")
+    parser.add_argument("--reader", choices=READER_ENGINES, default="fast",
+                        help="座標入力シートの読み込みエンジン（既定: fast）")
+    parser.add_argument("-r", "--recursive", action="store_true", help="フォルダを再帰的に探索する")
+    parser.add_argument("--include", nargs="+", default=list(DEFAULT_INCLUDE),
+                        help="対象にするファイル名のパターン（既定: *.xlsx）")
+    parser.add_argument("--exclude", nargs="+", default=list(DEFAULT_EXCLUDE),
+                        help="除外するファイル名・フォルダ名のパターン")
+    parser.add_argument("--scan-index", default=None,
+                        help="探索結果のインデックスファイル（省略時は --cache 指定時のみ --cache-dir の scan_index.json を使用）")
+    parser.add_argument("--cache", action="store_true",
+                        help="入力内容が変わっていないファイルの計算・出力を省略する")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="キャッシュの保存先")
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_MAX_BYTES / 2**20,
+                        help="キャッシュの上限サイズ [MiB]（超えると古いものから削除）")
+    parser.add_argument("--no-plots", dest="plots", action="store_false",
+                        help="グラフを作成せず計算結果のブックだけを出力する")
+    parser.add_argument("--store", help="計算結果を登録するSQLiteデータベース（省略時は登録しない）")
+    parser.add_argument("--store-profiles", action="store_true",
+                        help="データベースに変化量のプロファイルも登録する")
+    parser.add_argument("--plot-workers", type=int, default=1,
+                        help="グラフ描画のワーカープロセス数（既定: 1）")
+    parser.add_argument("--image-format", choices=IMAGE_FORMATS, default="png",
+                        help="グラフの保存形式（既定: png）")
+    parser.add_argument("--dpi", type=float, default=None,
+                        help="グラフの解像度（省略時は既定の解像度）")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="1プロセスの中で読み込み・計算・書き出しを重ねて実行する（-j とは併用できない）")
+    parser.add_argument("--prefetch", type=int, default=2,
+                        help="パイプラインで先に読み込んでおくファイル数（既定: 2）")
+    parser.add_argument("--writers", type=int, default=2,
+                        help="パイプラインの書き出しスレッド数（既定: 2）")
+    parser.add_argument("--plot-points", type=int, default=None,
+                        help="グラフの1系列あたりの間引き区間数（省略時は画素数から自動、0で間引かない）")
+    parser.add_argument("--trace",
+                        help="処理段ごとの経過時間・CPU時間・メモリを記録するファイル"
+                             "（.json は Chrome のトレース形式、それ以外は JSON Lines）")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="--trace で区間ごとのメモリのピークも記録する（tracemalloc を使うため遅くなる）")
+    parser.add_argument("--profile", help="cProfile で実行し、統計を保存するファイル（.prof）")
+    args = parser.parse_args(argv)
+    if args.pipeline and args.workers != 1:
+        parser.error("--pipeline と -j/--workers は同時に指定できません")
+    if (args.trace or args.profile) and args.workers != 1:
+        parser.error("--trace・--profile はワーカープロセス内を計測できないため -j/--workers と同時に指定できません")
+    return args
+
+
+def scan_index_path(args: argparse.Namespace) -> Path | None:
+    """走査インデックスのパス（--scan-index か --cache の指定がなければ使わない）"""
+    if args.scan_index:
+        return Path(args.scan_index)
+    if args.cache:
+        return Path(args.cache_dir) / "scan_index.json"
+    return None
+
+
+def print_profile(profile_path: str, limit: int = 25) -> None:
+    """cProfile の統計を累計時間の長い順に表示する"""
+    import pstats
+    print(f"\n===== cProfile（累計時間の上位{limit}件、統計: {profile_path}） =====")
+    pstats.Stats(profile_path).strip_dirs().sort_stats("cumulative").print_stats(limit)
 
 
 if __name__ == "__main__":
     warnings.simplefilter('ignore')
+    args = parse_args()
     try:
-        read_file_or_folder = response()
-        file_list = arg_to_xlsx(read_file_or_folder)
+        read_file_or_folder = args.path if args.path else response()
+        if is_dataset_file(read_file_or_folder) and os.path.isfile(read_file_or_folder):
+            file_list = [read_file_or_folder]
+        else:
+            file_list = arg_to_xlsx(read_file_or_folder, recursive=args.recursive, include=args.include,
+                                    exclude=args.exclude, index_path=scan_index_path(args))
         if len(file_list) > 0:
-            for a_file in file_list:
-                main(a_file)
+            start = time.perf_counter()
+            cache = None
+            if args.cache:
+                cache = ResultCache(cache_dir=Path(args.cache_dir), max_bytes=int(args.cache_size * 2**20))
+            store = ResultsStore(Path(args.store)) if args.store else None
+            main_kwargs = dict(reader_engine=args.reader, cache=cache, store=store,
+                               store_profiles=args.store_profiles, plot_workers=args.plot_workers,
+                               image_format=args.image_format, dpi=args.dpi, plots=args.plots,
+                               plot_points=args.plot_points)
+            recorder = instrument.enable(trace_memory=args.trace_memory) if args.trace else None
+            profiler = None
+            if args.profile:
+                import cProfile
+                profiler = cProfile.Profile()
+                profiler.enable()
+            if args.pipeline:
+                from pipeline import run_pipeline
+                statuses = run_pipeline(file_list, prefetch=args.prefetch, writers=args.writers, **main_kwargs)
+            else:
+                statuses = run_batch(file_list, max_workers=args.workers, **main_kwargs)
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(args.profile)
+                print_profile(args.profile)
+            if recorder is not None:
+                instrument.disable()
+                recorder.write(args.trace)
+                instrument.print_summary(recorder)
+                print(f"計測結果を保存しました: {args.trace}")
+            print_summary(statuses, time.perf_counter() - start)
             print("処理が完了しました。")
         else:
             print("読み込み対象のファイルがありません。")
             
     except Exception as e:
         print(f"エラーが発生しました: {e}")
-
-
-
-
-
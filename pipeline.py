@@ -0,0 +1,201 @@
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from batch import FileStatus
+
+"""
+読み込み・計算・書き出しを重ねて実行するパイプライン
+
+1プロセスの中で、ファイルごとの処理を3つの段に分けてスレッドで並行させる。
+
+  読み込み段（1スレッド）   先のブックを読み込んでおく（ディスク・ネットワーク共有の待ち時間を隠す）
+  計算段（呼び出し元）      main_calculation_flow と評価値の計算
+  書き出し段（複数スレッド）グラフの保存（スレッド間では1枚ずつ描画）・レポートブックの作成・データベースへの登録
+
+段の間のキューには上限があり、後ろの段が詰まると前の段が待つ（読み込み済み・計算済みのデータが
+際限なくたまらない）。段ごとの稼働率を集計するため、どの段が全体の速度を決めているかが分かる。
+"""
+
+_END = None                     # 読み込み段の終了を表すキューの要素
+
+
+def _error_text(e: Exception) -> str:
+    return "".join(traceback.format_exception_only(type(e), e)).strip()
+
+
+@dataclass
+class StageStats:
+    """1つの段の稼働時間の集計"""
+    name: str
+    n_threads: int = 1
+    busy: float = 0.0           # 処理していた時間の合計 [s]
+    blocked: float = 0.0        # 後ろの段の空きを待っていた時間の合計 [s]
+    n_items: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, busy: float = 0.0, blocked: float = 0.0, n_items: int = 0) -> None:
+        with self._lock:
+            self.busy += busy
+            self.blocked += blocked
+            self.n_items += n_items
+
+    def utilization(self, wall: float) -> float:
+        """稼働率（処理していた時間 / (経過時間 × スレッド数)）"""
+        return self.busy / (wall * self.n_threads) if wall > 0 else 0.0
+
+
+@dataclass
+class _FileState:
+    """1ファイル分の処理中のデータ"""
+    file_path: str
+    started: float
+    w_file_name: str = ""
+    cache_key: str | None = None
+    props: object = None
+    all_data: list | None = None
+    all_results: list | None = None
+    error: str | None = None
+    is_skipped: bool = False    # キャッシュから復元した
+
+
+class FilePipeline:
+    """
+    ファイルのリストを読み込み・計算・書き出しの3段で重ねて処理するクラス。
+    main_kwargs は main() と同じキーワード引数（reader_engine・cache・plots など）。
+    """
+    def __init__(self, file_list: List[str], prefetch: int = 2, writers: int = 2, **main_kwargs):
+        self.file_list = list(file_list)
+        self.prefetch = max(1, prefetch)
+        self.writers = max(1, writers)
+        self.main_kwargs = main_kwargs
+        self.stages = {name: StageStats(name, n_threads) for name, n_threads in
+                       (("読み込み", 1), ("計算", 1), ("書き出し", self.writers))}
+        self.wall = 0.0
+        self.statuses: Dict[str, FileStatus] = {}
+        self._write_slots = threading.BoundedSemaphore(self.writers + self.prefetch)
+
+    def _finish(self, state: _FileState, error: str | None = None) -> None:
+        elapsed = time.perf_counter() - state.started
+        self.statuses[state.file_path] = FileStatus(file_path=state.file_path, is_ok=error is None,
+                                                    elapsed=elapsed, error=error)
+
+    def _read_stage(self, read_queue: queue.Queue) -> None:
+        """読み込み段: キャッシュの確認と入力の読み込みを先に進めておく"""
+        from main import output_filename, cache_key_for, read_inputs
+        stats = self.stages["読み込み"]
+        kwargs = self.main_kwargs
+        cache = kwargs.get("cache")
+        for a_file in self.file_list:
+            start = time.perf_counter()
+            state = _FileState(file_path=a_file, started=start)
+            try:
+                state.w_file_name = output_filename(a_file)
+                state.cache_key = cache_key_for(a_file, cache, image_format=kwargs.get("image_format", "png"),
+                                                dpi=kwargs.get("dpi"), plots=kwargs.get("plots", True),
+                                                plot_points=kwargs.get("plot_points"))
+                if state.cache_key is not None and cache.restore(state.cache_key, state.w_file_name):
+                    print(f"変更がないため計算を省略しました: {a_file}")
+                    state.is_skipped = True
+                # 出力をキャッシュから復元した場合も、データベースへの登録には入力が要る
+                if not state.is_skipped or kwargs.get("store") is not None:
+                    state.props, state.all_data = read_inputs(a_file, kwargs.get("reader_engine", "fast"))
+            except Exception as e:
+                state.error = _error_text(e)
+            ready = time.perf_counter()
+            read_queue.put(state)
+            stats.add(busy=ready - start, blocked=time.perf_counter() - ready, n_items=1)
+        read_queue.put(_END)
+
+    def _write_stage(self, state: _FileState) -> None:
+        """書き出し段: グラフ・レポート・データベースへの登録（書き出しスレッドで実行）"""
+        from main import write_outputs
+        stats = self.stages["書き出し"]
+        start = time.perf_counter()
+        kwargs = self.main_kwargs
+        try:
+            output_files = write_outputs(
+                state.file_path, state.w_file_name, state.all_results, state.props,
+                plot_workers=kwargs.get("plot_workers", 1), image_format=kwargs.get("image_format", "png"),
+                dpi=kwargs.get("dpi"), plots=kwargs.get("plots", True), store=kwargs.get("store"),
+                store_profiles=kwargs.get("store_profiles", False), plot_points=kwargs.get("plot_points"))
+            if state.cache_key is not None:
+                kwargs["cache"].store(state.cache_key, state.file_path, state.w_file_name, output_files)
+            self._finish(state)
+        except Exception as e:
+            self._finish(state, _error_text(e))
+        finally:
+            state.all_results = None
+            stats.add(busy=time.perf_counter() - start, n_items=1)
+            self._write_slots.release()
+
+    def run(self) -> List[FileStatus]:
+        """全ファイルを処理し、入力順のFileStatusリストを返す"""
+        from main import compute_results, store_results
+        stats = self.stages["計算"]
+        start = time.perf_counter()
+        read_queue: queue.Queue = queue.Queue(maxsize=self.prefetch)
+        reader = threading.Thread(target=self._read_stage, args=(read_queue,), name="pipeline-reader", daemon=True)
+        reader.start()
+        with ThreadPoolExecutor(max_workers=self.writers, thread_name_prefix="pipeline-writer") as writer_pool:
+            while True:
+                state = read_queue.get()
+                if state is _END:
+                    break
+                if state.error is None and state.is_skipped and self.main_kwargs.get("store") is not None:
+                    busy_start = time.perf_counter()
+                    try:
+                        store_results(state.file_path, state.props, state.all_data, self.main_kwargs["store"],
+                                      store_profiles=self.main_kwargs.get("store_profiles", False))
+                    except Exception as e:
+                        state.error = _error_text(e)
+                    state.all_data = None
+                    stats.add(busy=time.perf_counter() - busy_start, n_items=1)
+                if state.error is not None or state.is_skipped:
+                    self._finish(state, state.error)
+                    continue
+                busy_start = time.perf_counter()
+                try:
+                    state.all_results, _ = compute_results(state.file_path, state.props, state.all_data)
+                except Exception as e:
+                    state.error = _error_text(e)
+                state.all_data = None
+                busy = time.perf_counter() - busy_start
+                if state.error is not None or not state.all_results:
+                    if state.error is None:
+                        print(f"処理対象データがありません: {state.file_path}")
+                    self._finish(state, state.error)
+                    stats.add(busy=busy, n_items=1)
+                    continue
+                # 書き出し待ちが上限に達していれば空くまで待つ
+                wait_start = time.perf_counter()
+                self._write_slots.acquire()
+                stats.add(busy=busy, blocked=time.perf_counter() - wait_start, n_items=1)
+                writer_pool.submit(self._write_stage, state)
+        reader.join()
+        self.wall = time.perf_counter() - start
+        return [self.statuses[a_file] for a_file in self.file_list]
+
+    def print_stage_summary(self) -> None:
+        """段ごとの稼働率を表示する（稼働率が最も高い段が全体の速度を決めている）"""
+        print("\n===== パイプラインの段ごとの稼働状況 =====")
+        print(f"{'段':<6} {'スレッド':>6} {'件数':>6} {'処理[s]':>9} {'待ち[s]':>9} {'稼働率':>7}")
+        for stage in self.stages.values():
+            print(f"{stage.name:<6} {stage.n_threads:>6} {stage.n_items:>6} {stage.busy:>9.2f} "
+                  f"{stage.blocked:>9.2f} {stage.utilization(self.wall):>7.0%}")
+        bottleneck = max(self.stages.values(), key=lambda stage: stage.utilization(self.wall))
+        print(f"律速段: {bottleneck.name}（経過時間 {self.wall:.2f} s）")
+
+
+def run_pipeline(file_list: List[str], prefetch: int = 2, writers: int = 2,
+                 show_stages: bool = True, **main_kwargs) -> List[FileStatus]:
+    """ファイルリストをパイプラインで処理し、入力順のFileStatusリストを返す"""
+    pipeline = FilePipeline(file_list, prefetch=prefetch, writers=writers, **main_kwargs)
+    statuses = pipeline.run()
+    if show_stages:
+        pipeline.print_stage_summary()
+    return statuses
@@ -1,8 +1,30 @@
 from result import *
+from constants import IMAGE_FORMATS
+from instrument import span
 from pathlib import Path
-import matplotlib.pyplot as plt
-
-plt.rcParams['font.family'] = 'MS Gothic'
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+import threading
+
+"""
+グラフ描画モジュール
+
+pyplotのグローバルな状態を使わず、Figure と Agg キャンバスで1枚ずつ独立に描画する。
+描画に必要なデータは GraphJob にまとめるため、ワーカープロセスで並列に描画できる。
+
+点数の多いプロファイルは、GraphJob を作る段階で min/max 間引きをしてから描画する。
+系列を画素の列に相当する区間に分け、区間ごとの最小値・最大値の点だけを残すため、
+描画される線の上下端（ピーク）は元のデータと変わらない。
+"""
+
+FONT_FAMILY = 'MS Gothic'
+DEFAULT_DPI = 100               # dpi未指定時の保存解像度（matplotlibの既定の figure.dpi）
+# 線が描かれる長さ [inch]（自動の間引き区間数 = この長さの画素数）
+# 内径変化量は図の幅、半径変化量（極座標）は図の高さを直径とする円周を上限の目安とする
+TRACE_INCHES = {"diameter": 8.0, "rad": np.pi * 12.0}
+# rc_context はプロセス全体の rcParams を書き換えて戻すため、スレッドからの描画は1枚ずつ行う
+# （パイプラインの書き出しスレッドなど。並列に描画する場合はワーカープロセスを使う）
+_RENDER_LOCK = threading.Lock()
 
 style_dict = {
     '非表示': {'visible': False},
@@ -16,124 +38,186 @@ style_dict = {
     '黒（点線）': {'color': 'black', 'linestyle': 'dotted'},
 }
 
+@dataclass
+class GraphJob:
+    """1枚のグラフの描画に必要なデータ（プロセス間で受け渡しできる）"""
+    kind: str                       # "rad"（極座標の半径変化量） or "diameter"（内径変化量）
+    graph_title: str
+    graph_filename: Path
+    props: InputProperty
+    series: List[tuple] = field(default_factory=list)   # (x_data, y_data, label, style)
+    dpi: float | None = None
+
+
+def minmax_decimate(x_data: np.ndarray, y_data: np.ndarray, n_buckets: int) -> tuple:
+    """
+    系列を n_buckets 個の区間に分け、区間ごとに最小値と最大値の点（元の順番どおり）だけを残す。
+    両端の点は必ず残す。点数が 2*n_buckets 以下の場合やNaNを含む場合はそのまま返す。
+    """
+    n = len(y_data)
+    if n_buckets <= 0 or n <= 2 * n_buckets or np.isnan(y_data).any():
+        return x_data, y_data
+    size = -(-n // n_buckets)                   # 1区間の点数（切り上げ）
+    n_full = n // size
+    body = y_data[:n_full * size].reshape(n_full, size)
+    offsets = np.arange(n_full) * size
+    indices = [offsets + body.argmin(axis=1), offsets + body.argmax(axis=1)]
+    if n_full * size < n:                       # 端数の区間
+        rest = y_data[n_full * size:]
+        indices.append(np.array([n_full * size + rest.argmin(), n_full * size + rest.argmax()]))
+    indices.append(np.array([0, n - 1]))
+    keep = np.unique(np.concatenate(indices))
+    return x_data[keep], y_data[keep]
+
+
+def _new_figure(figsize, **subplot_kw):
+    """pyplotを使わずにAggキャンバス付きのFigureを作る"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1, **subplot_kw)
+    return fig, ax
+
+
+def _render_diameter_graph(job: GraphJob):
+    """内径変化量のグラフ描画"""
+    props = job.props
+    fig, ax = _new_figure((8, 7))
+    for x_data, y_data, plot_label, style in job.series:
+        ax.plot(x_data, y_data, label=plot_label, **style)
+    ax.set_xlabel("角度 [degree]", fontname = FONT_FAMILY, fontsize=20)
+    ax.set_ylabel("内径変化量 [µm]", fontname = FONT_FAMILY, fontsize=20)
+    ax.legend(prop={"family":FONT_FAMILY, "size": 15}, loc='upper right', bbox_to_anchor=(1.2, 1))
+    ax.tick_params(axis='both', labelsize=15)
+    ax.set_xlim(0, 180)
+    x_scale = np.arange(0, 180 + 30, 30)
+    ax.set_xticks(x_scale)
+    if not props.is_auto:
+        ax.set_ylim(props.min_val, props.max_val)
+        try:
+            y_scale = np.arange(
+                props.min_val,
+                props.max_val + props.interval,
+                props.interval
+            )
+            ax.set_yticks(y_scale)
+        except Exception as e:
+            print(f"警告: Y軸の目盛設定に失敗しました。自動設定を使用します。({e})")
+    ax.set_title(job.graph_title, fontsize=25)
+    fig.tight_layout(rect=(0, 0, 0.95, 1)) # 右側に凡例用のスペースを確保
+    fig.savefig(job.graph_filename, dpi=job.dpi or "figure")
+
+
+def _render_rad_graph(job: GraphJob):
+    """半径変化量のグラフ描画"""
+    fig, ax = _new_figure((12, 10), projection='polar')
+
+    overall_max = max((np.max(y_data) for _, y_data, _, _ in job.series), default=-float("inf"))
+    overall_min = min((np.min(y_data) for _, y_data, _, _ in job.series), default=float("inf"))
+    max_abs_val = max(overall_max, abs(overall_min))
+
+    for x_data, y_data, plot_label, style in job.series:
+        ax.plot(x_data, y_data, label=plot_label, **style)
+
+    if max_abs_val > 30:
+        ax.set_rticks([-250, -100, -75, -50, -25, 0, 25, 50, 75, 100])
+        ax.set_yticklabels(['', '-100[µm]', '-75', '-50', '-25', '0', '25', '50', '75', '100'])
+    elif max_abs_val > 20:
+        ax.set_rticks([-70, -30, -20, -10, 0, 10, 20, 30])
+        ax.set_yticklabels(["", "-30[µm]", "-20",  "-10", "0", "10", "20", "30"])
+    else:
+        ax.set_rticks([-60, -20, -15, -10, -5, 0, 5, 10, 15, 20])
+        ax.set_yticklabels(["", "-20[µm]", "-15", "-10", "-5", "0", "5", "10", "15", "20"])
+
+    ax.tick_params(axis='y', labelsize=18)
+    ax.tick_params(axis='x', labelsize=20)
+    ax.set_theta_direction(-1)
+    ax.set_rlabel_position(-50)  # メモリラベルの位置調整
+    ax.set_theta_zero_location("W")
+    ax.set_theta_offset(np.radians(-job.props.rotation + 180))
+    ax.legend(loc='upper right', bbox_to_anchor=(1.25, 1), fontsize=20)
+    ax.set_title(job.graph_title, fontsize=25)
+    fig.savefig(job.graph_filename, dpi=job.dpi or "figure")
+
+
+def render_graph(job: GraphJob) -> Path:
+    """GraphJobを描画して保存する（ワーカープロセスからも呼び出せる。同じプロセス内のスレッド間では1枚ずつ描画する）"""
+    import matplotlib
+    with span("render_graph", graph=Path(job.graph_filename).name), _RENDER_LOCK, \
+            matplotlib.rc_context({'font.family': FONT_FAMILY}):
+        if job.kind == "rad":
+            _render_rad_graph(job)
+        else:
+            _render_diameter_graph(job)
+    return job.graph_filename
+
+
 class Plotter:
     """複数の計算結果をまとめてグラフ化するクラス"""
-    def __init__(self, results: List[BaseResult], props: InputProperty, write_filename: str):
+    def __init__(self, results: List[BaseResult], props: InputProperty, write_filename: str,
+                 image_format: str = "png", dpi: float | None = None, max_points: int | None = None):
+        """
+        max_points: 1系列あたりの間引き区間数（描画される点数はその2倍まで）。
+        Noneなら保存する画像の画素数から自動で決める。0で間引かない。
+        """
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"image_formatは{IMAGE_FORMATS}のいずれかを指定してください: {image_format}")
         self.results = results
         self.props = props
         self.write_filename = write_filename
+        self.image_format = image_format
+        self.dpi = dpi
+        self.max_points = max_points
         self.x_axis_for_dia = results[0].dia_degrees
         self.x_axis_for_rad = np.radians(results[0].rad_degrees)
 
-    def plot_all_graphs(self):
-        """全種類のグラフを生成・保存する"""
-        self._plot_rad_graph("半径変化量", "change_radius", "fft_change_radius")
-        self._plot_rad_graph("半径変化量（最小二乗円補正）", "lsm_change_radius", "fft_lsm_change_radius")
-        self._plot_diameter_graph("内径変化量", "change_diameter", "fft_change_diameter")
-
-    def _plot_diameter_graph(self, title: str, raw_attr: str, fft_attr: str):
-        """内径変化量のグラフ描画"""
-        plt.figure(figsize=(8, 7))
-        for res in self.results:
-            y_data = getattr(res, fft_attr) if isinstance(res, FFTResult) else getattr(res, raw_attr)
-            plot_label = None if res.line_color == "非表示" else res.situation
-            plt.plot(self.x_axis_for_dia, y_data, label=plot_label, **style_dict[res.line_color])
-            plt.plot()
-        plt.xlabel("角度 [degree]", fontname = "MS Gothic", fontsize=20)
-        plt.ylabel("内径変化量 [µm]", fontname = "MS Gothic", fontsize=20)
-        # plt.legend(prop={"family":"MS Gothic", "size": 15}, loc="upper right")
-        plt.legend(prop={"family":"MS Gothic", "size": 15}, loc='upper right', bbox_to_anchor=(1.2, 1))
-        plt.tick_params(axis='both', labelsize=15)
-        plt.xlim(0, 180)
-        x_scale = np.arange(0, 180 + 30, 30)
-        plt.xticks(x_scale)
-        if not self.props.is_auto:
-            plt.ylim(self.props.min_val, self.props.max_val)
-            try:
-                y_scale = np.arange(
-                    self.props.min_val,
-                    self.props.max_val + self.props.interval,
-                    self.props.interval
-                )
-                plt.yticks(y_scale)
-            except Exception as e:
-                print(f"警告: Y軸の目盛設定に失敗しました。自動設定を使用します。({e})")
-        r_file_path = Path(self.write_filename)
-        r_file_path_name = r_file_path.name.replace(".xlsx", "")
-        w_graph_folder_path = r_file_path.parent / f"{r_file_path_name}_グラフフォルダ"
-        w_graph_folder_path.mkdir(exist_ok=True)
-        graph_filename = w_graph_folder_path / f"{r_file_path_name}_{title}.png"
-        graph_title = r_file_path_name.replace("結果_", "") + "_" + title + "\n"
-        plt.title(graph_title, fontsize=25)
-        plt.tight_layout(rect=(0, 0, 0.95, 1)) # 右側に凡例用のスペースを確保
-        plt.savefig(graph_filename)
-        plt.close()
-        print(f"グラフを保存しました: {graph_filename}")
-             
-    def _plot_rad_graph(self, title: str, raw_attr: str, fft_attr: str):
-        """半径変化量のグラフ描画"""
-        fig, ax =  plt.subplots(figsize=(12, 10), subplot_kw={'projection': 'polar'})
-
-        overall_max = -float("inf")
-        overall_min = float("inf")
-        all_y_data = []
-
+    def build_jobs(self) -> List[GraphJob]:
+        """全種類のグラフのGraphJobを作る"""
+        return [
+            self._build_job("rad", "半径変化量", "change_radius", "fft_change_radius"),
+            self._build_job("rad", "半径変化量（最小二乗円補正）", "lsm_change_radius", "fft_lsm_change_radius"),
+            self._build_job("diameter", "内径変化量", "change_diameter", "fft_change_diameter"),
+        ]
+
+    def plot_all_graphs(self, max_workers: int = 1) -> List[Path]:
+        """
+        全種類のグラフを生成・保存し、保存したファイルのパスを返す。
+        max_workers が2以上の場合はワーカープロセスで並列に描画する。
+        """
+        with span("build_graph_jobs"):
+            jobs = self.build_jobs()
+        if max_workers > 1:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+                graph_filenames = list(executor.map(render_graph, jobs))
+        else:
+            graph_filenames = [render_graph(job) for job in jobs]
+        for graph_filename in graph_filenames:
+            print(f"グラフを保存しました: {graph_filename}")
+        return graph_filenames
+
+    def _build_job(self, kind: str, title: str, raw_attr: str, fft_attr: str) -> GraphJob:
+        """描画に使うデータ・ファイル名・タイトルをGraphJobにまとめる"""
+        x_data = self.x_axis_for_rad if kind == "rad" else np.asarray(self.x_axis_for_dia)
+        n_buckets = self.n_buckets(kind)
+        series = []
         for res in self.results:
             y_data = getattr(res, fft_attr) if isinstance(res, FFTResult) else getattr(res, raw_attr)
-            all_y_data.append(y_data)
-            if max(y_data) > overall_max:
-                overall_max = max(y_data)
-            if min(y_data) < overall_min:
-                overall_min = min(y_data)
-
-        max_abs_val = max(overall_max, abs(overall_min))
-
-
-        for i, res in enumerate(self.results):
-            y_data = all_y_data[i]
             plot_label = None if res.line_color == '非表示' else res.situation
-            plt.plot(self.x_axis_for_rad, y_data, label=plot_label, **style_dict[res.line_color])
-                
-        if max_abs_val > 30:
-            ax.set_rticks([-250, -100, -75, -50, -25, 0, 25, 50, 75, 100]) 
-            ax.set_yticklabels(['', '-100[µm]', '-75', '-50', '-25', '0', '25', '50', '75', '100'])
-        elif max_abs_val > 20:
-            ax.set_rticks([-70, -30, -20, -10, 0, 10, 20, 30])
-            ax.set_yticklabels(["", "-30[µm]", "-20",  "-10", "0", "10", "20", "30"])
-        else:
-            ax.set_rticks([-60, -20, -15, -10, -5, 0, 5, 10, 15, 20])
-            ax.set_yticklabels(["", "-20[µm]", "-15", "-10", "-5", "0", "5", "10", "15", "20"])
-
-        ax.tick_params(axis='y', labelsize=18)
-        ax.tick_params(axis='x', labelsize=20)
-        ax.set_theta_direction(-1)
-        ax.set_rlabel_position(-50)  # メモリラベルの位置調整
-        ax.set_theta_zero_location("W")  
-        ax.set_theta_offset(np.radians(-self.props.rotation + 180))
-        ax.legend(loc='upper right', bbox_to_anchor=(1.25, 1), fontsize=20)
+            x_plot, y_plot = minmax_decimate(x_data, np.asarray(y_data), n_buckets)
+            series.append((x_plot, y_plot, plot_label, style_dict[res.line_color]))
+
         r_file_path = Path(self.write_filename)
         r_file_path_name = r_file_path.name.replace(".xlsx", "")
         w_graph_folder_path = r_file_path.parent / f"{r_file_path_name}_グラフフォルダ"
         w_graph_folder_path.mkdir(exist_ok=True)
-        graph_filename = w_graph_folder_path / f"{r_file_path_name}_{title}.png"
+        graph_filename = w_graph_folder_path / f"{r_file_path_name}_{title}.{self.image_format}"
         graph_title = r_file_path_name.replace("結果_", "") + "_" + title + "\n"
-        plt.title(graph_title, fontsize=25)
-        plt.savefig(graph_filename)
-        plt.close()
-        print(f"グラフを保存しました: {graph_filename}")
-
-
-
-
-
-
-
-#   plt.plot(degrees, pre_invfft, label="運転時")
-#   plt.xlabel("角度[°]", fontname = "MS Gothic")
-#   plt.ylabel("内径変化量 [µm]", fontname = "MS Gothic")
-#   plt.legend(prop={"family":"MS Gothic"})
-#   plt.ylim([-100, 100])
-#   # plt.ylim([-30, 35])
-#   plt.title(file_name)
-#   plt.savefig(fname = dir_path + "\\result\\" + file_name + "_figure.png") 
-#   plt.close()
\ No newline at end of file
+        return GraphJob(kind=kind, graph_title=graph_title, graph_filename=graph_filename,
+                        props=self.props, series=series, dpi=self.dpi)
+
+    def n_buckets(self, kind: str) -> int:
+        """間引きの区間数（0なら間引かない）"""
+        if self.max_points is not None:
+            return int(self.max_points)
+        return int(TRACE_INCHES[kind] * (self.dpi or DEFAULT_DPI))
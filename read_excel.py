@@ -1,19 +1,110 @@
-import os
-import re
-import sys
-import csv
-import openpyxl as pyxl
 import pandas as pd
 import numpy  as np
-import matplotlib.pyplot as plt
-import math
-from dataclasses import dataclass
-from typing import List
-
-import pandas as pd
-import openpyxl as pyxl
 from dataclasses import dataclass, field
-from typing import List
+from typing import Dict, List, Sequence
+from fast_reader import XlsxArchive, CoordSheet, UnsupportedWorkbookError
+from constants import COORD_SHEET, SETTING_SHEET, REQUIRED_SHEETS, READER_ENGINES, COORD_COLUMNS
+
+
+class WorkbookSession:
+    """
+    入力Excelファイルを1度だけ開き、
+    シート名の確認・設定セルの読み込み・座標データの読み込みに共有するクラス
+
+    engine="fast" はシートXMLを直接読む高速リーダー（fast_reader）を使い、
+    engine="pandas" は従来どおり pandas + openpyxl（読み取り専用）で読み込む。
+    高速リーダーで扱えないファイルは自動的に pandas に切り替える。
+    """
+    def __init__(self, file_path: str, engine: str = "fast"):
+        if engine not in READER_ENGINES:
+            raise ValueError(f"engineは{READER_ENGINES}のいずれかを指定してください: {engine}")
+        self.file_path = file_path
+        self.engine = engine
+        self._archive: XlsxArchive | None = None
+        self._excel_file: pd.ExcelFile | None = None
+        if engine == "fast":
+            try:
+                self._archive = XlsxArchive(file_path)
+                self._archive.sheet_parts
+            except UnsupportedWorkbookError:
+                self._fall_back_to_pandas()
+
+    def _fall_back_to_pandas(self):
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+        self.engine = "pandas"
+
+    @property
+    def excel_file(self) -> pd.ExcelFile:
+        """pandas用のExcelFile（必要になった時点で開く）"""
+        if self._excel_file is None:
+            self._excel_file = pd.ExcelFile(self.file_path, engine="openpyxl")
+        return self._excel_file
+
+    @property
+    def sheet_names(self) -> List[str]:
+        if self._archive is not None:
+            return self._archive.sheet_names
+        return self.excel_file.sheet_names
+
+    def has_required_sheets(self) -> bool:
+        """「座標入力」と「設定」シートが両方含まれているかを返す"""
+        return all(name in self.sheet_names for name in REQUIRED_SHEETS)
+
+    def read_cells(self, sheet_name: str, refs: Sequence[str]) -> Dict[str, object]:
+        """
+        指定セル（"C6"など）の値をまとめて返す。
+        読み取り専用モードではセル単位のアクセスが遅いため、必要な範囲を1度だけ走査する。
+        """
+        if self._archive is not None:
+            try:
+                return self._archive.read_cells(sheet_name, refs)
+            except UnsupportedWorkbookError:
+                self._fall_back_to_pandas()
+        from openpyxl.utils.cell import coordinate_to_tuple
+        positions = {ref: coordinate_to_tuple(ref) for ref in refs}
+        max_row = max(row for row, _ in positions.values())
+        max_col = max(col for _, col in positions.values())
+        rows = list(self.excel_file.book[sheet_name].iter_rows(
+            min_row=1, max_row=max_row, min_col=1, max_col=max_col, values_only=True))
+        values = {}
+        for ref, (row, col) in positions.items():
+            if row <= len(rows) and col <= len(rows[row - 1]):
+                values[ref] = rows[row - 1][col - 1]
+            else:
+                values[ref] = None
+        return values
+
+    def read_coord_sheet(self, sheet_name: str = COORD_SHEET) -> CoordSheet | None:
+        """
+        高速リーダーで座標入力シートを読み込む。
+        pandasエンジンの場合や高速リーダーで扱えない場合はNoneを返す。
+        """
+        if self._archive is None:
+            return None
+        try:
+            return self._archive.read_coord_sheet(sheet_name)
+        except UnsupportedWorkbookError:
+            self._fall_back_to_pandas()
+            return None
+
+    def read_sheet_frame(self, sheet_name: str) -> pd.DataFrame:
+        """シート全体をヘッダーなしのDataFrameとして読み込む"""
+        return self.excel_file.parse(sheet_name, header=None)
+
+    def close(self):
+        if self._archive is not None:
+            self._archive.close()
+        if self._excel_file is not None:
+            self._excel_file.close()
+
+    def __enter__(self) -> 'WorkbookSession':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 
 @dataclass
 class InputData:
@@ -29,49 +120,108 @@ class InputData:
     sorted_coord: pd.DataFrame | None = field(init=False, default=None)
 
     @classmethod
-    def from_excel(cls, file_path: str) -> List['InputData']:
+    def from_excel(cls, file_path: str, engine: str = "fast") -> List['InputData']:
         """
         Excelの入力データをInputDataクラスに登録するメソッド
         """
+        with WorkbookSession(file_path, engine=engine) as book:
+            return cls.from_workbook(book)
+
+    @classmethod
+    def from_workbook(cls, book: WorkbookSession) -> List['InputData']:
+        """
+        開いているWorkbookSessionの座標入力シートをInputDataクラスに登録するメソッド
+        """
+        coord_sheet = book.read_coord_sheet(COORD_SHEET)
+        if coord_sheet is not None:
+            return cls.from_coord_sheet(coord_sheet)
+        return cls.from_frame(book.read_sheet_frame(COORD_SHEET))
+
+    @classmethod
+    def _from_header(cls, situation, fft_on_or_off_str, is_standard_str, line_color,
+                     is_error_str, coord: pd.DataFrame) -> 'InputData':
+        """ヘッダー行の値を判定してInputDataを生成する（読み込みエンジン共通）"""
+        if fft_on_or_off_str == "on":
+            fft_on_or_off = True
+        else:
+            fft_on_or_off = False
+
+        if is_standard_str == "基準とする":
+            is_standard = True
+        else:
+            is_standard = False
+        if is_error_str == "行数OK":
+            is_error = False
+        else:
+            is_error = True
+
+        return cls(
+            situation=situation,
+            fft_on_or_off=fft_on_or_off,
+            is_standard=is_standard,
+            line_color=line_color,
+            is_error=is_error,
+            coord=coord
+        )
+
+    @classmethod
+    def from_coord_sheet(cls, coord_sheet: CoordSheet) -> List['InputData']:
+        """高速リーダーの読み込み結果（float64配列）からInputDataを生成する"""
+        all_input_data = []
+        for block, header in enumerate(coord_sheet.headers):
+            if block in coord_sheet.invalid_values:
+                e = f"could not convert string to float: '{coord_sheet.invalid_values[block]}'"
+                raise TypeError(f"座標データに数値以外の値が含まれています。 situation: '{header.situation}', エラー: {e}")
+            coord = pd.DataFrame(coord_sheet.values[block], columns=COORD_COLUMNS, copy=False)
+            all_input_data.append(cls._from_header(
+                header.situation, header.fft_on_or_off, header.is_standard,
+                header.line_color, header.error_check, coord))
+        return all_input_data
+
+    @classmethod
+    def from_array(cls, situation: str, coord, fft_on_or_off: bool = False, is_standard: bool = False,
+                   line_color: str = "黒", is_error: bool = False) -> 'InputData':
+        """
+        Excelを経由せずに座標配列からInputDataを生成するメソッド。
+        coord は (点数, 4) の配列（列は COORD_COLUMNS の順）か、列名 -> 配列 の辞書。
+        """
+        if isinstance(coord, dict):
+            missing = [name for name in COORD_COLUMNS if name not in coord]
+            if missing:
+                raise ValueError(f"座標データの列が足りません。 situation: '{situation}', 列: {missing}")
+            values = np.column_stack([np.asarray(coord[name], dtype=float) for name in COORD_COLUMNS])
+        else:
+            values = np.asarray(coord, dtype=float)
+        if values.ndim != 2 or values.shape[1] != len(COORD_COLUMNS):
+            raise ValueError(f"座標データは (点数, {len(COORD_COLUMNS)}) の配列で指定してください。 "
+                             f"situation: '{situation}', 形状: {values.shape}")
+        return cls(
+            situation=situation,
+            fft_on_or_off=bool(fft_on_or_off),
+            is_standard=bool(is_standard),
+            line_color=line_color,
+            is_error=bool(is_error),
+            coord=pd.DataFrame(values, columns=COORD_COLUMNS, copy=False)
+        )
+
+    @classmethod
+    def from_frame(cls, input_df: pd.DataFrame) -> List['InputData']:
+        """pandasで読み込んだ座標入力シートのDataFrameからInputDataを生成する"""
         all_input_data = []
-        input_df = pd.read_excel(file_path, header=None, sheet_name="座標入力")
         for col_start in range(0, input_df.shape[1], 4):
             situation = input_df.iloc[0, col_start]
-            fft_on_or_off_str = input_df.iloc[2, col_start]
-            if fft_on_or_off_str == "on":
-                fft_on_or_off = True
-            else:
-                fft_on_or_off = False
-
-            is_standard_str = input_df.iloc[2, col_start + 1]
-            if is_standard_str == "基準とする":
-                is_standard = True
-            else:
-                is_standard = False
-            line_color = input_df.iloc[2, col_start + 2]
-            is_error_str = input_df.iloc[2, col_start + 3]
-            if is_error_str == "行数OK":
-                is_error = False
-            else:
-                is_error = True
             coord = input_df.iloc[4:, col_start:col_start + 4].copy()
             coord = coord.reset_index(drop=True)
-            coord.columns = ["cap_y", "cap_x", "rod_y", "rod_x"]
+            coord.columns = COORD_COLUMNS
 
             try:
                 coord = coord.astype(float)
             except ValueError as e:
                 raise TypeError(f"座標データに数値以外の値が含まれています。 situation: '{situation}', エラー: {e}")
-            
-            input_data_item = cls(
-                situation=situation,
-                fft_on_or_off=fft_on_or_off,
-                is_standard=is_standard,
-                line_color=line_color,
-                is_error=is_error,
-                coord=coord
-            )
-            all_input_data.append(input_data_item)
+
+            all_input_data.append(cls._from_header(
+                situation, input_df.iloc[2, col_start], input_df.iloc[2, col_start + 1],
+                input_df.iloc[2, col_start + 2], input_df.iloc[2, col_start + 3], coord))
         return all_input_data
 
 
@@ -90,24 +240,31 @@ class InputProperty:
     threshold_lsm: float
 
     @classmethod
-    def from_excel(cls, file_path: str) -> 'InputProperty':
+    def from_excel(cls, file_path: str, engine: str = "fast") -> 'InputProperty':
         """
         Excelの入力データをInputPropertyクラスに登録するメソッド
         """
-        wb = pyxl.load_workbook(file_path)
-        sht = wb["設定"]
-        max_val = sht["C6"].value
-        min_val = sht["C7"].value
-        interval = sht["C8"].value
-        rotation = sht["G3"].value
-        auto_or_manual_str = sht["C5"].value
+        with WorkbookSession(file_path, engine=engine) as book:
+            return cls.from_workbook(book)
+
+    @classmethod
+    def from_workbook(cls, book: WorkbookSession) -> 'InputProperty':
+        """
+        開いているWorkbookSessionの設定シートをInputPropertyクラスに登録するメソッド
+        """
+        sht = book.read_cells(SETTING_SHEET, ["C4", "D4", "E4", "C5", "C6", "C7", "C8", "G3"])
+        max_val = sht["C6"]
+        min_val = sht["C7"]
+        interval = sht["C8"]
+        rotation = sht["G3"]
+        auto_or_manual_str = sht["C5"]
         if auto_or_manual_str == "自動":
             is_auto = True
         else:
             is_auto = False
-        threshold_dia = sht["C4"].value
-        threshold_rad = sht["D4"].value
-        threshold_lsm = sht["E4"].value
+        threshold_dia = sht["C4"]
+        threshold_rad = sht["D4"]
+        threshold_lsm = sht["E4"]
 
         input_property_item = cls(
             is_auto=is_auto,
@@ -120,6 +277,33 @@ class InputProperty:
             threshold_dia=float(threshold_dia)
         )
         return input_property_item
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, object]) -> 'InputProperty':
+        """
+        設定シートと同じ内容を 項目名 -> 値 の辞書から生成するメソッド（項目名はフィールド名）。
+        is_auto は真偽値のほか "自動"/"手動" でも指定できる。
+        自動の場合、max_val・min_val・interval は省略できる。
+        """
+        is_auto = values.get("is_auto", True)
+        if isinstance(is_auto, str):
+            is_auto = is_auto == "自動"
+        required = ["threshold_dia", "threshold_rad", "threshold_lsm"]
+        if not is_auto:
+            required += ["max_val", "min_val", "interval"]
+        missing = [name for name in required if values.get(name) is None]
+        if missing:
+            raise ValueError(f"設定の項目が足りません: {missing}")
+        return cls(
+            is_auto=bool(is_auto),
+            max_val=float(values.get("max_val", np.nan)),
+            min_val=float(values.get("min_val", np.nan)),
+            interval=float(values.get("interval", np.nan)),
+            rotation=float(values.get("rotation", 0.0)),
+            threshold_rad=float(values["threshold_rad"]),
+            threshold_lsm=float(values["threshold_lsm"]),
+            threshold_dia=float(values["threshold_dia"])
+        )
     
 
     
@@ -0,0 +1,289 @@
+import math
+import os
+import re
+import tempfile
+import zipfile
+from itertools import zip_longest
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Sequence
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+
+"""
+計算結果レポート（xlsx）の書き出しモジュール
+
+openpyxl のセルオブジェクトを作らず、シートXMLを行単位で直接zipに書き出す。
+書式（見出しの罫線・太字・中央揃え）は styles.xml にあらかじめ定義しておき、セルからは番号で参照する。
+メモリに持つのは書き出し中の1シート分の列データだけで、書き終えたシートは破棄する。
+"""
+
+EXCEL_MAX_ROWS = 1048576        # 1シートの最大行数
+_ROWS_PER_CHUNK = 4096          # 1度に文字列化してzipへ書き出す行数
+_INVALID_TITLE = re.compile(r"[\\*?:/\[\]]")
+
+# styles.xml の cellXfs の番号
+_STYLE_HEADER_FIRST = 1         # 結合見出しの先頭セル（太字・中央揃え・四方罫線）
+_STYLE_HEADER_MIDDLE = 2        # 結合見出しの中間セル（上下罫線）
+_STYLE_HEADER_LAST = 3          # 結合見出しの末尾セル（上下右罫線）
+
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_XML_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_STYLES_XML = (
+    _XML_DECL +
+    f'<styleSheet xmlns="{_MAIN_NS}">'
+    '<fonts count="2">'
+    '<font><sz val="11"/><name val="Calibri"/><family val="2"/><scheme val="minor"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/><family val="2"/><scheme val="minor"/></font>'
+    '</fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="4">'
+    '<border><left/><right/><top/><bottom/><diagonal/></border>'
+    '<border><left style="thin"><color rgb="FF000000"/></left><right style="thin"><color rgb="FF000000"/></right>'
+    '<top style="thin"><color rgb="FF000000"/></top><bottom style="thin"><color rgb="FF000000"/></bottom><diagonal/></border>'
+    '<border><left/><right/>'
+    '<top style="thin"><color rgb="FF000000"/></top><bottom style="thin"><color rgb="FF000000"/></bottom><diagonal/></border>'
+    '<border><left/><right style="thin"><color rgb="FF000000"/></right>'
+    '<top style="thin"><color rgb="FF000000"/></top><bottom style="thin"><color rgb="FF000000"/></bottom><diagonal/></border>'
+    '</borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" applyAlignment="1">'
+    '<alignment horizontal="center" vertical="center"/></xf>'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="2" xfId="0" applyBorder="1"/>'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="3" xfId="0" applyBorder="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+class ReportBlock(NamedTuple):
+    """
+    シート上に横に並べる1ブロック（1行目に結合見出し、2行目以降に列データ）
+    columns は 列名 -> 値の配列（DataFrameも可）。has_header=False の場合は列名の行を書かない。
+    gap はブロックの左に空ける列数。
+    """
+    title: str
+    columns: Dict[str, Sequence]
+    has_header: bool = True
+    gap: int = 0
+
+
+def column_letter(col: int) -> str:
+    """1始まりの列番号を列記号（A, B, ..., AA）に変換する"""
+    letters = ""
+    while col > 0:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _string_cell(ref: str, text, style: int = 0) -> str:
+    style_attr = f' s="{style}"' if style else ""
+    return f'<c r="{ref}"{style_attr} t="inlineStr"><is><t xml:space="preserve">{escape(str(text))}</t></is></c>'
+
+
+def _value_cell(ref: str, value) -> str:
+    """1セル分のXML（空・NaNは空文字、無限大は pandas と同じく文字列 "inf"）"""
+    if isinstance(value, np.generic):
+        value = value.item()        # NumPyのスカラー（np.int64・np.float32・np.bool_ など）はPythonの値にする
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        if isinstance(value, float):
+            if math.isnan(value):
+                return ""
+            if math.isinf(value):
+                return _string_cell(ref, "inf" if value > 0 else "-inf")
+        return f'<c r="{ref}"><v>{value!r}</v></c>'
+    return _string_cell(ref, value)
+
+
+def _column_cells(letter: str, first_row: int, values) -> List[str]:
+    """1列分のセルXMLを行順に返す（数値の列は一括判定して高速に文字列化する）"""
+    array = np.asarray(values)
+    if array.dtype.kind == "U" and not isinstance(values, np.ndarray):
+        array = np.asarray(values, dtype=object)   # 数値と文字列が混在するリストの数値を文字列にしない
+    if array.dtype.kind == "f" and np.isfinite(array).all():
+        return [f'<c r="{letter}{row}"><v>{value!r}</v></c>'
+                for row, value in enumerate(array.tolist(), first_row)]
+    return [_value_cell(f"{letter}{row}", value) for row, value in enumerate(array.tolist(), first_row)]
+
+
+def sheet_rows(blocks: Sequence[ReportBlock]) -> int:
+    """ブロックを並べたシートの行数（結合見出し・列名の行を含む）"""
+    return max((len(values) + (2 if block.has_header else 1)
+                for block in blocks for values in block.columns.values()), default=1)
+
+
+class ReportWriter:
+    """
+    計算結果のブックを1シートずつストリーミングで書き出すクラス
+    with文で使い、抜けるときに（例外がなければ）ブックを完成させる。
+    書き出し中は同じフォルダの一時ファイルに書き、完成したときだけ file_name に置き換える
+    （途中で失敗しても壊れたブックを残さず、前回のブックも上書きしない）。
+    """
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.sheet_titles: List[str] = []
+        self.array_files: List[Path] = []   # シートに収まらず別ファイルに保存した列（write_arrays）
+        fd, self._tmp_name = tempfile.mkstemp(prefix=".tmp_", suffix=".xlsx",
+                                              dir=os.path.dirname(os.path.abspath(file_name)))
+        os.close(fd)
+        try:
+            self._archive = zipfile.ZipFile(self._tmp_name, "w", compression=zipfile.ZIP_DEFLATED,
+                                            compresslevel=1)
+        except BaseException:
+            os.unlink(self._tmp_name)
+            raise
+
+    def _unique_title(self, title: str) -> str:
+        """シート名の検証と重複回避（openpyxlと同じく末尾に番号を付ける）"""
+        if _INVALID_TITLE.search(title):
+            raise ValueError(f"シート名に使用できない文字が含まれています: {title}")
+        existing = {name.lower() for name in self.sheet_titles}
+        unique, count = title, 0
+        while unique.lower() in existing:
+            count += 1
+            unique = f"{title}{count}"
+        return unique
+
+    def write_sheet(self, title: str, blocks: Sequence[ReportBlock]) -> str:
+        """ブロックを左から順に並べた1シートを書き出し、実際のシート名を返す"""
+        title = self._unique_title(title)
+        n_rows = sheet_rows(blocks)
+        if n_rows > EXCEL_MAX_ROWS:
+            raise ValueError(f"シート「{title}」の行数（{n_rows}）がExcelの上限（{EXCEL_MAX_ROWS}）を超えます")
+        header_cells: List[str] = []
+        merges: List[str] = []
+        columns: List[List[str]] = []
+        col = 1
+        for block in blocks:
+            col += block.gap
+            names = list(block.columns)
+            first_col, last_col = col, col + len(names) - 1
+            for name in names:
+                letter = column_letter(col)
+                cells = [_string_cell(f"{letter}2", name)] if block.has_header else []
+                first_row = 3 if block.has_header else 2
+                cells += _column_cells(letter, first_row, block.columns[name])
+                columns.append(cells)
+                if col == first_col:
+                    header_cells.append(_string_cell(f"{letter}1", block.title, _STYLE_HEADER_FIRST))
+                else:
+                    style = _STYLE_HEADER_LAST if col == last_col else _STYLE_HEADER_MIDDLE
+                    header_cells.append(f'<c r="{letter}1" s="{style}"/>')
+                col += 1
+            if last_col > first_col:
+                merges.append(f"{column_letter(first_col)}1:{column_letter(last_col)}1")
+        last_ref = f"{column_letter(max(col - 1, 1))}{n_rows}"
+
+        self.sheet_titles.append(title)
+        part = f"xl/worksheets/sheet{len(self.sheet_titles)}.xml"
+        with self._archive.open(part, "w") as sheet:
+            sheet.write((_XML_DECL + f'<worksheet xmlns="{_MAIN_NS}"><dimension ref="A1:{last_ref}"/>'
+                         f'<sheetData><row r="1">{"".join(header_cells)}</row>').encode("utf-8"))
+            rows = zip_longest(*columns, fillvalue="")
+            row_number = 2
+            while True:
+                chunk = [f'<row r="{row}">{"".join(cells)}</row>'
+                         for row, cells in zip(range(row_number, row_number + _ROWS_PER_CHUNK), rows)]
+                if not chunk:
+                    break
+                sheet.write("".join(chunk).encode("utf-8"))
+                row_number += len(chunk)
+            tail = "</sheetData>"
+            if merges:
+                tail += f'<mergeCells count="{len(merges)}">'
+                tail += "".join(f'<mergeCell ref="{ref}"/>' for ref in merges) + "</mergeCells>"
+            sheet.write((tail + "</worksheet>").encode("utf-8"))
+        return title
+
+    def write_arrays(self, title: str, blocks: Sequence[ReportBlock]) -> Path:
+        """
+        シートに収まらないブロックの列を、ブックと同じフォルダの「<ブック名>_<シート名>.npz」に保存してパスを返す。
+        配列の名前は「<ブロック名>_<列名>」。シート名は次に write_sheet(title) で付く名前と同じにする。
+        """
+        path = Path(self.file_name).with_name(f"{Path(self.file_name).stem}_{self._unique_title(title)}.npz")
+        arrays = {}
+        for block in blocks:
+            for name, values in block.columns.items():
+                arrays[f"{block.title}_{name}"] = np.asarray(values)
+        np.savez(path, **arrays)
+        self.array_files.append(path)
+        return path
+
+    def _write_package_parts(self):
+        """ブック・リレーション・コンテンツタイプ・書式の各パーツを書き出す"""
+        n_sheets = len(self.sheet_titles)
+        sheets = "".join(f'<sheet name={quoteattr(title)} sheetId="{i}" r:id="rId{i}"/>'
+                         for i, title in enumerate(self.sheet_titles, 1))
+        self._archive.writestr("xl/workbook.xml", _XML_DECL +
+            f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}"><sheets>{sheets}</sheets></workbook>')
+        rels = "".join(
+            f'<Relationship Id="rId{i}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+            for i in range(1, n_sheets + 1))
+        rels += f'<Relationship Id="rId{n_sheets + 1}" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+        self._archive.writestr("xl/_rels/workbook.xml.rels",
+                               _XML_DECL + f'<Relationships xmlns="{_PKG_REL_NS}">{rels}</Relationships>')
+        self._archive.writestr("xl/styles.xml", _STYLES_XML)
+        self._archive.writestr("_rels/.rels", _XML_DECL +
+            f'<Relationships xmlns="{_PKG_REL_NS}">'
+            f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>')
+        overrides = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, n_sheets + 1))
+        self._archive.writestr("[Content_Types].xml", _XML_DECL +
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f'{overrides}</Types>')
+
+    def close(self):
+        """ブックを完成させて閉じ、一時ファイルを file_name に置き換える"""
+        if self._archive is None:
+            return
+        if not self.sheet_titles:
+            self.discard()
+            raise IndexError("出力するシートがありません。")
+        try:
+            self._write_package_parts()
+            self._archive.close()
+            self._archive = None
+            os.replace(self._tmp_name, self.file_name)
+        except BaseException:
+            self.discard()
+            raise
+
+    def discard(self):
+        """書き出し中のブックを破棄する（file_name の既存のブックはそのまま）"""
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+        try:
+            os.unlink(self._tmp_name)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> 'ReportWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
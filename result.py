@@ -1,39 +1,145 @@
-import os
-import re
-import sys
-import csv
 import pandas as pd
 import numpy  as np
-import matplotlib.pyplot as plt
-import math
-import openpyxl
-from openpyxl.styles import Alignment, Font, Border, Side
-from openpyxl.worksheet.worksheet import Worksheet
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Callable, Dict, List, Sequence
 from abc import ABC, abstractmethod
 from read_excel import *
 from file_utils import *
 from least_squares import *
+from report_writer import EXCEL_MAX_ROWS, ReportBlock, ReportWriter, sheet_rows
+from instrument import span
+from roundness import ZONE_ATTRS, zone_roundness_metrics
 
-@dataclass
-class BaseResult(InputData):
+# 結果ブロック・評価値一覧に出力する評価値（表示名, 属性名）
+# 結果ブロックのセルを位置で読む利用者がいるため、評価値を増やすときは末尾に追加する
+METRIC_COLUMNS = [
+    ("クローズイン", "close_in"), ("滑り量", "sliding_distance"),
+    ("引き込み量", "amount_of_pull_in"), ("簡易真円度", "simple_roundness"),
+    ("内径変化量の最大値", "max_change_dia"), ("内径変化量の最小値", "min_change_dia"),
+    ("真円度", "roundness"), ("最小二乗円 Cx", "lsm_cx"),
+    ("最小二乗円 Cy", "lsm_cy"), ("最小二乗円 半径", "lsm_r"),
+    ("真円度（MZC）", "roundness_mzc"), ("真円度（MCC）", "roundness_mcc"), ("真円度（MIC）", "roundness_mic"),
+]
+
+def memoized_metric(func):
+  """評価値を初回アクセス時に1度だけ計算し、結果の _metrics に保持するプロパティ"""
+  name = func.__name__
+  @wraps(func)
+  def getter(self):
+    if self._metrics is None:
+      self._metrics = {}
+    if name not in self._metrics:
+      self._metrics[name] = func(self)
+    return self._metrics[name]
+  return property(getter)
+
+# 最小二乗円の配列・値（iter_calculation_flow の結果では初回アクセス時にまとめて計算する）
+LSM_PROFILES = ("lsm_change_radius", "lsm_cx", "lsm_cy", "lsm_r")
+
+def lazy_profile(func):
   """
-  InputDataクラスを継承し計算結果を保持するクラス.
+  最小二乗円・FFTの配列を profiles から返すプロパティ。
+  まだ計算されていなければ loader で計算し（同時に計算される配列もまとめて）profiles に保持する。
+  """
+  name = func.__name__
+  @wraps(func)
+  def getter(self):
+    if name not in self.profiles:
+      self.profiles.update(self.loader(self, name))
+    return self.profiles[name]
+  return property(getter)
+
+def lsm_angles(sorted_coords: np.ndarray, cx, cy) -> np.ndarray:
+  """
+  ソート済み座標 (..., 点数, 4) の各点の、最小二乗円の中心 (cx, cy) から見た角度 [rad]。
+  並びは補正半径変化量と同じ cap → rod の順（始点の重複は含まない）。
+  """
+  cx = np.asarray(cx, dtype=float)[..., None]
+  cy = np.asarray(cy, dtype=float)[..., None]
+  cap = np.arctan2(sorted_coords[..., 0] - cy, sorted_coords[..., 1] - cx)
+  rod = np.arctan2(sorted_coords[..., 2] - cy, sorted_coords[..., 3] - cx)
+  return np.concatenate([cap, rod], axis=-1)
+
+def coord_columns(coord: np.ndarray) -> dict:
+  """(点数, 4) の座標配列を 列名 -> 列の配列 の辞書にする（コピーしない）"""
+  return {name: coord[:, k] for k, name in enumerate(COORD_COLUMNS)}
+
+
+@dataclass(slots=True)
+class ReferenceBlock:
+  """
+  ブックごとに1つだけ作り、全ての計算結果で共有する基準データと角度
+  """
+  situation: str
+  sorted_coord: np.ndarray    # 基準のソート済み座標 (点数, 4)
+  rod_dist: float
+  rad_degrees: np.ndarray
+  dia_degrees: np.ndarray
+
+
+@dataclass(slots=True)
+class BaseResult:
+  """
+  計算結果を保持するクラス.
   すべての計算結果に共通する属性と振る舞いを定義する「設計図」．
+  配列はブック単位でまとめて計算した配列のビューで、基準データと角度は ReferenceBlock を共有する。
+  最小二乗円・FFTの配列は profiles に持ち、iter_calculation_flow の結果では初回アクセス時に loader で計算する。
   """
-  std_situation : str
-  std_coord: pd.DataFrame
-  change_radius: List[float]
-  lsm_change_radius: List[float]
-  change_diameter: List[float]
-  rad_degrees: List[float]
-  dia_degrees: List[float]
-  std_rod_dist : float
-  lsm_cx : float
-  lsm_cy : float
-  lsm_r  : float
-  
+  situation: str
+  fft_on_or_off: bool
+  is_standard: bool
+  line_color: str
+  reference: ReferenceBlock
+  sorted_coord: np.ndarray    # ソート済み座標 (点数, 4)
+  change_radius: np.ndarray
+  change_diameter: np.ndarray
+  rod_dist : float
+  profiles: dict = field(default_factory=dict, repr=False, compare=False)
+  loader: Callable[['BaseResult', str], dict] | None = field(default=None, repr=False, compare=False)
+  _metrics: dict | None = field(default=None, init=False, repr=False, compare=False)
+
+  @property
+  def is_error(self) -> bool:
+      """計算結果はエラーのないデータからのみ作られる"""
+      return False
+
+  @property
+  def std_situation(self) -> str:
+      return self.reference.situation
+
+  @property
+  def std_coord(self) -> np.ndarray:
+      return self.reference.sorted_coord
+
+  @property
+  def std_rod_dist(self) -> float:
+      return self.reference.rod_dist
+
+  @property
+  def rad_degrees(self) -> np.ndarray:
+      return self.reference.rad_degrees
+
+  @property
+  def dia_degrees(self) -> np.ndarray:
+      return self.reference.dia_degrees
+
+  @lazy_profile
+  def lsm_change_radius(self) -> np.ndarray:
+      """最小二乗円の中心から見た半径変化量"""
+
+  @lazy_profile
+  def lsm_cx(self) -> float:
+      """最小二乗円の中心x"""
+
+  @lazy_profile
+  def lsm_cy(self) -> float:
+      """最小二乗円の中心y"""
+
+  @lazy_profile
+  def lsm_r(self) -> float:
+      """最小二乗円の半径"""
+
   @property
   @abstractmethod
   def effective_change_diameter(self) -> List[float]:
@@ -46,107 +152,107 @@ class BaseResult(InputData):
       """計算に用いる補正半径変化量データを返す（生 or FFT）"""
       pass
   
-  @property
+  @memoized_metric
   def roundness(self) -> float:
-      """真円度を計算して返す"""   
-      return max(self.effective_lsm_change_radius) - min(self.effective_lsm_change_radius)
+      """真円度を計算して返す"""
+      return float(np.max(self.effective_lsm_change_radius) - np.min(self.effective_lsm_change_radius))
 
-  @property
+  def set_metrics(self, values: Dict[str, float]) -> None:
+      """まとめて求めた評価値（属性名 -> 値）を保持し、以後のプロパティ参照では再計算しない"""
+      if self._metrics is None:
+        self._metrics = {}
+      self._metrics.update({attr: float(value) for attr, value in values.items()})
+
+  def memoized_zone_roundness(self) -> Dict[str, float] | None:
+      """MZC・MCC・MIC の真円度が保持済みなら 属性名 -> 値 の辞書を、未計算なら None を返す"""
+      if self._metrics is None or any(attr not in self._metrics for attr in ZONE_ATTRS):
+        return None
+      return {attr: self._metrics[attr] for attr in ZONE_ATTRS}
+
+  def _zone_roundness(self, name: str) -> float:
+      """MZC・MCC・MIC の真円度を3つまとめて計算して保持し、name の値を返す"""
+      n_points = len(self.sorted_coord)
+      theta = lsm_angles(self.sorted_coord, self.lsm_cx, self.lsm_cy)
+      self.set_metrics(zone_roundness_metrics(theta, np.asarray(self.effective_lsm_change_radius)[:2*n_points]))
+      return self._metrics[name]
+
+  @memoized_metric
+  def roundness_mzc(self) -> float:
+      """最小領域法（MZC）による真円度を計算して返す"""
+      return self._zone_roundness("roundness_mzc")
+
+  @memoized_metric
+  def roundness_mcc(self) -> float:
+      """最小外接円法（MCC）による真円度を計算して返す"""
+      return self._zone_roundness("roundness_mcc")
+
+  @memoized_metric
+  def roundness_mic(self) -> float:
+      """最大内接円法（MIC）による真円度を計算して返す"""
+      return self._zone_roundness("roundness_mic")
+
+  @memoized_metric
   def simple_roundness(self) -> float:
       """簡易真円度を計算して返す"""
-      return (max(self.effective_change_diameter) - min(self.effective_change_diameter)) / 2
+      return (self.max_change_dia - self.min_change_dia) / 2
 
-  @property
+  @memoized_metric
   def sliding_distance(self) -> float:
-      """滑り量を計算して返す"""   
-      non_std_rod_dist = np.sqrt((self.sorted_coord["rod_x"].iloc[0] - self.sorted_coord["rod_x"].iloc[-1])**2
-                    + (self.sorted_coord["rod_y"].iloc[0] - self.sorted_coord["rod_y"].iloc[-1])**2)
-      sliding_distance = (self.std_rod_dist - non_std_rod_dist) * 10**3
-      return sliding_distance
-  
-  @property
+      """滑り量を計算して返す"""
+      sliding_distance = (self.std_rod_dist - self.rod_dist) * 10**3
+      return float(sliding_distance)
+
+  @memoized_metric
   def amount_of_pull_in(self) -> float:
       """引き込み量を計算して返す"""
-      return -min(self.effective_change_diameter)
+      return -self.min_change_dia
 
-  @property
+  @memoized_metric
   def close_in(self) -> float:
       """クローズインを計算して返す"""
       return max(self.amount_of_pull_in, self.sliding_distance)
 
-  @property
+  @memoized_metric
   def max_change_dia(self) -> float:
       """内径変化量の最大値を返す"""
-      return max(self.effective_change_diameter)
+      return float(np.max(self.effective_change_diameter))
 
-  @property
+  @memoized_metric
   def min_change_dia(self) -> float:
       """内径変化量の最小値を返す"""
-      return min(self.effective_change_diameter)
-  
-  def _merge_header(self, worksheet: Worksheet, text: str, start_col: int, end_col: int):
-      """Excelシートのヘッダーを結合・装飾するプライベートメソッド"""
-      thin_border_side = Side(style='thin', color='000000')
-      box_border = Border(top=thin_border_side, left=thin_border_side, right=thin_border_side, bottom=thin_border_side)
-      for col in range(start_col, end_col + 1):
-          cell = worksheet.cell(row=1, column=col)
-          cell.border = box_border
-      header_cell = worksheet.cell(row=1, column=start_col)
-      header_cell.value = text
-      header_cell.alignment = Alignment(horizontal='center', vertical='center')
-      header_cell.font = Font(bold=True)
-      worksheet.merge_cells(start_row=1, start_column=start_col, end_row=1, end_column=end_col)
+      return float(np.min(self.effective_change_diameter))
+
+  def metrics(self) -> Dict[str, float]:
+      """全評価値を 表示名 -> 値 の辞書で返す"""
+      return {label: float(getattr(self, attr)) for label, attr in METRIC_COLUMNS}
 
   @abstractmethod
-  def write_to_output_excel_sheet(self, writer: pd.ExcelWriter):
+  def write_to_output_excel_sheet(self, writer: ReportWriter):
     """自分自身をExcelブックに1シートとして書き出す"""
-    sheet_name = self.situation[:30]
-    worksheet: Worksheet = writer.book.create_sheet(title=sheet_name)
-    writer.sheets[sheet_name] = worksheet
-    current_col = 1
-
-    # 座標データブロック (共通)
-    self.std_coord.to_excel(writer, sheet_name=sheet_name, index=False, startrow=1, startcol=current_col-1)
-    std_coord_col_start = current_col
-    current_col += self.std_coord.shape[1]
-
-    self.sorted_coord.to_excel(writer, sheet_name=sheet_name, index=False, startrow=1, startcol=current_col-1)
-    coord_col_start = current_col
-    current_col += self.sorted_coord.shape[1] + 1
-  
-    # 内径変化量ブロック (子クラスでDataFrameを生成)
-    dia_df = self._create_dia_df()
-    dia_col_start = current_col
-    dia_df.to_excel(writer, sheet_name=sheet_name, index=False, startrow=1, startcol=current_col-1)
-    current_col += dia_df.shape[1] + 1
-
-    # 半径変化量ブロック (子クラスでDataFrameを生成)
-    rad_df = self._create_rad_df()
-    rad_col_start = current_col
-    rad_df.to_excel(writer, sheet_name=sheet_name, index=False, startrow=1, startcol=current_col-1)
-    current_col += rad_df.shape[1] + 1
-
-    # 結果ブロック (共通)
-    results_data = [
-        ("クローズイン", self.close_in), ("滑り量", self.sliding_distance),
-        ("引き込み量", self.amount_of_pull_in), ("簡易真円度", self.simple_roundness),
-        ("内径変化量の最大値", self.max_change_dia), ("内径変化量の最小値", self.min_change_dia),
-        ("真円度", self.roundness), ("最小二乗円 Cx", self.lsm_cx),
-        ("最小二乗円 Cy", self.lsm_cy), ("最小二乗円 半径", self.lsm_r)
-    ]
-    results_df = pd.DataFrame(results_data, columns=["result", "value"])
-    results_col_start = current_col
-    results_df.to_excel(writer, sheet_name=sheet_name, index=False, header=False, startrow=1, startcol=current_col-1)
-    
-    # ヘッダー結合 (共通)
-    self._merge_header(worksheet, self.std_situation, std_coord_col_start, std_coord_col_start + 3)
-    self._merge_header(worksheet, self.situation, coord_col_start, coord_col_start + 3)
-    self._merge_header(worksheet, "内径変化量", dia_col_start, dia_col_start + dia_df.shape[1] - 1)
-    self._merge_header(worksheet, "半径変化量", rad_col_start, rad_col_start + rad_df.shape[1] - 1)
-    self._merge_header(worksheet, "結果", results_col_start, results_col_start + results_df.shape[1] - 1)
+    with span("write_to_output_excel_sheet", situation=self.situation):
+      title = self.situation[:30]
+      results_data = list(self.metrics().items())
+      profile_blocks = [
+          # 座標データブロック (共通)
+          ReportBlock(self.std_situation, coord_columns(self.std_coord)),
+          ReportBlock(self.situation, coord_columns(self.sorted_coord)),
+          # 内径変化量・半径変化量ブロック (子クラスで列を生成)
+          ReportBlock("内径変化量", self._create_dia_columns(), gap=1),
+          ReportBlock("半径変化量", self._create_rad_columns(), gap=1),
+      ]
+      if sheet_rows(profile_blocks) > EXCEL_MAX_ROWS:
+        # 点数が多くシートに収まらない場合は、座標・変化量の列を別ファイルに保存し、シートには結果だけを書く
+        array_file = writer.write_arrays(title, profile_blocks)
+        results_data.append(("座標・変化量の保存先", array_file.name))
+        profile_blocks = []
+      # 結果ブロック (共通)
+      result_block = ReportBlock("結果", {"result": [name for name, _ in results_data],
+                                          "value": [value for _, value in results_data]},
+                                 has_header=False, gap=1 if profile_blocks else 0)
+      writer.write_sheet(title, [*profile_blocks, result_block])
     
 
-@dataclass
+@dataclass(slots=True)
 class NonFFTResult(BaseResult):
   """FFTがOFFの場合の結果クラス"""
   @property
@@ -157,26 +263,34 @@ class NonFFTResult(BaseResult):
   def effective_lsm_change_radius(self) -> List[float]:
     return self.lsm_change_radius
   
-  def _create_dia_df(self) -> pd.DataFrame:
-    return pd.DataFrame({
+  def _create_dia_columns(self) -> dict:
+    return {
         "角度[°]" : self.dia_degrees,
         "内径変化量[㎛]": self.change_diameter
-    })
+    }
 
-  def _create_rad_df(self) -> pd.DataFrame:
-    return pd.DataFrame({
+  def _create_rad_columns(self) -> dict:
+    return {
         "角度[°]": self.rad_degrees,
         "半径変化量[㎛]": self.change_radius,
         "半径変化量（補正）[㎛]": self.lsm_change_radius
-    })
+    }
 
 
-@dataclass
+@dataclass(slots=True)
 class FFTResult(BaseResult):
   """FFTがONの場合の結果クラス"""
-  fft_change_radius: List[float]
-  fft_lsm_change_radius: List[float]
-  fft_change_diameter: List[float]
+  @lazy_profile
+  def fft_change_radius(self) -> np.ndarray:
+      """FFTで平滑化した半径変化量"""
+
+  @lazy_profile
+  def fft_lsm_change_radius(self) -> np.ndarray:
+      """FFTで平滑化した補正半径変化量"""
+
+  @lazy_profile
+  def fft_change_diameter(self) -> np.ndarray:
+      """FFTで平滑化した内径変化量"""
 
   @property
   def effective_change_diameter(self) -> List[float]:
@@ -186,18 +300,95 @@ class FFTResult(BaseResult):
   def effective_lsm_change_radius(self) -> List[float]:
     return self.fft_lsm_change_radius
   
-  def _create_dia_df(self) -> pd.DataFrame:
-    return pd.DataFrame({
+  def _create_dia_columns(self) -> dict:
+    return {
         "角度[°]" : self.dia_degrees,
         "内径変化量[㎛]": self.change_diameter,
         "FFT内径変化量[㎛]": self.fft_change_diameter
-    })
+    }
 
-  def _create_rad_df(self) -> pd.DataFrame:
-    return pd.DataFrame({
+  def _create_rad_columns(self) -> dict:
+    return {
         "角度[°]": self.rad_degrees,
         "半径変化量[㎛]": self.change_radius,
         "FFT半径変化量[㎛]": self.fft_change_radius,
         "半径変化量（補正）[㎛]": self.lsm_change_radius,
         "FFT半径変化量（補正）[㎛]": self.fft_lsm_change_radius
-    })
+    }
+
+
+def metrics_table(results: Sequence[BaseResult]) -> pd.DataFrame:
+  """
+  全結果の評価値を1つの表（1行1状況）で返す。
+  同じ点数の結果ごとに配列を積み上げ、NumPyの一括集計で求める。
+  求めた値は各結果の _metrics にも保持し、以後のプロパティ参照では再計算しない。
+  """
+  columns = ["状況", "基準", "FFT", *[label for label, _ in METRIC_COLUMNS]]
+  if not results:
+    return pd.DataFrame(columns=columns)
+  values = {attr: np.empty(len(results)) for _, attr in METRIC_COLUMNS}
+
+  groups: Dict[tuple, List[int]] = {}
+  for i, res in enumerate(results):
+    key = (np.shape(res.effective_change_diameter), np.shape(res.effective_lsm_change_radius))
+    groups.setdefault(key, []).append(i)
+  for indices in groups.values():
+    dia = np.stack([results[i].effective_change_diameter for i in indices])
+    lsm = np.stack([results[i].effective_lsm_change_radius for i in indices])
+    std_rod_dist = np.array([results[i].std_rod_dist for i in indices], dtype=float)
+    rod_dist = np.array([results[i].rod_dist for i in indices], dtype=float)
+    max_dia = dia.max(axis=-1)
+    min_dia = dia.min(axis=-1)
+    sliding = (std_rod_dist - rod_dist) * 10**3
+    values["max_change_dia"][indices] = max_dia
+    values["min_change_dia"][indices] = min_dia
+    values["simple_roundness"][indices] = (max_dia - min_dia) / 2
+    values["amount_of_pull_in"][indices] = -min_dia
+    values["sliding_distance"][indices] = sliding
+    values["close_in"][indices] = np.maximum(-min_dia, sliding)
+    values["roundness"][indices] = lsm.max(axis=-1) - lsm.min(axis=-1)
+    # MZC・MCC・MIC は最小二乗円の中心から見た角度と補正半径変化量（始点の重複を除く）から求める
+    # （multi_reference_flow などで既に求めてある結果は計算し直さない）
+    memoized = [results[i].memoized_zone_roundness() for i in indices]
+    pending = [j for j, zone in enumerate(memoized) if zone is None]
+    for i, zone in zip(indices, memoized):
+      for attr, value in (zone or {}).items():
+        values[attr][i] = value
+    if pending:
+      pending_indices = [indices[j] for j in pending]
+      coords = np.stack([results[i].sorted_coord for i in pending_indices])
+      theta = lsm_angles(coords, [results[i].lsm_cx for i in pending_indices],
+                         [results[i].lsm_cy for i in pending_indices])
+      for attr, zone in zone_roundness_metrics(theta, lsm[pending, :theta.shape[-1]]).items():
+        values[attr][pending_indices] = zone
+  for attr in ("lsm_cx", "lsm_cy", "lsm_r"):
+    values[attr][:] = [getattr(res, attr) for res in results]
+
+  memo_attrs = [attr for _, attr in METRIC_COLUMNS if attr not in ("lsm_cx", "lsm_cy", "lsm_r")]
+  for i, res in enumerate(results):
+    res.set_metrics({attr: values[attr][i] for attr in memo_attrs})
+
+  table = pd.DataFrame({
+      "状況": [res.situation for res in results],
+      "基準": [res.is_standard for res in results],
+      "FFT": [isinstance(res, FFTResult) for res in results],
+      **{label: values[attr] for label, attr in METRIC_COLUMNS},
+  }, columns=columns)
+  return table
+
+def batch_metrics_table(results_by_file: Dict[str, Sequence[BaseResult]]) -> pd.DataFrame:
+  """複数ブックの評価値を、先頭に「ファイル」列を付けた1つの表にまとめて返す"""
+  tables = [metrics_table(results).assign(ファイル=file_path) for file_path, results in results_by_file.items()]
+  if not tables:
+    return pd.DataFrame(columns=["ファイル", "状況", "基準", "FFT", *[label for label, _ in METRIC_COLUMNS]])
+  table = pd.concat(tables, ignore_index=True)
+  return table[["ファイル", *[col for col in table.columns if col != "ファイル"]]]
+
+def comparison_table(results: Sequence[BaseResult]) -> pd.DataFrame:
+  """
+  multi_reference_flow の結果の評価値を1つの表（1行が 基準 × 状況 の1組）で返す。
+  「基準」列は is_standard の代わりに基準の状況名にする。
+  """
+  table = metrics_table(results).drop(columns="基準")
+  table.insert(0, "基準", [res.std_situation for res in results])
+  return table
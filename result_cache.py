@@ -0,0 +1,206 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+from constants import COORD_SHEET, SETTING_SHEET
+from version import __version__
+
+"""
+入力内容のハッシュをキーにした計算結果キャッシュ
+
+「座標入力」「設定」シート（と共有文字列）の中身・ツールのバージョン・入力ファイルのパスから
+キーを作り、前回と同じ内容のファイルは計算・グラフ描画・レポート出力をすべて省略する。
+キャッシュにはレポートとグラフのコピーを保存し、出力先から消えていれば復元する。
+"""
+
+DEFAULT_CACHE_DIR = Path(os.environ.get("CHANGE_CALC_CACHE_DIR",
+                                        Path.home() / ".cache" / "change_calculator"))
+DEFAULT_MAX_BYTES = 1 << 30   # 1 GiB
+META_FILE = "meta.json"
+_HASH_CHUNK = 1 << 20
+
+
+def _update_from_stream(digest, src):
+    while True:
+        block = src.read(_HASH_CHUNK)
+        if not block:
+            break
+        digest.update(block)
+
+
+def content_key(file_path: str, options: Dict[str, object] | None = None) -> str:
+    """
+    入力ブックの「座標入力」「設定」シートのXML・共有文字列、ツールのバージョン、
+    出力に影響するオプション、入力ファイルの絶対パスからキャッシュキー（SHA-256）を求める。
+    出力のファイル名・グラフのタイトルは入力ファイル名から決まるため、
+    中身が同じでも別のファイルは別のキーにする。
+    """
+    from fast_reader import XlsxArchive, UnsupportedWorkbookError
+    digest = hashlib.sha256()
+    digest.update(f"change_calculator {__version__}\n".encode())
+    digest.update(f"{Path(file_path).resolve()}\n".encode())
+    digest.update(json.dumps(options or {}, sort_keys=True, default=str).encode())
+    try:
+        with XlsxArchive(file_path) as archive:
+            parts = archive.sheet_parts
+            names = [parts[COORD_SHEET], parts[SETTING_SHEET], "xl/sharedStrings.xml"]
+            for name in names:
+                digest.update(f"\n--{name}--\n".encode())
+                if archive.has_part(name):
+                    with archive.open_part(name) as src:
+                        _update_from_stream(digest, src)
+    except (UnsupportedWorkbookError, KeyError, zipfile.BadZipFile):
+        # シート単位で読めないファイルはファイル全体をハッシュする
+        digest.update(b"\n--file--\n")
+        with open(file_path, "rb") as src:
+            _update_from_stream(digest, src)
+    return digest.hexdigest()
+
+
+@dataclass
+class ResultCache:
+    """
+    計算結果（レポートとグラフ）をディスク上に保存するキャッシュ。
+    合計サイズが max_bytes を超えると、最後に使われた時刻が古いものから削除する。
+    プロセスプールのワーカーに渡せるよう、状態はディレクトリのみで持つ。
+    """
+    cache_dir: Path = DEFAULT_CACHE_DIR
+    max_bytes: int = DEFAULT_MAX_BYTES
+
+    def __post_init__(self):
+        self.cache_dir = Path(self.cache_dir)
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def _entries(self) -> List[Path]:
+        if not self.cache_dir.is_dir():
+            return []
+        return [entry for entry in self.cache_dir.glob("*/*") if (entry / META_FILE).is_file()]
+
+    def restore(self, key: str, report_path: Path) -> bool:
+        """
+        キャッシュがあれば出力を復元してTrueを返す。
+        出力先に同じサイズのファイルが既にあればコピーも省略する。
+        """
+        entry = self._entry_dir(key)
+        try:
+            meta = json.loads((entry / META_FILE).read_text(encoding="utf-8"))
+            report_path = Path(report_path)
+            for item in meta["outputs"]:
+                src = entry / item["name"]
+                dst = report_path.parent / item["relative_path"]
+                if not dst.is_file() or dst.stat().st_size != item["size"]:
+                    dst.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copy2(src, dst)
+            meta["last_used"] = time.time()
+            (entry / META_FILE).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        except (OSError, ValueError, KeyError):
+            return False
+        return True
+
+    def store(self, key: str, source: str, report_path: Path, outputs: Sequence[Path]):
+        """出力ファイル群をキャッシュに保存し、必要なら古いエントリを削除する"""
+        report_path = Path(report_path)
+        entry = self._entry_dir(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(prefix=".tmp_", dir=entry.parent))
+        try:
+            items = []
+            for i, output in enumerate(outputs):
+                output = Path(output)
+                name = f"{i:03d}{output.suffix}"
+                shutil.copy2(output, tmp_dir / name)
+                items.append({
+                    "name": name,
+                    "relative_path": os.path.relpath(output, report_path.parent),
+                    "size": output.stat().st_size,
+                })
+            meta = {"source": str(source), "version": __version__, "outputs": items,
+                    "created": time.time(), "last_used": time.time()}
+            (tmp_dir / META_FILE).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+            if entry.exists():
+                shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp_dir, entry)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self.evict()
+
+    def _entry_info(self, entry: Path) -> tuple:
+        try:
+            meta = json.loads((entry / META_FILE).read_text(encoding="utf-8"))
+            last_used = meta.get("last_used", 0.0)
+        except (OSError, ValueError):
+            last_used = 0.0
+        size = sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+        return last_used, size
+
+    def total_size(self) -> int:
+        return sum(self._entry_info(entry)[1] for entry in self._entries())
+
+    def evict(self):
+        """合計サイズが上限を超えていれば、最後に使われた時刻が古いものから削除する"""
+        infos = []
+        for entry in self._entries():
+            try:
+                infos.append((*self._entry_info(entry), entry))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in infos)
+        for _, size, entry in sorted(infos, key=lambda info: info[0]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def invalidate(self, file_paths: Sequence[str]) -> int:
+        """指定した入力ファイルから作られたエントリを削除し、削除件数を返す"""
+        targets = {str(Path(p).resolve()) for p in file_paths}
+        removed = 0
+        for entry in self._entries():
+            try:
+                meta = json.loads((entry / META_FILE).read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            if str(Path(meta.get("source", "")).resolve()) in targets:
+                shutil.rmtree(entry, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def clear(self) -> int:
+        """キャッシュをすべて削除し、削除件数を返す"""
+        entries = self._entries()
+        for entry in entries:
+            shutil.rmtree(entry, ignore_errors=True)
+        return len(entries)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="計算結果キャッシュの管理")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("info", help="エントリ数と合計サイズを表示する")
+    sub.add_parser("clear", help="キャッシュをすべて削除する")
+    invalidate = sub.add_parser("invalidate", help="指定した入力ファイルのキャッシュを削除する")
+    invalidate.add_argument("files", nargs="+")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    cache = ResultCache(cache_dir=Path(args.cache_dir))
+    if args.command == "info":
+        print(f"{cache.cache_dir}: {len(cache._entries())} 件, {cache.total_size() / 2**20:.1f} MiB")
+    elif args.command == "clear":
+        print(f"{cache.clear()} 件のキャッシュを削除しました。")
+    elif args.command == "invalidate":
+        print(f"{cache.invalidate(args.files)} 件のキャッシュを削除しました。")
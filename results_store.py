@@ -0,0 +1,259 @@
+import argparse
+import os
+import sqlite3
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Sequence
+
+from version import __version__
+
+"""
+計算結果のSQLite保存モジュール
+
+実行ごとのメタデータ（runs）、状況ごとの評価値（metrics、結果ブロックと同じ値）、
+必要なら変化量のプロファイル（profiles、float64のバイト列）を1つのデータベースに蓄積し、
+ファイル・状況・日付をまたいだ検索をできるようにする。
+1回の実行分は1トランザクションでまとめて書き込む。
+"""
+
+METRIC_FIELDS = ["close_in", "sliding_distance", "amount_of_pull_in", "simple_roundness",
+                 "max_change_dia", "min_change_dia", "roundness", "lsm_cx", "lsm_cy", "lsm_r",
+                 "roundness_mzc", "roundness_mcc", "roundness_mic"]
+PROFILE_KINDS = ["change_radius", "lsm_change_radius", "change_diameter",
+                 "fft_change_radius", "fft_lsm_change_radius", "fft_change_diameter"]
+ANGLE_KINDS = ["rad_degrees", "dia_degrees"]
+ANGLE_POSITION = -1                 # 角度（全状況で共通）のプロファイルを保存する position
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    run_id        INTEGER PRIMARY KEY,
+    file_path     TEXT NOT NULL,
+    file_name     TEXT NOT NULL,
+    measured_at   TEXT NOT NULL,    -- 入力ブックの更新日時
+    run_at        TEXT NOT NULL,    -- 計算した日時
+    version       TEXT NOT NULL,
+    std_situation TEXT,
+    threshold_dia REAL,
+    threshold_rad REAL,
+    threshold_lsm REAL,
+    rotation      REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_file_name ON runs(file_name);
+CREATE INDEX IF NOT EXISTS idx_runs_file_path ON runs(file_path);
+CREATE INDEX IF NOT EXISTS idx_runs_measured_at ON runs(measured_at);
+CREATE INDEX IF NOT EXISTS idx_runs_run_at ON runs(run_at);
+
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id      INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    position    INTEGER NOT NULL,   -- 座標入力シートでの順番（0始まり）
+    situation   TEXT NOT NULL,
+    is_standard INTEGER NOT NULL,
+    fft         INTEGER NOT NULL,
+    {", ".join(f"{name} REAL" for name in METRIC_FIELDS)},
+    PRIMARY KEY (run_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_metrics_situation ON metrics(situation, run_id);
+
+CREATE TABLE IF NOT EXISTS profiles (
+    run_id   INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    kind     TEXT NOT NULL,
+    data     BLOB NOT NULL,         -- float64（リトルエンディアン）のバイト列
+    PRIMARY KEY (run_id, position, kind)
+);
+"""
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).isoformat(timespec="seconds")
+
+
+def _to_blob(values) -> bytes:
+    import numpy as np
+    return np.ascontiguousarray(values, dtype="<f8").tobytes()
+
+
+@dataclass
+class ResultsStore:
+    """
+    計算結果を蓄積するSQLiteデータベース。
+    プロセスプールのワーカーに渡せるよう、状態はファイルパスのみで持つ（WALモードで複数プロセスから書き込める）。
+    """
+    db_path: Path
+
+    def __post_init__(self):
+        self.db_path = Path(self.db_path)
+
+    def connect(self) -> sqlite3.Connection:
+        """接続を開き、必要ならスキーマを作成する"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=60.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(_SCHEMA)
+        # 評価値を追加する前に作ったデータベースには列を追加する（以前の実行の値はNULL）
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(metrics)")}
+        for name in METRIC_FIELDS:
+            if name not in columns:
+                conn.execute(f"ALTER TABLE metrics ADD COLUMN {name} REAL")
+        return conn
+
+    def add_run(self, file_path: str, results: Iterable, props=None, profiles: bool = False) -> int:
+        """
+        1回の実行（1ブック分）のメタデータ・評価値・（必要なら）プロファイルを
+        1トランザクションでまとめて書き込み、run_id を返す。
+        results は1度だけ順に読むため、iter_calculation_flow のジェネレーターも渡せる
+        （行にしたあとの結果は保持しない）。
+        """
+        file_path = os.path.abspath(file_path)
+        std_situation = None
+        metric_rows = []
+        profile_rows = []
+        for position, res in enumerate(results):
+            if res.is_standard:
+                std_situation = res.situation
+            metric_rows.append((position, res.situation, int(res.is_standard), int(hasattr(res, "fft_change_diameter")),
+                                *(float(getattr(res, name)) for name in METRIC_FIELDS)))
+            if profiles:
+                if position == 0:
+                    for kind in ANGLE_KINDS:
+                        profile_rows.append((ANGLE_POSITION, kind, _to_blob(getattr(res, kind))))
+                for kind in PROFILE_KINDS:
+                    if hasattr(res, kind):
+                        profile_rows.append((position, kind, _to_blob(getattr(res, kind))))
+        run_row = (
+            file_path, os.path.basename(file_path), _iso(os.path.getmtime(file_path)), _iso(time.time()),
+            __version__, std_situation,
+            *(getattr(props, name) if props is not None else None
+              for name in ("threshold_dia", "threshold_rad", "threshold_lsm", "rotation")),
+        )
+
+        with closing(self.connect()) as conn:
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO runs (file_path, file_name, measured_at, run_at, version, std_situation, "
+                    "threshold_dia, threshold_rad, threshold_lsm, rotation) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    run_row)
+                run_id = cursor.lastrowid
+                placeholders = ", ".join("?" * (4 + len(METRIC_FIELDS)))
+                conn.executemany(
+                    f"INSERT INTO metrics (run_id, position, situation, is_standard, fft, {', '.join(METRIC_FIELDS)}) "
+                    f"VALUES (?, {placeholders})",
+                    [(run_id, *row) for row in metric_rows])
+                if profile_rows:
+                    conn.executemany("INSERT INTO profiles (run_id, position, kind, data) VALUES (?, ?, ?, ?)",
+                                     [(run_id, *row) for row in profile_rows])
+        return run_id
+
+    def _query(self, sql: str, params: Sequence):
+        import pandas as pd
+        with closing(self.connect()) as conn:
+            return pd.read_sql_query(sql, conn, params=list(params))
+
+    @staticmethod
+    def _run_filters(file: str | None, since: str | None, until: str | None) -> tuple:
+        clauses, params = [], []
+        if file:
+            clauses.append("r.file_name GLOB ?")
+            params.append(file)
+        if since:
+            clauses.append("r.measured_at >= ?")
+            params.append(since)
+        if until:
+            clauses.append("r.measured_at < ?")
+            params.append(until)
+        return clauses, params
+
+    def runs(self, file: str | None = None, since: str | None = None, until: str | None = None):
+        """実行の一覧を DataFrame で返す（file はファイル名のGLOBパターン、日付は更新日時）"""
+        clauses, params = self._run_filters(file, since, until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(f"SELECT r.* FROM runs r {where} ORDER BY r.measured_at, r.run_id", params)
+
+    def metrics(self, situation: str | None = None, file: str | None = None,
+                since: str | None = None, until: str | None = None,
+                fields: Sequence[str] | None = None, latest: bool = False):
+        """
+        状況ごとの評価値を DataFrame で返す。
+        situation・file はGLOBパターン（例: "運転時*"）。latest=True の場合は同じファイルの最新の実行だけを返す。
+        """
+        fields = list(fields) if fields else METRIC_FIELDS
+        unknown = [name for name in fields if name not in METRIC_FIELDS]
+        if unknown:
+            raise ValueError(f"評価値の名前が正しくありません: {unknown}（{METRIC_FIELDS}）")
+        clauses, params = self._run_filters(file, since, until)
+        if situation:
+            clauses.append("m.situation GLOB ?")
+            params.append(situation)
+        if latest:
+            clauses.append("r.run_id = (SELECT MAX(run_id) FROM runs WHERE file_path = r.file_path)")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        columns = ", ".join(f"m.{name}" for name in fields)
+        return self._query(
+            f"SELECT r.run_id, r.file_name, r.measured_at, m.situation, m.is_standard, m.fft, {columns} "
+            f"FROM metrics m JOIN runs r ON r.run_id = m.run_id {where} "
+            f"ORDER BY r.measured_at, r.run_id, m.position", params)
+
+    def load_profiles(self, run_id: int, situation: str) -> Dict[str, "np.ndarray"]:
+        """指定した実行・状況のプロファイルと角度を kind -> 配列 の辞書で返す"""
+        import numpy as np
+        with closing(self.connect()) as conn:
+            rows = conn.execute(
+                "SELECT p.kind, p.data FROM profiles p "
+                "LEFT JOIN metrics m ON m.run_id = p.run_id AND m.position = p.position "
+                "WHERE p.run_id = ? AND (m.situation = ? OR p.position = ?)",
+                (run_id, situation, ANGLE_POSITION)).fetchall()
+        return {kind: np.frombuffer(data, dtype="<f8") for kind, data in rows}
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="計算結果データベースの検索")
+    parser.add_argument("db", help="データベースファイル")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_filters(p):
+        p.add_argument("--file", help="ファイル名のパターン（例: '*_2025*.xlsx'）")
+        p.add_argument("--since", help="この日時以降に更新された入力のみ（例: 2025-01-01）")
+        p.add_argument("--until", help="この日時より前に更新された入力のみ")
+        p.add_argument("--csv", help="結果をCSVに保存する")
+
+    add_filters(sub.add_parser("runs", help="実行の一覧"))
+    metrics = sub.add_parser("metrics", help="状況ごとの評価値")
+    add_filters(metrics)
+    metrics.add_argument("--situation", help="状況名のパターン（例: '運転時*'）")
+    metrics.add_argument("--fields", nargs="+", choices=METRIC_FIELDS, help="表示する評価値")
+    metrics.add_argument("--latest", action="store_true", help="ファイルごとに最新の実行のみ")
+    profile = sub.add_parser("profile", help="変化量のプロファイル")
+    profile.add_argument("run_id", type=int)
+    profile.add_argument("situation")
+    profile.add_argument("--csv", help="結果をCSVに保存する")
+    return parser.parse_args(argv)
+
+
+def _output(table, csv_path: str | None):
+    if csv_path:
+        table.to_csv(csv_path, index=False, encoding="utf-8-sig")
+        print(f"{len(table)} 行を保存しました: {csv_path}")
+    else:
+        print(table.to_string(index=False))
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    store = ResultsStore(args.db)
+    if args.command == "runs":
+        _output(store.runs(args.file, args.since, args.until), args.csv)
+    elif args.command == "metrics":
+        _output(store.metrics(args.situation, args.file, args.since, args.until,
+                              fields=args.fields, latest=args.latest), args.csv)
+    elif args.command == "profile":
+        import pandas as pd
+        profiles = store.load_profiles(args.run_id, args.situation)
+        if not profiles:
+            print("プロファイルが保存されていません（--store-profiles を指定して計算してください）。")
+        else:
+            _output(pd.DataFrame({kind: pd.Series(values) for kind, values in profiles.items()}), args.csv)
@@ -0,0 +1,152 @@
+import warnings
+from typing import Dict, NamedTuple
+
+import numpy as np
+
+"""
+最小領域法（MZC）・最小外接円法（MCC）・最大内接円法（MIC）による真円度の計算モジュール
+
+最小二乗円の中心から見た各点の角度 θ と半径方向の偏差 ρ（変化量と同じ μm）から、
+中心を (a, b) だけ動かしたときの偏差を ρ - a·cosθ - b·sinθ で近似する（リマソン近似）。
+偏心が半径に比べて十分小さいので、この近似による誤差は (偏心)² / 半径 程度で無視できる。
+この近似のもとで3つの方法はいずれも変数が2〜3個の線形計画問題になる。
+
+    MZC: ρ - c - a·cosθ - b·sinθ の最大の絶対値を最小にする（幅 = 2 × 最小値）
+    MCC: ρ - a·cosθ - b·sinθ の最大値を最小にする
+    MIC: ρ - a·cosθ - b·sinθ の最小値を最大にする
+
+これらを min_y max_j (d_j + w_j·y) の形にまとめ、双対単体法（k+1個の制約の基底を交換する、
+Remezの交換法と同じ考え方）で解く。1回の交換は全点の偏差を1度計算するだけで、
+交換回数は点数によらず数回〜数十回なので、計算量は O(点数 × 交換回数) になる。
+全状況を (状況数, 点数) の配列のまま同時に交換する。
+真円度は、求めた中心から見た偏差の最大値 - 最小値として返す。
+"""
+
+MAX_EXCHANGES = 200             # 交換回数の上限（通常は数十回以内で収束する）
+TOLERANCE = 1e-10               # 収束判定の許容誤差（偏差の大きさに対する比）
+ZONE_ATTRS = ("roundness_mzc", "roundness_mcc", "roundness_mic")   # 評価値の属性名（MZC・MCC・MIC の順）
+
+
+class ZoneResult(NamedTuple):
+    """3つの方法による真円度と、その中心の最小二乗円の中心からのずれ（先頭の軸が状況）"""
+    mzc: np.ndarray
+    mcc: np.ndarray
+    mic: np.ndarray
+    mzc_center: np.ndarray      # (状況数, 2)  (a, b)
+    mcc_center: np.ndarray
+    mic_center: np.ndarray
+
+
+def _nearest_angles(theta: np.ndarray, targets) -> np.ndarray:
+    """各状況で targets [rad] の方向に最も近い点のインデックス (状況数, 目標数)"""
+    return np.stack([np.abs(np.remainder(theta - target + np.pi, 2 * np.pi) - np.pi).argmin(axis=1)
+                     for target in targets], axis=1)
+
+
+def solve_minimax(d: np.ndarray, w: np.ndarray, basis: np.ndarray, symmetric: bool = False,
+                  tolerance: float = TOLERANCE) -> tuple:
+    """
+    min_y max_j (d_j + w_j·y) を全状況まとめて解き、(y, 最小値) を返す。
+    d: (状況数, 点数)、w: (状況数, k, 点数)（変数ごとに連続した配列にして全点の評価を速くする）、
+    basis: (状況数, k+1) 初期の基底（制約のインデックス）。
+    symmetric=True の場合は制約 -(d_j + w_j·y) も加える（インデックスは 点数 + j、MZCの下側）。
+    初期の基底は双対実行可能（基底の w の凸包が原点を含む）である必要がある。
+    MAX_EXCHANGES 回で収束しない状況があれば RuntimeWarning を出し、最後の基底の解を返す。
+    """
+    n_rows, k, n_points = w.shape
+    rows = np.arange(n_rows)
+    basis = basis.copy()
+    scale = np.maximum(np.abs(d).max(axis=1), 1.0)
+    ones = np.ones((n_rows, 1, k + 1))
+
+    def constraints(indices: np.ndarray) -> tuple:
+        """インデックス (状況数, 個数) の制約の (d, w (状況数, k, 個数))"""
+        sign = np.where(indices >= n_points, -1.0, 1.0)
+        indices = indices % n_points
+        return (sign * np.take_along_axis(d, indices, axis=1),
+                sign[:, None, :] * np.take_along_axis(w, indices[:, None, :], axis=2))
+
+    for _ in range(MAX_EXCHANGES):
+        d_basis, w_basis = constraints(basis)
+        # 基底の制約がすべて等号 d + w·y = t となる (y, t)
+        lhs = np.concatenate([w_basis.transpose(0, 2, 1), -ones.transpose(0, 2, 1)], axis=2)
+        solution = np.linalg.solve(lhs, -d_basis[..., None])[..., 0]
+        y, t = solution[:, :k], solution[:, k]
+        values = d.copy()
+        for i in range(k):
+            values += w[:, i, :] * y[:, i, None]
+        entering = values.argmax(axis=1)
+        largest = values[rows, entering]
+        if symmetric:
+            lowest = values.argmin(axis=1)
+            use_lower = -values[rows, lowest] > largest
+            entering = np.where(use_lower, lowest + n_points, entering)
+            largest = np.where(use_lower, -values[rows, lowest], largest)
+        improving = largest - t > tolerance * scale
+        if not improving.any():
+            break
+        # 双対変数 λ（Σλ w = 0, Σλ = 1）と、入る制約を基底で表した係数 δ の比で出る制約を決める
+        _, w_entering = constraints(entering[:, None])
+        dual_lhs = np.concatenate([w_basis, ones], axis=1)
+        rhs = np.zeros((n_rows, k + 1, 2))
+        rhs[:, k, 0] = 1.0
+        rhs[:, :k, 1] = w_entering[..., 0]
+        rhs[:, k, 1] = 1.0
+        dual = np.linalg.solve(dual_lhs, rhs)
+        lam, delta = dual[..., 0], dual[..., 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(delta > 1e-12, lam / delta, np.inf)
+        leaving = ratio.argmin(axis=1)
+        basis[rows[improving], leaving[improving]] = entering[improving]
+    else:
+        warnings.warn(f"交換法が {MAX_EXCHANGES} 回で収束しませんでした（{int(improving.sum())} 件の状況）。"
+                      "真円度は最適値より大きい可能性があります。", RuntimeWarning, stacklevel=2)
+    return y, t
+
+
+def zone_roundness(theta: np.ndarray, rho: np.ndarray) -> ZoneResult:
+    """
+    角度 theta [rad] と半径方向の偏差 rho（(状況数, 点数) または (点数,)）から
+    MZC・MCC・MIC の真円度を求める（点は全周にわたっている必要がある）
+    """
+    theta = np.asarray(theta, dtype=float)
+    rho = np.asarray(rho, dtype=float)
+    single = rho.ndim == 1
+    if single:
+        theta, rho = theta[None], rho[None]
+    unit = np.stack([np.cos(theta), np.sin(theta)], axis=1)   # (状況数, 2, 点数)
+    n_points = rho.shape[1]
+
+    # MCC: max(ρ - u·x) を最小化、MIC: max(-ρ + u·x) を最小化（120°おきの3点から始める）
+    start = _nearest_angles(theta, [0.0, 2 * np.pi / 3, 4 * np.pi / 3])
+    mcc_center, _ = solve_minimax(rho, -unit, start)
+    mic_center, _ = solve_minimax(-rho, unit, start)
+
+    # MZC: y = (c, a, b) として ±(ρ - c - u·x) の最大値を最小化（90°おきに上側・下側を交互に置いて始める）
+    upper = np.concatenate([-np.ones_like(rho)[:, None, :], -unit], axis=1)
+    quarter = _nearest_angles(theta, [0.0, np.pi / 2, np.pi, 3 * np.pi / 2])
+    start = quarter + np.array([0, n_points, 0, n_points])
+    zone, _ = solve_minimax(rho, upper, start, symmetric=True)
+    mzc_center = zone[:, 1:]
+
+    def peak_to_valley(center: np.ndarray) -> np.ndarray:
+        deviation = rho - unit[:, 0, :] * center[:, 0, None] - unit[:, 1, :] * center[:, 1, None]
+        return deviation.max(axis=1) - deviation.min(axis=1)
+
+    result = ZoneResult(
+        mzc=peak_to_valley(mzc_center),
+        mcc=peak_to_valley(mcc_center),
+        mic=peak_to_valley(mic_center),
+        mzc_center=mzc_center,
+        mcc_center=mcc_center,
+        mic_center=mic_center,
+    )
+    if single:
+        return ZoneResult(*(values[0] for values in result))
+    return result
+
+
+def zone_roundness_metrics(theta: np.ndarray, rho: np.ndarray) -> Dict[str, np.ndarray]:
+    """zone_roundness の真円度を評価値の属性名 -> 値 の辞書で返す"""
+    result = zone_roundness(theta, rho)
+    return dict(zip(ZONE_ATTRS, (result.mzc, result.mcc, result.mic)))
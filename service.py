@@ -0,0 +1,297 @@
+import argparse
+import base64
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import traceback
+import warnings
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict
+from urllib.parse import parse_qs, urlparse
+
+from batch import resolve_workers, warm_up_worker, stop_on_sigterm
+from constants import IMAGE_FORMATS
+from results_store import PROFILE_KINDS
+from version import __version__
+
+"""
+ローカルHTTP計算サービス
+
+他のツールから計算を呼び出せるよう、標準ライブラリの http.server で以下のエンドポイントを提供する。
+
+  GET  /health      稼働状態（ワーカー数・処理待ち件数）
+  POST /workbook    入力ブック（.xlsx）の中身をそのまま送ると評価値を返す
+  POST /calculate   座標配列と設定値をJSONで送ると評価値を返す（Excelを経由しない）
+
+どちらのPOSTも、クエリ（?profiles=1&graphs=1&image_format=png&plot_points=800）または
+JSONの "options" で変化量のプロファイル・グラフ画像（base64）も返すよう指定できる。
+
+計算は起動時に作ったプロセスプールで行う。ワーカーは pandas・NumPy・matplotlib などを
+読み込んだまま常駐するため、リクエストごとの読み込み時間はかからない。
+"""
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BODY = 64 * 2**20           # 受け付ける本文の上限 [byte]
+
+
+class RequestError(ValueError):
+    """リクエストの内容が正しくない（400を返す）"""
+
+
+def _finite_or_none(value: float) -> float | None:
+    """JSONに書けない NaN・inf は null にする"""
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def _as_bool(value) -> bool:
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def _read_workbook_input(body: bytes, tmp_dir: str, name: str) -> tuple:
+    """アップロードされたブックから (InputProperty, InputData のリスト) を作る"""
+    from read_excel import WorkbookSession, InputData, InputProperty
+    from fast_reader import UnsupportedWorkbookError
+    path = os.path.join(tmp_dir, name)
+    with open(path, "wb") as f:
+        f.write(body)
+    try:
+        with WorkbookSession(path) as book:
+            if not book.has_required_sheets():
+                raise RequestError("「座標入力」と「設定」シートを含むブックを送ってください")
+            return InputProperty.from_workbook(book), InputData.from_workbook(book)
+    except (UnsupportedWorkbookError, zipfile.BadZipFile, KeyError, OSError) as e:
+        raise RequestError(f"ブックを読み込めませんでした: {e}")
+
+
+def _graphs(results, props, tmp_dir: str, name: str, image_format: str,
+            max_points: int | None = None) -> Dict[str, str]:
+    """グラフを一時フォルダに描画し、タイトル -> base64 の辞書で返す"""
+    from plotter import Plotter
+    stem = Path(name).stem
+    plotter = Plotter(results=results, props=props, write_filename=os.path.join(tmp_dir, f"結果_{stem}.xlsx"),
+                      image_format=image_format, max_points=max_points)
+    graphs = {}
+    for path in plotter.plot_all_graphs():
+        title = Path(path).stem.replace(f"結果_{stem}_", "")
+        graphs[title] = base64.b64encode(Path(path).read_bytes()).decode("ascii")
+    return graphs
+
+
+def compute(kind: str, body: bytes, options: dict) -> dict:
+    """
+    ワーカープロセスで1リクエスト分を計算し、JSONにできる辞書を返す。
+    kind は "workbook"（本文がブック）または "calculate"（本文がJSON）。
+    """
+    from calculate import main_calculation_flow
+    from input_adapters import inputs_from_mapping
+    from result import METRIC_COLUMNS, metrics_table
+    start = time.perf_counter()
+    name = os.path.basename(options.get("name") or "request.xlsx")
+    with tempfile.TemporaryDirectory(prefix="service_") as tmp_dir:
+        if kind == "workbook":
+            props, all_data = _read_workbook_input(body, tmp_dir, name)
+        else:
+            try:
+                payload = json.loads(body)
+            except ValueError as e:
+                raise RequestError(f"JSONとして読めません: {e}")
+            if not isinstance(payload, dict):
+                raise RequestError("JSONオブジェクトを送ってください")
+            options = {**payload.get("options", {}), **options}
+            props, all_data = inputs_from_mapping(payload)
+        results = main_calculation_flow(file_path=name, props=props, all_data=all_data)
+        metrics_table(results)
+
+        response = {
+            "version": __version__,
+            "results": [
+                {
+                    "situation": res.situation,
+                    "is_standard": res.is_standard,
+                    "fft": res.fft_on_or_off,
+                    "metrics": {attr: _finite_or_none(getattr(res, attr)) for _, attr in METRIC_COLUMNS},
+                }
+                for res in results
+            ],
+        }
+        if _as_bool(options.get("profiles", False)) and results:
+            response["angles"] = {"rad_degrees": results[0].rad_degrees.tolist(),
+                                  "dia_degrees": results[0].dia_degrees.tolist()}
+            for item, res in zip(response["results"], results):
+                item["profiles"] = {kind: getattr(res, kind).tolist()
+                                    for kind in PROFILE_KINDS if hasattr(res, kind)}
+        if _as_bool(options.get("graphs", False)) and results:
+            image_format = options.get("image_format", "png")
+            if image_format not in IMAGE_FORMATS:
+                raise RequestError(f"image_formatは{IMAGE_FORMATS}のいずれかを指定してください: {image_format}")
+            max_points = options.get("plot_points")
+            response["graphs"] = _graphs(results, props, tmp_dir, name, image_format,
+                                         int(max_points) if max_points is not None else None)
+            response["image_format"] = image_format
+    response["elapsed"] = round(time.perf_counter() - start, 6)
+    return response
+
+
+class ComputeServer(ThreadingHTTPServer):
+    """
+    リクエストごとのスレッドで受け付け、計算は常駐ワーカーのプロセスプールに渡すHTTPサーバー。
+    処理待ち（時間切れの応答を返したあともワーカーで計算中のものを含む）が
+    max_queue 件を超えたリクエストには 503 を返す。
+    """
+    daemon_threads = True
+
+    def __init__(self, address, executor: ProcessPoolExecutor, n_workers: int,
+                 max_queue: int, max_body: int = DEFAULT_MAX_BODY, timeout: float | None = None):
+        super().__init__(address, ComputeRequestHandler)
+        self.executor = executor
+        self.n_workers = n_workers
+        self.max_queue = max_queue
+        self.max_body = max_body
+        self.timeout_per_request = timeout
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.n_served = 0
+
+    def submit(self, kind: str, body: bytes, options: dict) -> dict | None:
+        """計算をワーカーに渡して結果を待つ（処理待ちがいっぱいならNone）"""
+        if not self._slots.acquire(blocking=False):
+            return None
+        with self._lock:
+            self.in_flight += 1
+        try:
+            future = self.executor.submit(compute, kind, body, options)
+        except BaseException:
+            self._release(None)
+            raise
+        # 時間切れで応答を返したあともワーカーでの計算は続くため、枠は計算が終わるまで保持する
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout_per_request)
+        except TimeoutError:
+            future.cancel()     # まだ始まっていなければ取り消す（取り消した時点で枠を返す）
+            raise
+
+    def _release(self, future: Future | None) -> None:
+        """計算が終わった（または取り消された）ジョブの枠を返す"""
+        with self._lock:
+            self.in_flight -= 1
+            if future is not None and not future.cancelled():
+                self.n_served += 1
+        self._slots.release()
+
+
+class ComputeRequestHandler(BaseHTTPRequestHandler):
+    server: ComputeServer
+    server_version = f"RoundnessService/{__version__}"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass        # アクセスログは出さない（負荷試験時の出力を抑える）
+
+    def _send_json(self, status: HTTPStatus, body: dict) -> None:
+        data = json.dumps(body, ensure_ascii=False, allow_nan=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: HTTPStatus, message: str) -> None:
+        self._send_json(status, {"error": message})
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/health":
+            return self._send_error(HTTPStatus.NOT_FOUND, f"エンドポイントがありません: {self.path}")
+        self._send_json(HTTPStatus.OK, {
+            "status": "ok",
+            "version": __version__,
+            "workers": self.server.n_workers,
+            "in_flight": self.server.in_flight,
+            "served": self.server.n_served,
+        })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        kinds = {"/workbook": "workbook", "/calculate": "calculate"}
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            return self._send_error(HTTPStatus.BAD_REQUEST, "Content-Length が正しくありません")
+        if url.path not in kinds:
+            self.rfile.read(length)
+            return self._send_error(HTTPStatus.NOT_FOUND, f"エンドポイントがありません: {url.path}")
+        if length <= 0:
+            return self._send_error(HTTPStatus.BAD_REQUEST, "本文が空です")
+        if length > self.server.max_body:
+            self.close_connection = True
+            return self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                    f"本文が大きすぎます（上限 {self.server.max_body} byte）")
+        body = self.rfile.read(length)
+        options = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        try:
+            response = self.server.submit(kinds[url.path], body, options)
+        except (RequestError, ValueError, TypeError, KeyError) as e:
+            return self._send_error(HTTPStatus.BAD_REQUEST, "".join(traceback.format_exception_only(type(e), e)).strip())
+        except TimeoutError:
+            return self._send_error(HTTPStatus.GATEWAY_TIMEOUT, "計算が時間内に終わりませんでした")
+        except Exception as e:
+            return self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, repr(e))
+        if response is None:
+            return self._send_error(HTTPStatus.SERVICE_UNAVAILABLE, "処理待ちがいっぱいです。時間をおいて再送してください")
+        self._send_json(HTTPStatus.OK, response)
+
+
+def serve(host: str = "127.0.0.1", port: int = DEFAULT_PORT, max_workers: int = 1, max_queue: int | None = None,
+          max_body: int = DEFAULT_MAX_BODY, timeout: float | None = None, plots: bool = True) -> None:
+    """Ctrl+C（または SIGTERM）までサービスを動かす"""
+    stop_on_sigterm()
+    n_workers = resolve_workers(max_workers, os.cpu_count() or 1)
+    max_queue = max_queue or 4 * n_workers
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=warm_up_worker, initargs=(plots,)) as executor:
+        # ワーカーを先に起動して読み込みを済ませておく
+        for future in [executor.submit(time.sleep, 0) for _ in range(n_workers)]:
+            future.result()
+        with ComputeServer((host, port), executor, n_workers, max_queue, max_body, timeout) as server:
+            print(f"計算サービスを起動しました（Ctrl+Cで終了）: http://{server.server_address[0]}:{server.server_address[1]}"
+                  f"  ワーカー数: {n_workers}", flush=True)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                print("計算サービスを終了します。")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="内径変化量・半径変化量の計算をHTTPで提供する")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス（既定: 127.0.0.1）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"待ち受けるポート（既定: {DEFAULT_PORT}）")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="計算ワーカーのプロセス数（0でCPUコア数）")
+    parser.add_argument("--max-queue", type=int, default=None,
+                        help="同時に受け付けるリクエスト数（既定: ワーカー数の4倍、超えると503）")
+    parser.add_argument("--max-body", type=float, default=DEFAULT_MAX_BODY / 2**20,
+                        help="受け付ける本文の上限 [MiB]")
+    parser.add_argument("--timeout", type=float, default=None, help="1リクエストの計算時間の上限 [s]")
+    parser.add_argument("--no-plots", dest="plots", action="store_false",
+                        help="グラフを返さない運用ではワーカーに matplotlib を読み込まない")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    warnings.simplefilter('ignore')
+    args = parse_args()
+    serve(host=args.host, port=args.port, max_workers=args.workers, max_queue=args.max_queue,
+          max_body=int(args.max_body * 2**20), timeout=args.timeout, plots=args.plots)
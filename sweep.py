@@ -0,0 +1,176 @@
+import argparse
+import time
+import warnings
+from pathlib import Path
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from read_excel import InputData, InputProperty, WorkbookSession
+from file_utils import arg_to_xlsx, make_filename
+from constants import READER_ENGINES
+from calculate import main_calculation_flow, mirrored_spectrum, inverse_mirrored_spectrum
+from result import BaseResult
+
+"""
+FFTしきい値のスイープモジュール
+
+各信号のスペクトルを1度だけ計算し、しきい値ごとのマスクを一括で適用して
+真円度・簡易真円度・引き込み量・クローズインがしきい値でどう変わるかを求める。
+掃引するのは threshold_lsm（真円度に効く）と threshold_dia（簡易真円度・引き込み量・
+クローズインに効く）で、同じ値の列を両方に適用する（2つは互いの評価値に影響しない）。
+threshold_rad は評価値に影響しないため掃引せず、ブックの設定値のままにする。
+"""
+
+THRESHOLD_COLUMN = "しきい値（threshold_lsm・threshold_dia）"
+SWEEP_COLUMNS = ["状況", THRESHOLD_COLUMN, "真円度", "簡易真円度", "引き込み量", "クローズイン"]
+# 評価値ごとに掃引しているしきい値（グラフの横軸の名前）
+SWEPT_PARAMETERS = {"真円度": "threshold_lsm", "簡易真円度": "threshold_dia",
+                    "引き込み量": "threshold_dia", "クローズイン": "threshold_dia"}
+_MAX_CHUNK_ELEMENTS = 2**24   # 一度に逆FFTする要素数の上限（メモリ使用量の目安）
+
+
+def parse_thresholds(values: Sequence[str]) -> np.ndarray:
+    """
+    しきい値の指定を配列に変換する。
+    "0.1" のような数値、または "開始:終了:刻み"（終了を含む）の範囲を並べて指定できる。
+    """
+    thresholds: List[float] = []
+    for value in values:
+        if ":" in value:
+            start, stop, step = (float(x) for x in value.split(":"))
+            if step <= 0:
+                raise ValueError(f"刻みは正の値を指定してください: {value}")
+            n_steps = int(np.floor((stop - start) / step + 1e-9))
+            thresholds.extend(start + step * np.arange(n_steps + 1))
+        else:
+            thresholds.append(float(value))
+    if not thresholds:
+        raise ValueError("しきい値が指定されていません。")
+    return np.asarray(thresholds, dtype=float)
+
+
+def _smooth_for_thresholds(fft_result: np.ndarray, power: np.ndarray,
+                           thresholds: np.ndarray, original_len: int) -> np.ndarray:
+    """
+    1度計算したスペクトル (信号数, 周波数) に全しきい値のマスクを一括で適用し、
+    (しきい値数, 信号数, 点数) の平滑化信号を返す
+    """
+    masks = power[None, :, :] >= thresholds[:, None, None]
+    return inverse_mirrored_spectrum(fft_result[None, :, :] * masks, original_len)
+
+
+def sweep_thresholds(results: List[BaseResult], thresholds: Sequence[float]) -> pd.DataFrame:
+    """
+    基準以外の各状況について、しきい値ごとのFFT平滑化後の評価値を表（縦持ち）で返す。
+    FFTのon/offに関わらず全状況にFFTを適用した場合の値を求める。
+    """
+    targets = [res for res in results if not res.is_standard]
+    thresholds = np.asarray(thresholds, dtype=float)
+    if not targets:
+        return pd.DataFrame(columns=SWEEP_COLUMNS)
+
+    n_points = len(targets[0].change_diameter)
+    lsm = np.stack([np.asarray(res.lsm_change_radius)[:2*n_points] for res in targets])
+    dia = np.stack([np.asarray(res.change_diameter) for res in targets])
+    sliding = np.array([res.sliding_distance for res in targets])
+    n_targets = len(targets)
+
+    # 補正cap・補正rod・内径 のスペクトルを1度だけ計算する
+    signals = np.concatenate([lsm[:, :n_points], lsm[:, n_points:], dia])
+    fft_result, power = mirrored_spectrum(signals)
+
+    chunk = max(1, _MAX_CHUNK_ELEMENTS // max(1, signals.size))
+    roundness = np.empty((len(thresholds), n_targets))
+    simple_roundness = np.empty((len(thresholds), n_targets))
+    pull_in = np.empty((len(thresholds), n_targets))
+    for start in range(0, len(thresholds), chunk):
+        part = slice(start, start + chunk)
+        smoothed = _smooth_for_thresholds(fft_result, power, thresholds[part], n_points)
+        lsm_cap = smoothed[:, :n_targets]
+        lsm_rod = smoothed[:, n_targets:2*n_targets]
+        fft_dia = smoothed[:, 2*n_targets:]
+        lsm_max = np.maximum(lsm_cap.max(axis=-1), lsm_rod.max(axis=-1))
+        lsm_min = np.minimum(lsm_cap.min(axis=-1), lsm_rod.min(axis=-1))
+        roundness[part] = lsm_max - lsm_min
+        dia_max = fft_dia.max(axis=-1)
+        dia_min = fft_dia.min(axis=-1)
+        simple_roundness[part] = (dia_max - dia_min) / 2
+        pull_in[part] = -dia_min
+    close_in = np.maximum(pull_in, sliding[None, :])
+
+    n_thresholds = len(thresholds)
+    return pd.DataFrame({
+        "状況": np.tile([res.situation for res in targets], n_thresholds),
+        THRESHOLD_COLUMN: np.repeat(thresholds, n_targets),
+        "真円度": roundness.ravel(),
+        "簡易真円度": simple_roundness.ravel(),
+        "引き込み量": pull_in.ravel(),
+        "クローズイン": close_in.ravel(),
+    }, columns=SWEEP_COLUMNS)
+
+
+def plot_sweep(sweep_df: pd.DataFrame, graph_filename: Path, title: str):
+    """しきい値に対する各評価値の変化をグラフにして保存する"""
+    import matplotlib
+    from matplotlib.figure import Figure
+
+    with matplotlib.rc_context({'font.family': 'MS Gothic'}):
+        fig = Figure(figsize=(14, 10))
+        axes = fig.subplots(2, 2)
+        for ax, metric in zip(axes.ravel(), SWEEP_COLUMNS[2:]):
+            for situation, group in sweep_df.groupby("状況", sort=False):
+                ax.plot(group[THRESHOLD_COLUMN], group[metric], label=str(situation))
+            ax.set_xlabel(f"しきい値（{SWEPT_PARAMETERS[metric]}）")
+            ax.set_ylabel(f"{metric} [µm]")
+            ax.set_title(metric)
+            ax.grid(True)
+        axes[0, 0].legend(loc="best")
+        fig.suptitle(title, fontsize=18)
+        fig.tight_layout()
+        fig.savefig(graph_filename)
+    print(f"グラフを保存しました: {graph_filename}")
+
+
+def run_sweep(a_file: str, thresholds: Sequence[float], reader_engine: str = "fast") -> pd.DataFrame:
+    """1ファイルを読み込んでしきい値スイープを行い、表（CSV）とグラフを保存する"""
+    with WorkbookSession(a_file, engine=reader_engine) as book:
+        props = InputProperty.from_workbook(book)
+        all_data = InputData.from_workbook(book)
+    all_results = main_calculation_flow(file_path=a_file, props=props, all_data=all_data)
+    sweep_df = sweep_thresholds(all_results, thresholds)
+
+    w_file_name = Path(make_filename(a_file))
+    base_name = w_file_name.stem.replace("結果_", "")
+    table_filename = w_file_name.parent / f"しきい値スイープ_{base_name}.csv"
+    sweep_df.to_csv(table_filename, index=False, encoding="utf-8-sig")
+    print(f"表を保存しました: {table_filename}")
+    if not sweep_df.empty:
+        plot_sweep(sweep_df, w_file_name.parent / f"しきい値スイープ_{base_name}.png",
+                   f"{base_name}_しきい値スイープ")
+    return sweep_df
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="FFTしきい値のスイープ（threshold_lsm・threshold_dia を掃引し、threshold_rad はブックの設定値のまま）")
+    parser.add_argument("path", help="読み込むフォルダかファイル名")
+    parser.add_argument("-t", "--thresholds", nargs="+", required=True,
+                        help="threshold_lsm（真円度）と threshold_dia（簡易真円度・引き込み量・クローズイン）に"
+                             "適用するしきい値（例: 0.1 0.2 または 0.01:1.0:0.01）")
+    parser.add_argument("--reader", choices=READER_ENGINES, default="fast")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    warnings.simplefilter('ignore')
+    args = parse_args()
+    thresholds = parse_thresholds(args.thresholds)
+    for a_file in arg_to_xlsx(args.path):
+        start = time.perf_counter()
+        try:
+            run_sweep(a_file, thresholds, reader_engine=args.reader)
+            print(f"{Path(a_file).name}: {len(thresholds)} 件のしきい値を {time.perf_counter() - start:.2f} s で評価しました。")
+        except Exception as e:
+            print(f"エラーが発生しました: {a_file}, {e}")
@@ -0,0 +1,51 @@
+import os
+import shutil
+import sys
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+import main  # noqa: E402
+from pipeline import run_pipeline  # noqa: E402
+from result_cache import ResultCache, content_key  # noqa: E402
+from results_store import ResultsStore  # noqa: E402
+from synthetic import write_workbook  # noqa: E402
+
+
+def test_identical_workbooks_get_their_own_reports(tmp_path):
+    """中身が同じ別のブックも、キャッシュから省略されずにそれぞれの結果ブックが作られる"""
+    a_file = str(write_workbook(str(tmp_path / "a.xlsx")))
+    b_file = str(tmp_path / "b.xlsx")
+    shutil.copyfile(a_file, b_file)
+    assert content_key(a_file) != content_key(b_file)
+
+    cache = ResultCache(cache_dir=tmp_path / "cache")
+    for file_path in (a_file, b_file):
+        main.main(file_path, cache=cache, plots=False)
+    reports = [Path(main.output_filename(file_path)) for file_path in (a_file, b_file)]
+    assert all(report.is_file() for report in reports)
+    assert reports[0] != reports[1]
+
+    # 2回目は両方ともキャッシュから復元され、消した出力も元の名前で戻る
+    for report in reports:
+        report.unlink()
+    for file_path in (a_file, b_file):
+        main.main(file_path, cache=cache, plots=False)
+    assert all(report.is_file() for report in reports)
+
+
+def test_cached_workbook_is_still_stored(tmp_path):
+    """キャッシュから出力を復元したブックも、新しいデータベースに登録される（逐次・パイプラインとも）"""
+    a_file = str(write_workbook(str(tmp_path / "a.xlsx")))
+    cache = ResultCache(cache_dir=tmp_path / "cache")
+    main.main(a_file, cache=cache, plots=False)
+
+    store = ResultsStore(tmp_path / "results.db")
+    main.main(a_file, cache=cache, plots=False, store=store)
+    run_pipeline([a_file], show_stages=False, cache=cache, plots=False, store=store)
+    runs = store.runs()
+    assert len(runs) == 2
+    metrics = store.metrics()
+    assert len(metrics) == 2 * 4
+    assert metrics["roundness"].notna().all()
@@ -0,0 +1,96 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import roundness  # noqa: E402
+from roundness import zone_roundness  # noqa: E402
+
+N_POINTS = 720
+
+
+def _theta(n_points: int = N_POINTS) -> np.ndarray:
+    return np.linspace(0.0, 2 * np.pi, n_points, endpoint=False)
+
+
+def _eccentric(theta: np.ndarray, ex: float, ey: float) -> np.ndarray:
+    """中心が (ex, ey) ずれたときの偏差（リマソン近似）"""
+    return ex * np.cos(theta) + ey * np.sin(theta)
+
+
+def test_eccentricity_alone_is_round():
+    """偏心だけの偏差は中心をずらせば消えるので、3つの方法とも真円度0"""
+    theta = _theta()
+    result = zone_roundness(theta, _eccentric(theta, 0.8, -0.3))
+    assert result.mzc == pytest.approx(0.0, abs=1e-9)
+    assert result.mcc == pytest.approx(0.0, abs=1e-9)
+    assert result.mic == pytest.approx(0.0, abs=1e-9)
+    np.testing.assert_allclose(result.mzc_center, [0.8, -0.3], atol=1e-9)
+
+
+def _deviation(theta: np.ndarray, rho: np.ndarray, center: np.ndarray) -> np.ndarray:
+    return rho - _eccentric(theta, *center)
+
+
+def test_oval_profile_with_eccentricity():
+    """
+    ρ = a·cos2θ + 偏心 の MZC は 2a、中心は偏心の位置。
+    MCC・MIC は中心が一意に決まらない（外接円・内接円は2点でしか接しない）ため、目的関数の値を確かめる。
+    """
+    theta = _theta()
+    a, base = 1.7, 3.0
+    rho = a * np.cos(2 * theta) + _eccentric(theta, 0.4, 0.25) + base
+    result = zone_roundness(theta, rho)
+    assert result.mzc == pytest.approx(2 * a, rel=1e-9)
+    np.testing.assert_allclose(result.mzc_center, [0.4, 0.25], atol=1e-9)
+    assert _deviation(theta, rho, result.mcc_center).max() == pytest.approx(base + a, rel=1e-9)
+    assert _deviation(theta, rho, result.mic_center).min() == pytest.approx(base - a, rel=1e-9)
+
+
+@pytest.mark.parametrize("lobes", [3, 5])
+def test_odd_lobed_profile_with_eccentricity(lobes):
+    """奇数山の ρ = a·cos(kθ) + 偏心 では、3つの方法とも中心は偏心の位置、真円度は 2a"""
+    theta = _theta()
+    a = 1.7
+    rho = a * np.cos(lobes * theta) + _eccentric(theta, 0.4, 0.25) + 3.0
+    result = zone_roundness(theta, rho)
+    for value in (result.mzc, result.mcc, result.mic):
+        assert value == pytest.approx(2 * a, rel=1e-9)
+    for center in (result.mzc_center, result.mcc_center, result.mic_center):
+        np.testing.assert_allclose(center, [0.4, 0.25], atol=1e-9)
+
+
+def test_mzc_is_the_narrowest_zone():
+    """MZC は同心円の幅の最小値なので、MCC・MIC・最小二乗円の中心から見た幅より大きくならない"""
+    rng = np.random.default_rng(0)
+    theta = np.sort(rng.uniform(0.0, 2 * np.pi, N_POINTS))
+    rho = 0.6 * np.cos(2 * theta + 0.3) + 0.2 * np.sin(7 * theta) + rng.normal(0.0, 0.05, N_POINTS)
+    result = zone_roundness(theta, rho)
+    assert result.mzc <= result.mcc + 1e-12
+    assert result.mzc <= result.mic + 1e-12
+    assert result.mzc <= rho.max() - rho.min() + 1e-12
+
+
+def test_batched_matches_single():
+    """状況をまとめて解いた結果が、1状況ずつ解いた結果と一致する"""
+    rng = np.random.default_rng(1)
+    theta = np.sort(rng.uniform(0.0, 2 * np.pi, (6, N_POINTS)), axis=1)
+    rho = (rng.uniform(0.1, 1.0, (6, 1)) * np.cos(3 * theta)
+           + _eccentric(theta, *rng.normal(0.0, 0.5, (2, 6, 1)))
+           + rng.normal(0.0, 0.05, theta.shape))
+    batched = zone_roundness(theta, rho)
+    for i in range(len(theta)):
+        single = zone_roundness(theta[i], rho[i])
+        for name in ("mzc", "mcc", "mic"):
+            assert getattr(single, name) == pytest.approx(getattr(batched, name)[i], rel=1e-9, abs=1e-12)
+
+
+def test_warns_when_exchanges_do_not_converge(monkeypatch):
+    """交換回数の上限に達したら警告する"""
+    monkeypatch.setattr(roundness, "MAX_EXCHANGES", 1)
+    theta = _theta()
+    rho = 0.6 * np.cos(2 * theta + 0.3) + 0.2 * np.sin(7 * theta)
+    with pytest.warns(RuntimeWarning, match="収束しませんでした"):
+        zone_roundness(theta, rho)
@@ -0,0 +1,3 @@
+"""ツールのバージョン（結果キャッシュのキーにも使用する）"""
+
+__version__ = "1.1.0"
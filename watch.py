@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import warnings
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Deque, Dict, Sequence, Tuple
+
+from batch import FileStatus, process_one_file, resolve_workers, warm_up_worker, stop_on_sigterm
+from constants import READER_ENGINES, IMAGE_FORMATS
+from discovery import DEFAULT_INCLUDE, DEFAULT_EXCLUDE, iter_candidates, has_required_sheets
+from result_cache import ResultCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from results_store import ResultsStore
+
+"""
+フォルダ監視モジュール
+
+指定フォルダを定期的に走査し、新しく置かれた・更新されたブックを main() で処理する。
+書き込み途中のファイルを拾わないよう、更新時刻とサイズが一定時間変わらなくなってから処理する。
+ワーカープロセスは起動時に pandas・NumPy・matplotlib などを読み込んだまま待機し、
+ファイルごとの起動コストをなくす。処理状況（待ち件数・ファイルごとの待ち時間）は状態ファイルに書き出す。
+"""
+
+_RECENT_LIMIT = 50          # 状態ファイルに残す最近の処理結果の件数
+
+
+def _file_state(stat: os.stat_result) -> Tuple[int, int]:
+    return stat.st_mtime_ns, stat.st_size
+
+
+@dataclass
+class PendingFile:
+    """変更を検知してから処理を始めるまでのファイル"""
+    state: Tuple[int, int]
+    detected_at: float
+    changed_at: float
+
+
+@dataclass
+class FolderWatcher:
+    """
+    フォルダを監視し、落ち着いた（書き込みが終わった）ブックをプロセスプールで処理するクラス
+    """
+    folders: Sequence[str]
+    recursive: bool = False
+    include: Sequence[str] = DEFAULT_INCLUDE
+    exclude: Sequence[str] = DEFAULT_EXCLUDE
+    settle: float = 2.0                     # 更新時刻・サイズがこの秒数変わらなければ処理する
+    max_workers: int = 1
+    status_path: Path | None = None
+    main_kwargs: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.processed: Dict[str, Tuple[int, int]] = {}
+        self.pending: Dict[str, PendingFile] = {}
+        self.running: Dict[Future, Tuple[str, PendingFile, float]] = {}
+        self.recent: Deque[dict] = deque(maxlen=_RECENT_LIMIT)
+        self.n_ok = 0
+        self.n_ng = 0
+        self.started_at = time.time()
+
+    def scan(self) -> Dict[str, Tuple[int, int]]:
+        """監視フォルダ内の候補ファイルと (更新時刻, サイズ) を返す"""
+        states = {}
+        for folder in self.folders:
+            for entry in iter_candidates(folder, self.recursive, self.include, self.exclude):
+                try:
+                    states[entry.path] = _file_state(entry.stat())
+                except OSError:
+                    continue
+        return states
+
+    def mark_existing_as_processed(self):
+        """起動時に既にあるファイルを処理済みとして扱う"""
+        self.processed.update(self.scan())
+
+    def poll(self, executor: ProcessPoolExecutor, job) -> None:
+        """1回分の走査: 変更の検知・落ち着いたファイルの投入・終了した処理の回収"""
+        now = time.time()
+        states = self.scan()
+        for path, state in states.items():
+            if self.processed.get(path) == state:
+                continue
+            pending = self.pending.get(path)
+            if pending is None:
+                self.pending[path] = PendingFile(state=state, detected_at=now, changed_at=now)
+            elif pending.state != state:
+                pending.state = state
+                pending.changed_at = now
+        for path in [p for p in self.pending if p not in states]:
+            del self.pending[path]      # 処理前に削除・移動されたファイル
+
+        running_paths = {path for path, _, _ in self.running.values()}
+        for path, pending in list(self.pending.items()):
+            if path in running_paths or now - pending.changed_at < self.settle:
+                continue
+            try:
+                # zipとして読めない（まだ書き込み中の）ファイルは次の走査で再判定する
+                is_target = has_required_sheets(path)
+            except Exception:
+                continue
+            del self.pending[path]
+            self.processed[path] = pending.state
+            if is_target:
+                future = executor.submit(job, path)
+                self.running[future] = (path, pending, time.time())
+                print(f"[{datetime.now():%H:%M:%S}] 処理を開始します: {path}")
+
+        self.collect()
+        self.write_status()
+
+    def collect(self) -> None:
+        """終了した処理の結果を回収する"""
+        for future in [f for f in self.running if f.done()]:
+            path, pending, submitted_at = self.running.pop(future)
+            try:
+                status: FileStatus = future.result()
+            except Exception as e:
+                status = FileStatus(file_path=path, is_ok=False, elapsed=0.0, error=repr(e))
+            finished_at = time.time()
+            if status.is_ok:
+                self.n_ok += 1
+            else:
+                self.n_ng += 1
+            record = {
+                "file": path,
+                "ok": status.is_ok,
+                "error": status.error,
+                "detected_at": datetime.fromtimestamp(pending.detected_at).isoformat(timespec="seconds"),
+                "finished_at": datetime.fromtimestamp(finished_at).isoformat(timespec="seconds"),
+                "queue_wait": round(submitted_at - pending.changed_at, 3),
+                "elapsed": round(status.elapsed, 3),
+                "latency": round(finished_at - pending.changed_at, 3),
+            }
+            self.recent.append(record)
+            mark = "OK" if status.is_ok else "NG"
+            print(f"[{datetime.now():%H:%M:%S}] {mark} {record['latency']:.2f} s  {path}")
+            if status.error:
+                print(f"        エラー: {status.error}")
+
+    def queue_depth(self) -> int:
+        """処理待ち（落ち着くのを待っているものと、ワーカーの空き待ち）の件数"""
+        n_waiting = sum(1 for future in self.running if not future.running() and not future.done())
+        return len(self.pending) + n_waiting
+
+    def write_status(self) -> None:
+        """状態ファイルを書き出す（一時ファイルに書いてから置き換える）"""
+        if self.status_path is None:
+            return
+        status = {
+            "updated": datetime.now().isoformat(timespec="seconds"),
+            "started": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+            "folders": [str(folder) for folder in self.folders],
+            "queue_depth": self.queue_depth(),
+            "pending": sorted(self.pending),
+            "running": sorted(path for path, _, _ in self.running.values()),
+            "processed_ok": self.n_ok,
+            "processed_ng": self.n_ng,
+            "recent": list(self.recent),
+        }
+        self.status_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=".status_", dir=self.status_path.parent)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(status, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_name, self.status_path)
+
+    def run(self, interval: float = 1.0, process_existing: bool = False) -> None:
+        """Ctrl+C（または SIGTERM）まで監視を続ける"""
+        stop_on_sigterm()
+        if not process_existing:
+            self.mark_existing_as_processed()
+        n_workers = resolve_workers(self.max_workers, os.cpu_count() or 1)
+        job = partial(process_one_file, **self.main_kwargs)
+        print(f"フォルダを監視しています（Ctrl+Cで終了）: {', '.join(map(str, self.folders))}")
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=warm_up_worker,
+                                 initargs=(self.main_kwargs.get("plots", True),)) as executor:
+            # ワーカーを先に起動して読み込みを済ませておく
+            for future in [executor.submit(time.sleep, 0) for _ in range(n_workers)]:
+                future.result()
+            try:
+                while True:
+                    self.poll(executor, job)
+                    time.sleep(interval)
+            except KeyboardInterrupt:
+                print("監視を終了します。処理中のファイルの完了を待っています...")
+                while self.running:
+                    time.sleep(0.2)
+                    self.collect()
+                self.write_status()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="フォルダを監視して新しいブックを自動で計算する")
+    parser.add_argument("folders", nargs="+", help="監視するフォルダ")
+    parser.add_argument("-r", "--recursive", action="store_true", help="フォルダを再帰的に監視する")
+    parser.add_argument("--include", nargs="+", default=list(DEFAULT_INCLUDE))
+    parser.add_argument("--exclude", nargs="+", default=list(DEFAULT_EXCLUDE))
+    parser.add_argument("--interval", type=float, default=1.0, help="走査の間隔 [s]")
+    parser.add_argument("--settle", type=float, default=2.0,
+                        help="更新時刻とサイズがこの秒数変わらなければ書き込み完了とみなす [s]")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="同時に処理するファイル数（0でCPUコア数）")
+    parser.add_argument("--status", default=str(DEFAULT_CACHE_DIR / "watch_status.json"),
+                        help="状態ファイル（空文字で書き出さない）")
+    parser.add_argument("--process-existing", action="store_true", help="起動時に既にあるファイルも処理する")
+    parser.add_argument("--reader", choices=READER_ENGINES, default="fast")
+    parser.add_argument("--no-plots", dest="plots", action="store_false")
+    parser.add_argument("--image-format", choices=IMAGE_FORMATS, default="png")
+    parser.add_argument("--dpi", type=float, default=None)
+    parser.add_argument("--plot-points", type=int, default=None,
+                        help="グラフの1系列あたりの間引き区間数（省略時は画素数から自動、0で間引かない）")
+    parser.add_argument("--cache", action="store_true")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR))
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_MAX_BYTES / 2**20)
+    parser.add_argument("--store", help="計算結果を登録するSQLiteデータベース")
+    parser.add_argument("--store-profiles", action="store_true")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    warnings.simplefilter('ignore')
+    args = parse_args()
+    main_kwargs = {
+        "reader_engine": args.reader,
+        "plots": args.plots,
+        "image_format": args.image_format,
+        "dpi": args.dpi,
+        "plot_points": args.plot_points,
+        "cache": ResultCache(cache_dir=Path(args.cache_dir), max_bytes=int(args.cache_size * 2**20))
+                 if args.cache else None,
+        "store": ResultsStore(Path(args.store)) if args.store else None,
+        "store_profiles": args.store_profiles,
+    }
+    watcher = FolderWatcher(folders=args.folders, recursive=args.recursive, include=args.include,
+                            exclude=args.exclude, settle=args.settle, max_workers=args.workers,
+                            status_path=Path(args.status) if args.status else None, main_kwargs=main_kwargs)
+    watcher.run(interval=args.interval, process_existing=args.process_existing)